@@ -18,7 +18,13 @@ from agents.search import agent as search_module
 # Import tools directly (no agent wrapper)
 from tools.location_tool import get_user_location
 from tools.memory_tool import get_from_previous_sessions
-from tools.email_tool import send_email  # Direct function, not agent
+from tools.email_tool import send_email, get_email_status  # Direct functions, not agents
+from tools.cassette import cassette_before_model, cassette_after_model
+from tools.rate_limit import gemini_before_model, gemini_on_model_error
+from tools.telemetry import (
+    before_model_span, after_model_span, model_error_span,
+    before_tool_span, after_tool_span, tool_error_span,
+)
 
 # Wrap sub-agents as tools
 search_tool = AgentTool(agent=search_module.root_agent)
@@ -29,6 +35,9 @@ memory_tool = AgentTool(agent=memory_module.root_agent)
 # Import session manager for batching (Options 1 & 3)
 from tools.session_manager import initialize_session
 
+# Parallel fan-out over the search, Reddit and YouTube agents
+from tools.research_tool import research_product
+
 
 # Get current datetime for context
 current_time = datetime.now().strftime("%A, %B %d, %Y at %I:%M %p")
@@ -47,7 +56,9 @@ You have access to the following agents (as tools):
 - **reddit_agent**: For finding user reviews and discussions on Reddit.
 - **youtube_agent**: For finding video reviews.
 - **memory_agent**: For storing/retrieving preferences.
-- **send_email**: For sending emails directly (function, not agent).
+- **research_product**: Runs search_agent, reddit_agent and youtube_agent CONCURRENTLY and returns their source-tagged findings.
+- **send_email**: For sending emails directly (function, not agent). Delivery is queued in the background and returns a delivery id.
+- **get_email_status**: Checks whether a queued email (by delivery id) was sent.
 - **initialize_session**: BATCHED initialization (combines memory + location + previous session data).
 - **get_from_previous_sessions**: For retrieving specific data from old sessions.
 
@@ -64,6 +75,9 @@ Workflow:
    - **ALWAYS** delegate to `search_agent` for specs and prices (provide location/currency from initialization).
    - **ASK USER**: After getting search results, ask: "Would you also like me to check Reddit for user reviews and YouTube for video reviews?"
    - If user says yes, call `reddit_agent` and/or `youtube_agent` based on their response.
+     If they want BOTH, call `research_product(query, sources="reddit,youtube")` ONCE instead, so both run in parallel.
+   - If the user asks for full research up front (specs + Reddit + YouTube), call `research_product` ONCE
+     (with location/currency as `location_context`) instead of calling the three agents one after another.
 5. Synthesize the information. When citing sources:
    - "From Google Search: [Summary]"
    - "From Reddit: [Summary] (Link to thread)" (if called)
@@ -77,7 +91,8 @@ Workflow:
       - If not found, ask: "What is your email address?"
       - Once confirmed, use `memory_agent` to store it
       - Use `send_email` to send the transcript with subject "Chat Transcript - {current_time}"
-      - Tell user: "Transcript sent to [email] and stored in: data/memory/session_<timestamp>.json"
+      - Tell user: "Transcript queued for delivery to [email] and stored in: data/memory/session_<timestamp>.json"
+      - If the user later asks whether it arrived, use `get_email_status` with the delivery id
 
 **IMPORTANT BATCHING NOTES**:
 - Use `initialize_session()` at the start instead of separate memory/location calls
@@ -85,12 +100,23 @@ Workflow:
 - Location is cached for 24 hours, so repeated calls are efficient
 
 Use the agents to perform tasks.""",
+    # Recorded/replayed model I/O, shared Gemini rate limit, latency span
+    before_model_callback=[cassette_before_model, gemini_before_model, before_model_span],
+    after_model_callback=[cassette_after_model, after_model_span],
+    on_model_error_callback=[model_error_span, gemini_on_model_error],
+    # Per-tool spans (sub-agents included) for the metrics endpoint; the
+    # direct tools below are not @traced, so each call is counted once
+    before_tool_callback=before_tool_span,
+    after_tool_callback=after_tool_span,
+    on_tool_error_callback=tool_error_span,
     tools=[
         search_tool,
         reddit_tool,
         youtube_tool,
         memory_tool,
+        research_product,  # Concurrent search + Reddit + YouTube
         send_email,  # Direct function
+        get_email_status,
         initialize_session,  # Batched initialization (Options 1 & 3)
         get_from_previous_sessions
     ]
@@ -6,6 +6,9 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 from google.adk.agents import Agent
+from tools.cassette import cassette_before_model, cassette_after_model
+from tools.rate_limit import gemini_before_model, gemini_on_model_error
+from tools.telemetry import before_model_span, after_model_span, model_error_span
 from tools.memory_tool import store_preference, retrieve_preference
 
 # Memory Agent - Manages user preferences (exclusive storage access)
@@ -25,5 +28,9 @@ Manage:
 - Size information
 - Brand preferences
 - Past purchases""",
+    # Recorded/replayed model I/O, shared Gemini rate limit, latency span
+    before_model_callback=[cassette_before_model, gemini_before_model, before_model_span],
+    after_model_callback=[cassette_after_model, after_model_span],
+    on_model_error_callback=[model_error_span, gemini_on_model_error],
     tools=[store_preference, retrieve_preference]
 )
@@ -6,6 +6,9 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 from google.adk.agents import Agent
+from tools.cassette import cassette_before_model, cassette_after_model
+from tools.rate_limit import gemini_before_model, gemini_on_model_error
+from tools.telemetry import before_model_span, after_model_span, model_error_span
 from tools.reddit_tool import scrape_reddit
 
 # Reddit Agent - Scrapes Reddit for discussions
@@ -15,12 +18,17 @@ root_agent = Agent(
     description="Finds user discussions and reviews on Reddit",
     instruction="""You are a Reddit Agent specialized in finding community discussions.
 
-Use the scrape_reddit tool to find:
+Use the scrape_reddit tool to find (set include_comments=True for sentiment;
+it returns the top comments of every post in ONE call, so do not search again for them):
 - User experiences and reviews
 - Common issues or complaints
 - Recommendations from real users
 - Sentiment analysis
 
 Summarize key points and overall sentiment.""",
+    # Recorded/replayed model I/O, shared Gemini rate limit, latency span
+    before_model_callback=[cassette_before_model, gemini_before_model, before_model_span],
+    after_model_callback=[cassette_after_model, after_model_span],
+    on_model_error_callback=[model_error_span, gemini_on_model_error],
     tools=[scrape_reddit]
 )
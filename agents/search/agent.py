@@ -7,6 +7,10 @@ sys.path.insert(0, str(project_root))
 
 from google.adk.agents import Agent
 from google.adk.tools import google_search  # ADK's built-in Google Search (Grounding)
+from tools.cassette import cassette_before_model, cassette_after_model
+from tools.rate_limit import gemini_before_model, gemini_on_model_error
+from tools.telemetry import before_model_span, after_model_span, model_error_span
+from tools.search_cache import search_cache_before_model, search_cache_after_model
 
 # Search Agent - Uses Gemini's built-in Google Search grounding
 root_agent = Agent(
@@ -27,5 +31,11 @@ Use Google Search to find:
 3. Prioritize retailers available in that country
 
 Provide concise, factual information with sources.""",
+    # Replayed (TOOL_IO_MODE) and cached answers are served before a Gemini rate-limit token is taken
+    before_model_callback=[
+        cassette_before_model, search_cache_before_model, gemini_before_model, before_model_span,
+    ],
+    after_model_callback=[cassette_after_model, search_cache_after_model, after_model_span],
+    on_model_error_callback=[model_error_span, gemini_on_model_error],
     tools=[google_search]
 )
@@ -6,6 +6,9 @@ project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
 from google.adk.agents import Agent
+from tools.cassette import cassette_before_model, cassette_after_model
+from tools.rate_limit import gemini_before_model, gemini_on_model_error
+from tools.telemetry import before_model_span, after_model_span, model_error_span
 from tools.youtube_tool import search_youtube, summarize_video
 
 # YouTube Agent - Finds and summarizes video reviews
@@ -16,7 +19,8 @@ root_agent = Agent(
     instruction="""You are a YouTube Agent specialized in video content.
 
 Use your tools to:
-- search_youtube: Find relevant product review videos
+- search_youtube: Find relevant product review videos (results are already ranked
+  and include channel, duration, views and likes, so one search is usually enough)
 - summarize_video: Provide video summaries
 
 Focus on:
@@ -24,5 +28,9 @@ Focus on:
 - Unboxing videos
 - Comparison videos
 - User testimonials""",
+    # Recorded/replayed model I/O, shared Gemini rate limit, latency span
+    before_model_callback=[cassette_before_model, gemini_before_model, before_model_span],
+    after_model_callback=[cassette_after_model, after_model_span],
+    on_model_error_callback=[model_error_span, gemini_on_model_error],
     tools=[search_youtube, summarize_video]
 )
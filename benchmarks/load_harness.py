@@ -0,0 +1,347 @@
+"""
+Concurrent-session load harness for the shopping assistant orchestrator.
+
+Drives agents/chat/agent.py's root_agent through scripted multi-turn
+shopping conversations at N concurrent sessions, without spending API
+quota:
+
+- FakeLlm, a deterministic local model, replaces gemini-2.5-flash on the
+  orchestrator and every sub-agent. It calls the tools a real run would
+  (initialize_session, the agent tools, research_product, send_email, ...)
+  following a fixed script, then answers with a summary of the results.
+- The tools run unmodified against the local stub upstreams of
+  benchmarks/stub_servers.py (Reddit, ip-api, YouTube, SMTP).
+
+For each concurrency level it reports per-turn latency percentiles,
+tool calls per turn, model calls per agent, event-loop lag (time the loop
+was blocked, e.g. by synchronous tools or lock contention), tracemalloc
+memory growth with its top allocation sites, and the telemetry spans.
+One unmeasured warm-up conversation runs first.
+
+Usage:
+    python benchmarks/load_harness.py [--sessions 1,10,50] [--llm-latency 0.05]
+        [--upstream-latency 0.02] [--products 5]
+        [--output benchmarks/results/load_harness.json]
+"""
+import argparse
+import asyncio
+import contextlib
+import gc
+import io
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import AsyncGenerator
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from google.adk.models.base_llm import BaseLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
+from google.genai import types
+
+from benchmarks.stub_servers import IpApiStub, RedditStub, SmtpSink, YouTubeStub
+from benchmarks.tool_bench import UNTHROTTLED
+
+APP_NAME = "load_harness"
+PRODUCTS = ("Pixel 8a", "Galaxy A55", "iPhone 15", "OnePlus 12R", "Nothing Phone 2a",
+            "Moto Edge 50", "Xiaomi 14T", "Sony Xperia 10 VI")
+
+# Orchestrator plans, keyed by user message: [(tool name, args)] in call order
+_root_plans = {}
+# Model and tool calls issued by FakeLlm, per agent
+_model_calls = Counter()
+_tool_calls = Counter()
+
+
+def conversation(product: str) -> list:
+    """The scripted turns of one shopping conversation about product."""
+    turns = [
+        (f"Hi! I'm shopping for a phone under $500, maybe the {product}.", [
+            ("initialize_session", {}),
+            ("search_agent", {"request": f"{product} price and specs"}),
+        ]),
+        (f"What do people think of the {product}?", [
+            ("research_product", {"query": product, "location_context": "United States, USD",
+                                  "sources": "reddit,youtube"}),
+        ]),
+        (f"Any video reviews comparing the {product} to its rivals?", [
+            ("youtube_agent", {"request": f"{product} vs rivals review"}),
+        ]),
+        (f"Remember my budget is $500 and email me a summary of the {product}.", [
+            ("memory_agent", {"request": "budget=500"}),
+            ("send_email", {"to_email": "shopper@example.com", "subject": f"{product} summary",
+                            "body": f"Summary of the {product} research."}),
+        ]),
+        ("Did you save my budget?", [
+            ("get_from_previous_sessions", {"key": "budget"}),
+        ]),
+    ]
+    for text, plan in turns:
+        _root_plans[text] = plan
+    return [text for text, _ in turns]
+
+
+def _sub_agent_plan(tools: set, text: str) -> list:
+    """Plans of the sub-agents, picked by the tools they were given."""
+    if "scrape_reddit" in tools:
+        return [("scrape_reddit", {"query": text[:120]})]
+    if "search_youtube" in tools:
+        return [("search_youtube", {"query": text[:120]})]
+    if "store_preference" in tools:
+        key, _, value = text.partition("=")
+        return [("store_preference", {"key": key.strip(), "value": value.strip()})]
+    return []  # search_agent: answers directly (google_search is model-side)
+
+
+def _agent_of(tools: set) -> str:
+    for tool, agent in (("initialize_session", "shopping_assistant"), ("scrape_reddit", "reddit_agent"),
+                        ("search_youtube", "youtube_agent"), ("store_preference", "memory_agent")):
+        if tool in tools:
+            return agent
+    return "search_agent"
+
+
+class FakeLlm(BaseLlm):
+    """
+    Deterministic stand-in for Gemini. Finds the last user message, counts
+    the tool results that followed it and returns the next planned tool
+    call, or a final answer once the plan is done. latency is awaited
+    before every response to mimic model time.
+    """
+    model: str = "gemini-2.5-flash"  # google_search only attaches to Gemini model names
+    latency: float = 0.05
+
+    @classmethod
+    def supported_models(cls) -> list:
+        return []
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        yield self._respond(llm_request)
+
+    def _respond(self, llm_request: LlmRequest) -> LlmResponse:
+        contents = llm_request.contents or []
+        last_user = max(
+            (i for i, c in enumerate(contents)
+             if c.role == "user" and any(p.text for p in c.parts or [])),
+            default=0,
+        )
+        text = " ".join(p.text for p in contents[last_user].parts or [] if p.text) if contents else ""
+        results = [p.function_response for c in contents[last_user + 1:]
+                   for p in c.parts or [] if p.function_response]
+
+        tools = set(llm_request.tools_dict)
+        agent = _agent_of(tools)
+        _model_calls[agent] += 1
+        plan = _root_plans.get(text, []) if agent == "shopping_assistant" else _sub_agent_plan(tools, text)
+        usage = types.GenerateContentResponseUsageMetadata(
+            prompt_token_count=sum(len(str(c.parts)) for c in contents) // 4,
+            candidates_token_count=40,
+        )
+
+        if len(results) < len(plan):
+            name, args = plan[len(results)]
+            _tool_calls[agent] += 1
+            part = types.Part(function_call=types.FunctionCall(name=name, args=args))
+        else:
+            found = "; ".join(str(r.response)[:160] for r in results) or "no tools needed"
+            part = types.Part(text=f"[{agent}] Answer to '{text[:60]}': {found}")
+        return LlmResponse(content=types.Content(role="model", parts=[part]), usage_metadata=usage)
+
+
+def install_fake_llm(root_agent, latency: float) -> list:
+    """Swaps FakeLlm in for the model of root_agent and every agent it wraps as a tool."""
+    fake = FakeLlm(latency=latency)
+    agents, pending = [], [root_agent]
+    while pending:
+        agent = pending.pop()
+        agent.model = fake
+        agents.append(agent.name)
+        pending.extend(tool.agent for tool in getattr(agent, "tools", []) if hasattr(tool, "agent"))
+    return agents
+
+
+async def _monitor_loop(lags: list, interval: float = 0.01):
+    """Samples how late the event loop wakes up from a short sleep."""
+    while True:
+        started = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - started - interval)
+
+
+async def run_session(runner, user_id: str, turns: list, records: list):
+    session = await runner.session_service.create_session(app_name=APP_NAME, user_id=user_id)
+    for index, text in enumerate(turns):
+        message = types.Content(role="user", parts=[types.Part(text=text)])
+        started = time.perf_counter()
+        tool_calls = events = 0
+        final = None
+        async for event in runner.run_async(user_id=user_id, session_id=session.id, new_message=message):
+            events += 1
+            tool_calls += len(event.get_function_calls())
+            if event.is_final_response() and event.content and event.content.parts:
+                final = event.content.parts[0].text
+        records.append({
+            'turn': index,
+            'seconds': time.perf_counter() - started,
+            'tool_calls': tool_calls,
+            'events': events,
+            'answered': bool(final),
+        })
+
+
+def _summary(values: list) -> dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {}
+    pick = lambda q: ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+    return {'mean': round(statistics.fmean(ordered), 4), 'p50': round(pick(0.5), 4),
+            'p95': round(pick(0.95), 4), 'p99': round(pick(0.99), 4), 'max': round(ordered[-1], 4)}
+
+
+def _rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return 0
+
+
+async def run_level(runner, sessions: int, products: int, level: int) -> dict:
+    """Runs `sessions` conversations concurrently and measures them."""
+    records, lags = [], []
+    monitor = asyncio.create_task(_monitor_loop(lags))
+    gc.collect()
+    before = tracemalloc.take_snapshot()
+    rss_before = _rss_bytes()
+    _model_calls.clear()
+    _tool_calls.clear()
+
+    started = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # Tools print progress
+        outcomes = await asyncio.gather(*(
+            run_session(runner, f"load{level}-user{n}", conversation(PRODUCTS[n % products]), records)
+            for n in range(sessions)
+        ), return_exceptions=True)
+    elapsed = time.perf_counter() - started
+    monitor.cancel()
+
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    growth = sorted(after.compare_to(before, "lineno"), key=lambda s: s.size_diff, reverse=True)
+    errors = [repr(o) for o in outcomes if isinstance(o, BaseException)]
+
+    per_turn = {}
+    for record in records:
+        per_turn.setdefault(record['turn'], []).append(record)
+    turns = sum(len(r) for r in per_turn.values())
+    return {
+        'sessions': sessions,
+        'seconds': round(elapsed, 3),
+        'turns': turns,
+        'turns_per_sec': round(turns / elapsed, 2),
+        'errors': errors[:5],
+        'unanswered_turns': sum(not r['answered'] for r in records),
+        'turn_latency_s': _summary([r['seconds'] for r in records]),
+        'per_turn': {
+            str(turn): {
+                'latency_s': _summary([r['seconds'] for r in rs]),
+                'tool_calls': round(statistics.fmean(r['tool_calls'] for r in rs), 2),
+                'events': round(statistics.fmean(r['events'] for r in rs), 2),
+            }
+            for turn, rs in sorted(per_turn.items())
+        },
+        'model_calls': dict(_model_calls),
+        'planned_tool_calls': dict(_tool_calls),
+        'loop_lag_s': _summary(lags),
+        'memory': {
+            'traced_growth_bytes': sum(s.size_diff for s in growth),
+            'traced_growth_per_session_bytes': sum(s.size_diff for s in growth) // max(sessions, 1),
+            'rss_growth_bytes': _rss_bytes() - rss_before,
+            'top_growth': [
+                {'site': str(s.traceback[0]), 'bytes': s.size_diff, 'blocks': s.count_diff}
+                for s in growth[:10]
+            ],
+        },
+    }
+
+
+async def main_async(args) -> dict:
+    from google.adk.runners import InMemoryRunner
+    from agents.chat import agent as chat_agent
+    from tools.telemetry import get_metrics
+
+    agents = install_fake_llm(chat_agent.root_agent, args.llm_latency)
+    runner = InMemoryRunner(agent=chat_agent.root_agent, app_name=APP_NAME)
+    # One unmeasured conversation first, so lazy imports, connection pools
+    # and caches built on first use are not counted as growth
+    with contextlib.redirect_stdout(io.StringIO()):
+        await run_session(runner, "warmup", conversation(PRODUCTS[0]), [])
+    tracemalloc.start()
+
+    levels = []
+    for level, sessions in enumerate(int(s) for s in args.sessions.split(",")):
+        result = await run_level(runner, sessions, args.products, level)
+        levels.append(result)
+        latency = result['turn_latency_s']
+        print(f"sessions={sessions:<4} turns/s={result['turns_per_sec']:<8} "
+              f"turn p50={latency['p50']}s p95={latency['p95']}s "
+              f"loop lag p95={result['loop_lag_s'].get('p95')}s "
+              f"mem/session={result['memory']['traced_growth_per_session_bytes']}B "
+              f"errors={len(result['errors'])}")
+    tracemalloc.stop()
+    return {'agents': agents, 'levels': levels, 'spans': get_metrics()['spans']}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", default="1,10,50", help="concurrent sessions per level")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per fake model call")
+    parser.add_argument("--upstream-latency", type=float, default=0.02, help="seconds per stub upstream request")
+    parser.add_argument("--products", type=int, default=5, help="distinct products across sessions (cache reuse)")
+    parser.add_argument("--output", default=str(project_root / "benchmarks" / "results" / "load_harness.json"))
+    args = parser.parse_args()
+    args.products = max(1, min(args.products, len(PRODUCTS)))
+    output = Path(args.output).resolve()
+
+    stubs = [RedditStub(args.upstream_latency), IpApiStub(args.upstream_latency),
+             YouTubeStub(args.upstream_latency), SmtpSink(args.upstream_latency)]
+    with contextlib.ExitStack() as stack:
+        for server in stubs:
+            stack.enter_context(server)
+            os.environ.update(server.env())
+        os.environ.update(UNTHROTTLED, RATE_LIMIT_GEMINI="1000000/1")
+        # Caches and memory files go to a scratch directory, never data/
+        os.chdir(tempfile.mkdtemp(prefix="load_harness_"))
+        result = asyncio.run(main_async(args))
+        result['upstream_requests'] = {type(s).__name__: getattr(s, 'requests', getattr(s, 'messages', 0))
+                                       for s in stubs}
+
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'python': platform.python_version(),
+        'settings': {'sessions': args.sessions, 'llm_latency': args.llm_latency,
+                     'upstream_latency': args.upstream_latency, 'products': args.products},
+        **result,
+    }
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2, default=str))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Concurrency stress test for the sharded memory manager.
+
+Runs N threads that each store preferences, either all into one shared
+shard or each into its own user shard, with synchronous (fsync'd) saves.
+Prints throughput per thread count and checks that no write was lost.
+
+Usage:
+    python benchmarks/memory_stress.py [--ops 200] [--threads 1,2,4,8,16] [--backend json|sqlite]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+
+def run(memory_tool, backend: str, threads: int, ops: int, sharded: bool) -> dict:
+    registry = memory_tool.MemoryRegistry(
+        backend=memory_tool.create_backend(backend), write_behind=False
+    )
+    run_id = f"{'sharded' if sharded else 'shared'}{threads}"
+    barrier = threading.Barrier(threads + 1)
+
+    def worker(n: int):
+        manager = registry.get(f"{run_id}-user{n}" if sharded else run_id)
+        barrier.wait()
+        for i in range(ops):
+            manager.store(f"t{n}_k{i}", str(i))
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for w in workers:
+        w.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for w in workers:
+        w.join()
+    elapsed = time.perf_counter() - start
+
+    # Every write must be persisted in its shard
+    expected = threads * ops
+    persisted = sum(len(registry.backend.load(m.user_id)) for m in registry.managers())
+    return {
+        'backend': backend,
+        'threads': threads,
+        'mode': 'sharded' if sharded else 'shared',
+        'ops': expected,
+        'seconds': round(elapsed, 4),
+        'ops_per_sec': round(expected / elapsed, 1),
+        'lost_writes': expected - persisted,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--ops", type=int, default=200, help="stores per thread")
+    parser.add_argument("--threads", default="1,2,4,8,16")
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite"])
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="memory_stress_")
+    os.chdir(workdir)
+    from tools import memory_tool
+
+    results = []
+    for sharded in (False, True):
+        for threads in [int(t) for t in args.threads.split(",")]:
+            result = run(memory_tool, args.backend, threads, args.ops, sharded)
+            results.append(result)
+            print(f"{result['mode']:>8} threads={threads:<3} "
+                  f"{result['ops_per_sec']:>10} ops/s  lost={result['lost_writes']}")
+
+    if any(r['lost_writes'] for r in results):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
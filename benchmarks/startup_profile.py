@@ -0,0 +1,196 @@
+"""
+Cold-start import profile for the agent modules.
+
+Imports each module in a fresh interpreter under `python -X importtime`
+(one discarded warm-up run so bytecode is compiled, then --runs measured
+runs) and reports, using the median of the runs:
+
+- import time of the module and wall time of the whole process
+- the slowest modules by cumulative and by self time
+- self time per top-level package (google, pydantic, httpx, ...)
+- cumulative time of every first-party module (agents.*, tools.*)
+- which known heavy dependencies (numpy, googleapiclient, smtplib, ...)
+  were loaded at startup rather than on first use
+
+Results are written as JSON; --baseline compares import times against an
+earlier results file and exits 1 on a regression or when a heavy
+dependency that was lazy in the baseline is imported at startup again.
+
+Usage:
+    python benchmarks/startup_profile.py [--modules agents.chat.agent]
+        [--runs 5] [--top 25]
+        [--output benchmarks/results/startup_profile.json]
+        [--baseline old.json] [--threshold 0.25]
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+
+# Dependencies the tools load on first use; none should appear at startup
+HEAVY_MODULES = ("numpy", "googleapiclient", "httplib2", "requests", "bs4", "smtplib", "email.mime.text")
+
+FIRST_PARTY = ("agents", "tools")
+
+LINE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|( *)(\S+)\s*$")
+
+SNIPPET = (
+    "import sys, time\n"
+    "started = time.perf_counter()\n"
+    "import {module}\n"
+    "sys.stdout.write(repr(time.perf_counter() - started))\n"
+)
+
+
+def parse_importtime(stderr: str) -> list:
+    """Returns (module, self us, cumulative us, depth) for each importtime line, in order."""
+    entries = []
+    for line in stderr.splitlines():
+        match = LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            entries.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return entries
+
+
+def profile_once(module: str) -> dict:
+    """Imports module in a fresh interpreter; returns timings and the parsed import tree."""
+    env = dict(os.environ, TELEMETRY_DUMP_INTERVAL="0")
+    started = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", SNIPPET.format(module=module)],
+        cwd=project_root, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if proc.returncode != 0:
+        tail = proc.stderr.strip().splitlines()[-1:] or ["no output"]
+        raise RuntimeError(f"importing {module} failed: {tail[0]}")
+    return {'import_seconds': float(proc.stdout.strip()), 'process_seconds': wall,
+            'entries': parse_importtime(proc.stderr)}
+
+
+def _median_ms(values: list) -> float:
+    return round(statistics.median(values) / 1000, 2)
+
+
+def profile(module: str, runs: int, top: int) -> dict:
+    profile_once(module)  # Warm-up: compiles bytecode, fills the OS file cache
+    samples = [profile_once(module) for _ in range(runs)]
+
+    self_us = defaultdict(list)
+    cumulative_us = defaultdict(list)
+    for sample in samples:
+        for name, self_time, cumulative, _ in sample['entries']:
+            self_us[name].append(self_time)
+            cumulative_us[name].append(cumulative)
+    # Modules loaded in only some runs (import races, optional paths) count as 0 in the others
+    for times in (*self_us.values(), *cumulative_us.values()):
+        times.extend([0] * (runs - len(times)))
+
+    modules = {name: {'self_ms': _median_ms(self_us[name]), 'cumulative_ms': _median_ms(cumulative_us[name])}
+               for name in self_us}
+    packages = defaultdict(float)
+    for name, timing in modules.items():
+        packages[name.split(".")[0]] += timing['self_ms']
+
+    def ranked(key: str) -> list:
+        ordered = sorted(modules.items(), key=lambda item: item[1][key], reverse=True)
+        return [{'module': name, **timing} for name, timing in ordered[:top]]
+
+    return {
+        'module': module,
+        'runs': runs,
+        'import_ms': round(statistics.median(s['import_seconds'] for s in samples) * 1000, 1),
+        'import_ms_min': round(min(s['import_seconds'] for s in samples) * 1000, 1),
+        'process_ms': round(statistics.median(s['process_seconds'] for s in samples) * 1000, 1),
+        'modules_imported': len(modules),
+        'top_cumulative': ranked('cumulative_ms'),
+        'top_self': ranked('self_ms'),
+        'packages': dict(sorted(((k, round(v, 2)) for k, v in packages.items()),
+                                key=lambda item: item[1], reverse=True)[:top]),
+        'first_party': {name: timing['cumulative_ms'] for name, timing in sorted(modules.items())
+                        if name.split(".")[0] in FIRST_PARTY},
+        'heavy_at_startup': [name for name in HEAVY_MODULES if name in modules],
+    }
+
+
+def compare(results: list, baseline_path: Path, threshold: float) -> list:
+    """Returns (module, reason) for every regression against the baseline."""
+    baseline = {r['module']: r for r in json.loads(baseline_path.read_text())['results']}
+    regressions = []
+    for result in results:
+        old = baseline.get(result['module'])
+        if old is None:
+            continue
+        result['baseline_import_ms'] = old['import_ms']
+        if old['import_ms'] and result['import_ms'] / old['import_ms'] > 1 + threshold:
+            regressions.append((result['module'], f"import {old['import_ms']}ms -> {result['import_ms']}ms"))
+        reloaded = sorted(set(result['heavy_at_startup']) - set(old['heavy_at_startup']))
+        if reloaded:
+            regressions.append((result['module'], f"now imports {', '.join(reloaded)} at startup"))
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--modules", default="agents.chat.agent", help="comma-separated modules to import")
+    parser.add_argument("--runs", type=int, default=5, help="measured imports per module (median reported)")
+    parser.add_argument("--top", type=int, default=25, help="modules and packages listed per ranking")
+    parser.add_argument("--output", default=str(project_root / "benchmarks" / "results" / "startup_profile.json"))
+    parser.add_argument("--baseline", help="earlier results file to compare import times with")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed import time growth before failing")
+    args = parser.parse_args()
+
+    output = Path(args.output).resolve()
+    baseline = Path(args.baseline).resolve() if args.baseline else None
+
+    results = []
+    for module in (m for m in args.modules.split(",") if m):
+        result = profile(module, args.runs, args.top)
+        results.append(result)
+        print(f"{module}: import {result['import_ms']}ms (min {result['import_ms_min']}ms), "
+              f"process {result['process_ms']}ms, {result['modules_imported']} modules")
+        for entry in result['top_cumulative'][:10]:
+            print(f"  {entry['cumulative_ms']:>9}ms cumulative {entry['self_ms']:>8}ms self  {entry['module']}")
+        print(f"  heavy dependencies at startup: {', '.join(result['heavy_at_startup']) or 'none'}")
+
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {'runs': args.runs, 'top': args.top},
+        'results': results,
+    }
+
+    regressions = compare(results, baseline, args.threshold) if baseline else []
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+    for module, reason in regressions:
+        print(f"REGRESSION {module}: {reason}")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""
+Local stand-ins for the upstreams the tools call, for offline benchmarks.
+
+- RedditStub:  /search.json and /r/<sub>/comments/<id>/<slug>.json
+- IpApiStub:   /json/<ip>
+- YouTubeStub: /youtube/v3/search and /youtube/v3/videos (the paths the
+               bundled static discovery document builds)
+- SmtpSink:    accepts and discards mail (EHLO/MAIL/RCPT/DATA/NOOP/QUIT)
+
+Every server listens on 127.0.0.1 on a free port, counts the requests it
+served and can add a fixed latency per request to mimic a remote service.
+Responses are generated deterministically from the request, so runs are
+comparable. Point the tools at them with the env() of each stub.
+"""
+import hashlib
+import json
+import random
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+WORDS = (
+    "battery camera screen price update software performance charging design "
+    "display speaker build quality value heat gaming photos night mode zoom "
+    "storage support warranty upgrade bezel weight grip refresh rate audio"
+).split()
+
+
+def _rng(*parts) -> random.Random:
+    """Deterministic generator per request."""
+    seed = hashlib.sha256(repr(parts).encode()).digest()
+    return random.Random(int.from_bytes(seed[:8], "big"))
+
+
+def _short_id(*parts) -> str:
+    return hashlib.sha256(repr(parts).encode()).hexdigest()[:9]
+
+
+def _sentences(rng: random.Random, count: int) -> str:
+    return " ".join(
+        " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 16))).capitalize() + "."
+        for _ in range(count)
+    )
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Keep-alive, like the real upstreams
+    disable_nagle_algorithm = True  # Headers and body are separate writes
+
+    def do_GET(self):
+        stub = self.server.stub
+        if stub.latency:
+            time.sleep(stub.latency)
+        url = urlparse(self.path)
+        params = {k: v[0] for k, v in parse_qs(url.query).items()}
+        status, payload = stub.route(url.path, params)
+        body = json.dumps(payload).encode()
+        stub.count(len(body))
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubServer:
+    """Base class: a threaded HTTP server on a free local port."""
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.requests = 0
+        self.bytes_out = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}"
+
+    def count(self, size: int):
+        with self._lock:
+            self.requests += 1
+            self.bytes_out += size
+
+    def route(self, path: str, params: dict) -> tuple:
+        return 404, {"error": "not found"}
+
+    def env(self) -> dict:
+        return {}
+
+    def start(self):
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+        self._server.daemon_threads = True
+        self._server.stub = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+class RedditStub(StubServer):
+    """Reddit JSON search and comment listings; post_sentences sets the payload size."""
+    def __init__(self, latency: float = 0.0, posts: int = 10, post_sentences: int = 6, comments: int = 8):
+        super().__init__(latency)
+        self.posts = posts
+        self.post_sentences = post_sentences
+        self.comments = comments
+
+    def env(self) -> dict:
+        return {"REDDIT_BASE_URL": self.url}
+
+    def route(self, path: str, params: dict) -> tuple:
+        if path == "/search.json":
+            return 200, self._search(params.get("q", ""))
+        if path.startswith("/r/") and path.endswith(".json"):
+            return 200, self._comments(path)
+        return 404, {"error": "not found"}
+
+    def _search(self, query: str) -> dict:
+        rng = _rng("search", query)
+        children = []
+        for i in range(self.posts):
+            post_id = _short_id(query, i)
+            children.append({"kind": "t3", "data": {
+                "id": post_id,
+                "title": f"{query} - {' '.join(rng.choice(WORDS) for _ in range(5))}",
+                "selftext": _sentences(rng, self.post_sentences),
+                "url": f"https://www.reddit.com/r/stub/comments/{post_id}/post/",
+                "permalink": f"/r/stub/comments/{post_id}/post/",
+                "score": rng.randint(0, 5000),
+            }})
+        return {"kind": "Listing", "data": {"children": children}}
+
+    def _comments(self, path: str) -> list:
+        rng = _rng("comments", path)
+        comments = [{"kind": "t1", "data": {
+            "author": f"user{i}", "score": rng.randint(-5, 900), "body": _sentences(rng, 2),
+        }} for i in range(self.comments)]
+        return [{"kind": "Listing", "data": {"children": []}},
+                {"kind": "Listing", "data": {"children": comments}}]
+
+
+class IpApiStub(StubServer):
+    """ip-api.com JSON endpoint."""
+    CITIES = (("United States", "Austin", "America/Chicago", "USD"),
+              ("India", "Pune", "Asia/Kolkata", "INR"),
+              ("Germany", "Berlin", "Europe/Berlin", "EUR"))
+
+    def env(self) -> dict:
+        return {"IP_API_URL": f"{self.url}/json/"}
+
+    def route(self, path: str, params: dict) -> tuple:
+        if not path.startswith("/json"):
+            return 404, {"error": "not found"}
+        country, city, timezone, currency = _rng(path).choice(self.CITIES)
+        return 200, {"status": "success", "country": country, "city": city,
+                     "timezone": timezone, "currency": currency}
+
+
+class YouTubeStub(StubServer):
+    """YouTube Data API v3 search.list and videos.list."""
+    def env(self) -> dict:
+        return {"YOUTUBE_API_ENDPOINT": self.url, "YOUTUBE_API_KEY": "stub-key"}
+
+    def route(self, path: str, params: dict) -> tuple:
+        if path.endswith("/youtube/v3/search"):
+            query = params.get("q", "")
+            count = int(params.get("maxResults", 5))
+            return 200, {"items": [{
+                "id": {"kind": "youtube#video", "videoId": _short_id(query, i)},
+                "snippet": {"title": f"{query} review part {i}"},
+            } for i in range(count)]}
+        if path.endswith("/youtube/v3/videos"):
+            items = []
+            for video_id in params.get("id", "").split(","):
+                rng = _rng(video_id)
+                views = rng.randint(1_000, 5_000_000)
+                items.append({
+                    "id": video_id,
+                    "snippet": {"title": f"{rng.choice(WORDS)} {rng.choice(WORDS)} honest review",
+                                "channelTitle": f"Channel {rng.randint(1, 40)}"},
+                    "contentDetails": {"duration": f"PT{rng.randint(0, 40)}M{rng.randint(0, 59)}S"},
+                    "statistics": {"viewCount": str(views), "likeCount": str(views // rng.randint(20, 80))},
+                })
+            return 200, {"items": items}
+        return 404, {"error": {"code": 404, "message": "not found"}}
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        sink = self.server.sink
+        self.wfile.write(b"220 stub ESMTP\r\n")
+        in_data = False
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            if in_data:
+                if line == b".\r\n":
+                    in_data = False
+                    if sink.latency:
+                        time.sleep(sink.latency)
+                    sink.count()
+                    self.wfile.write(b"250 OK queued\r\n")
+                continue
+            command = line[:4].upper()
+            if command == b"EHLO":
+                self.wfile.write(b"250-stub\r\n250 8BITMIME\r\n")
+            elif command == b"DATA":
+                in_data = True
+                self.wfile.write(b"354 End data with <CR><LF>.<CR><LF>\r\n")
+            elif command == b"QUIT":
+                self.wfile.write(b"221 Bye\r\n")
+                return
+            else:
+                self.wfile.write(b"250 OK\r\n")
+
+
+class SmtpSink:
+    """Plain-text SMTP server that accepts and discards every message."""
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.messages = 0
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def count(self):
+        with self._lock:
+            self.messages += 1
+
+    def env(self) -> dict:
+        return {"SMTP_SERVER": "127.0.0.1", "SMTP_PORT": str(self.port), "SMTP_USERNAME": "bench@example.com",
+                "SMTP_PASSWORD": "stub", "SMTP_STARTTLS": "false"}
+
+    def start(self):
+        sink = self
+
+        class Server(socketserver.ThreadingTCPServer):
+            daemon_threads = True
+            allow_reuse_address = True
+
+            def verify_request(self, request, client_address):
+                with sink._lock:
+                    sink.connections += 1
+                return True
+
+        self._server = Server(("127.0.0.1", 0), _SmtpHandler)
+        self._server.sink = self
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
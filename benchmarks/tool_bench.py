@@ -0,0 +1,379 @@
+"""
+Offline latency/throughput benchmark for the agent tools.
+
+Starts local stand-ins for Reddit, ip-api, the YouTube Data API and an
+SMTP server (benchmarks/stub_servers.py), points the tools at them through
+their env overrides and measures, at each concurrency level:
+
+- scrape_reddit (cold and cached), with and without comment harvesting
+- get_user_location (cold lookups of distinct IPs, and the cached tool)
+- search_youtube (cold and cached)
+- send_email (enqueue latency, and delivery throughput through the outbox)
+- store_preference (memory store, write-behind)
+- initialize_session against 10 to 10,000 existing session files
+
+Runs that reach Reddit or ip-api also report how many requests went out on
+the shared HTTP pool and how many new connections (handshakes) they needed.
+
+Results are written as JSON; --baseline compares p95 latencies against an
+earlier results file and exits 1 on a regression.
+
+Usage:
+    python benchmarks/tool_bench.py [--concurrency 1,4,16,64] [--ops 64]
+        [--session-files 10,100,1000,10000] [--latency 0.02]
+        [--backend json|sqlite] [--only reddit,location,...]
+        [--output benchmarks/results/tool_bench.json]
+        [--baseline old.json] [--threshold 0.25]
+"""
+import argparse
+import asyncio
+import contextlib
+import itertools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+# Add project root to path
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from benchmarks.stub_servers import IpApiStub, RedditStub, SmtpSink, YouTubeStub
+
+BENCHMARKS = ("reddit", "location", "youtube", "email", "memory", "session")
+
+# Limits high enough that the stubs, not the rate limiters, are measured
+UNTHROTTLED = {
+    "RATE_LIMIT_REDDIT": "1000000/1",
+    "RATE_LIMIT_IP_API": "1000000/1",
+    "RATE_LIMIT_YOUTUBE": "1000000/1",
+    "TELEMETRY_DUMP_INTERVAL": "0",
+}
+
+_unique = itertools.count()
+
+
+def _percentile(ordered: list, q: float) -> float:
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def _is_error(result) -> bool:
+    return isinstance(result, str) and result.startswith(("Error", "Failed"))
+
+
+def _pool_counts() -> tuple:
+    """(requests sent, connections opened) over the shared HTTP client's pools."""
+    from tools.http_client import get_pool_stats
+    stats = get_pool_stats()
+    return stats['requests'], stats['connections']
+
+
+def measure(name: str, call, concurrency: int, ops: int, **labels) -> dict:
+    """
+    Runs call(i) for i in range(ops) on `concurrency` threads.
+    Returns latency percentiles (ms), throughput and the error count, plus
+    new vs. reused pooled HTTP connections when the calls made requests.
+    """
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            result = call(i)
+        except Exception as e:
+            result = f"Error: {e}"
+        return time.perf_counter() - started, _is_error(result)
+
+    requests_before, connections_before = _pool_counts()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        started = time.perf_counter()
+        results = list(pool.map(timed, range(ops)))
+        elapsed = time.perf_counter() - started
+    requests_after, connections_after = _pool_counts()
+
+    latencies = sorted(r[0] for r in results)
+    result = {
+        'benchmark': name,
+        'concurrency': concurrency,
+        **labels,
+        'ops': ops,
+        'errors': sum(r[1] for r in results),
+        'seconds': round(elapsed, 4),
+        'ops_per_sec': round(ops / elapsed, 1),
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3),
+    }
+    for q in (0.5, 0.95, 0.99):
+        result[f'p{int(q * 100)}_ms'] = round(_percentile(latencies, q) * 1000, 3)
+    if requests_after > requests_before:
+        result['http_requests'] = requests_after - requests_before
+        result['http_connections'] = connections_after - connections_before
+        result['http_reused'] = result['http_requests'] - result['http_connections']
+    return result
+
+
+def _prime(call, keys: int = 8):
+    """Fills the caches for the warm runs (keys distinct calls)."""
+    for i in range(keys):
+        call(i)
+
+
+def bench_reddit(levels, ops):
+    from tools.reddit_tool import scrape_reddit as scrape_reddit_async
+
+    def scrape_reddit(*args):
+        return asyncio.run(scrape_reddit_async(*args))
+
+    results = []
+    for concurrency in levels:
+        run = next(_unique)
+        results.append(measure("scrape_reddit", lambda i: scrape_reddit(f"phone {run} {i}"),
+                               concurrency, ops, cache="cold"))
+        results.append(measure("scrape_reddit", lambda i: scrape_reddit(f"phone comments {run} {i}", True),
+                               concurrency, ops, cache="cold", comments=True))
+        _prime(lambda i: scrape_reddit(f"phone {run} {i % 8}"))
+        results.append(measure("scrape_reddit", lambda i: scrape_reddit(f"phone {run} {i % 8}"),
+                               concurrency, ops, cache="warm"))
+    return results
+
+
+def bench_location(levels, ops):
+    from tools.location_tool import get_user_location, get_user_location_data
+    results = []
+    for concurrency in levels:
+        run = next(_unique)
+
+        def cold(i):
+            n = run * 100_000 + i
+            return get_user_location_data(f"10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}")['error']
+
+        results.append(measure("get_user_location", cold, concurrency, ops, cache="cold"))
+        _prime(lambda i: get_user_location())
+        results.append(measure("get_user_location", lambda i: get_user_location(),
+                               concurrency, ops, cache="warm"))
+    return results
+
+
+def bench_youtube(levels, ops):
+    from tools.youtube_tool import search_youtube as search_youtube_async
+
+    def search_youtube(query):
+        return asyncio.run(search_youtube_async(query))
+
+    results = []
+    for concurrency in levels:
+        run = next(_unique)
+        results.append(measure("search_youtube", lambda i: search_youtube(f"laptop {run} {i}"),
+                               concurrency, ops, cache="cold"))
+        _prime(lambda i: search_youtube(f"laptop {run} {i % 8}"))
+        results.append(measure("search_youtube", lambda i: search_youtube(f"laptop {run} {i % 8}"),
+                               concurrency, ops, cache="warm"))
+    return results
+
+
+def bench_email(levels, ops, sink):
+    from tools.email_tool import _outbox, get_outbox_stats, send_email
+    results = []
+    for concurrency in levels:
+        before = sink.messages
+        result = measure("send_email", lambda i: send_email("bench@example.com", f"Bench {i}", "Body " * 200),
+                         concurrency, ops)
+        # Enqueueing is asynchronous; also time until the sink has every message
+        started = time.perf_counter()
+        _outbox.drain(timeout=60)
+        delivered = sink.messages - before
+        result['delivered'] = delivered
+        result['delivery_seconds'] = round(result['seconds'] + time.perf_counter() - started, 4)
+        result['delivered_per_sec'] = round(delivered / result['delivery_seconds'], 1)
+        results.append(result)
+    stats = get_outbox_stats()
+    for result in results:
+        result['smtp_connections'] = sink.connections
+        result['outbox'] = stats
+    return results
+
+
+def bench_memory(levels, ops):
+    from tools import memory_tool
+    results = []
+    for concurrency in levels:
+        run = next(_unique)
+        users = [SimpleNamespace(user_id=f"bench{run}-user{n}") for n in range(concurrency)]
+        result = measure(
+            "store_preference",
+            lambda i: memory_tool.store_preference(f"key{i}", f"value {i}", users[i % concurrency]),
+            concurrency, ops,
+        )
+        started = time.perf_counter()
+        memory_tool.flush_memory()
+        result['flush_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        results.append(result)
+    return results
+
+
+def _write_session_files(count: int):
+    """count session files spread over 50 users, oldest first."""
+    from tools import memory_tool
+    memory_tool.MEMORY_DIR.mkdir(parents=True, exist_ok=True)
+    now = time.time()
+    for n in range(count):
+        user = f"user{n % 50}"
+        session = f"{1_600_000_000 + n}" + ("" if user == "user0" else f"__{user}")
+        path = memory_tool.MEMORY_DIR / f"session_{session}.json"
+        path.write_text(json.dumps({
+            'user_email': f"{user}@example.com", 'budget': str(100 + n),
+            f'note{n % 7}': "x" * 40,
+        }))
+        os.utime(path, (now - count + n, now - count + n))
+
+
+def bench_session(levels, ops, file_counts, backend_name):
+    from tools import memory_tool
+    from tools.session_manager import initialize_session
+    root = Path.cwd()
+    results = []
+    for count in file_counts:
+        # Each data size gets its own memory directory and a fresh registry
+        workdir = root / f"sessions_{count}"
+        workdir.mkdir()
+        os.chdir(workdir)
+        try:
+            _write_session_files(count)
+            backend = memory_tool.create_backend(backend_name)
+            if backend_name == "sqlite":
+                from tools.memory_sqlite import migrate_json_to_sqlite
+                migrate_json_to_sqlite(backend)
+            memory_tool._registry = memory_tool.MemoryRegistry(backend=backend)
+            users = [SimpleNamespace(user_id=f"user{n}") for n in range(50)]
+            # The first call builds the index from the session files
+            results.append(measure("initialize_session", lambda i: initialize_session(users[0]),
+                                   1, 1, session_files=count, backend=backend_name, phase="cold"))
+            for concurrency in levels:
+                results.append(measure("initialize_session", lambda i: initialize_session(users[i % 50]),
+                                       concurrency, ops, session_files=count, backend=backend_name, phase="warm"))
+        finally:
+            os.chdir(root)
+    return results
+
+
+def _key(result: dict) -> tuple:
+    skip = {'ops', 'errors', 'seconds', 'ops_per_sec', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms',
+            'delivered', 'delivery_seconds', 'delivered_per_sec', 'smtp_connections', 'outbox', 'flush_ms',
+            'http_requests', 'http_connections', 'http_reused'}
+    return tuple(sorted((k, v) for k, v in result.items() if k not in skip))
+
+
+def compare(results: list, baseline_path: Path, threshold: float) -> list:
+    """Returns results whose p95 grew by more than threshold over the baseline."""
+    baseline = {_key(r): r for r in json.loads(baseline_path.read_text())['results']}
+    regressions = []
+    for result in results:
+        old = baseline.get(_key(result))
+        if old is None or not old['p95_ms']:
+            continue
+        ratio = result['p95_ms'] / old['p95_ms']
+        result['baseline_p95_ms'] = old['p95_ms']
+        if ratio > 1 + threshold:
+            regressions.append(result)
+    return regressions
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=project_root,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--concurrency", default="1,4,16,64")
+    parser.add_argument("--ops", type=int, default=64, help="calls per benchmark and concurrency level")
+    parser.add_argument("--session-files", default="10,100,1000,10000")
+    parser.add_argument("--latency", type=float, default=0.02, help="seconds each stub upstream adds per request")
+    parser.add_argument("--backend", default="json", choices=["json", "sqlite"])
+    parser.add_argument("--only", default=",".join(BENCHMARKS))
+    parser.add_argument("--output", default=str(project_root / "benchmarks" / "results" / "tool_bench.json"))
+    parser.add_argument("--baseline", help="earlier results file to compare p95 latencies with")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed p95 growth before failing")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",")]
+    file_counts = [int(c) for c in args.session_files.split(",")]
+    selected = [b for b in args.only.split(",") if b]
+    unknown = set(selected) - set(BENCHMARKS)
+    if unknown:
+        parser.error(f"unknown benchmarks: {', '.join(sorted(unknown))}")
+    output = Path(args.output).resolve()
+    baseline = Path(args.baseline).resolve() if args.baseline else None
+
+    stubs = [RedditStub(args.latency), IpApiStub(args.latency), YouTubeStub(args.latency)]
+    sink = SmtpSink(args.latency)
+    with contextlib.ExitStack() as stack:
+        for server in (*stubs, sink):
+            stack.enter_context(server)
+            os.environ.update(server.env())
+        os.environ.update(UNTHROTTLED)
+        os.environ["MEMORY_BACKEND"] = args.backend
+        # Caches and memory files go to a scratch directory, never data/
+        os.chdir(tempfile.mkdtemp(prefix="tool_bench_"))
+
+        runners = {
+            'reddit': lambda: bench_reddit(levels, args.ops),
+            'location': lambda: bench_location(levels, args.ops),
+            'youtube': lambda: bench_youtube(levels, args.ops),
+            'email': lambda: bench_email(levels, args.ops, sink),
+            'memory': lambda: bench_memory(levels, args.ops),
+            'session': lambda: bench_session(levels, args.ops, file_counts, args.backend),
+        }
+        results = []
+        for name in selected:
+            for result in runners[name]():
+                results.append(result)
+                labels = " ".join(f"{k}={v}" for k, v in result.items()
+                                  if k in ('cache', 'comments', 'session_files', 'phase'))
+                pooled = (f" http={result['http_requests']} new={result['http_connections']}"
+                          if 'http_requests' in result else "")
+                print(f"{result['benchmark']:>18} c={result['concurrency']:<3} {labels:<28} "
+                      f"p50={result['p50_ms']:>9}ms p95={result['p95_ms']:>9}ms "
+                      f"{result['ops_per_sec']:>9} ops/s errors={result['errors']}{pooled}")
+        upstream_requests = {type(s).__name__: s.requests for s in stubs}
+        upstream_requests['SmtpSink'] = sink.messages
+
+    from tools.http_client import get_pool_stats
+    from tools.telemetry import get_metrics
+    from tools.text_digest import get_digest_stats
+    report = {
+        'generated_at': datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'settings': {'concurrency': levels, 'ops': args.ops, 'session_files': file_counts,
+                     'stub_latency': args.latency, 'backend': args.backend},
+        'upstream_requests': upstream_requests,
+        'connection_pools': get_pool_stats(),
+        'results': results,
+        'spans': get_metrics()['spans'],
+        'digest': get_digest_stats(),
+    }
+
+    regressions = compare(results, baseline, args.threshold) if baseline else []
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Results written to {output}")
+
+    for result in regressions:
+        print(f"REGRESSION {result['benchmark']} c={result['concurrency']}: "
+              f"p95 {result['baseline_p95_ms']}ms -> {result['p95_ms']}ms")
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,13 @@ def main():
     print("Starting Multi-Agent Shopping Assistant...")
     print("---------------------------------------")
     
+    # Compact old session data and enforce retention before serving
+    try:
+        from tools.memory_tool import compact_sessions
+        print(f"Memory compaction: {compact_sessions()}")
+    except Exception as e:
+        print(f"Warning: Memory compaction failed: {e}")
+    
     try:
         # Run ADK Web Interface on the agents directory
         # This will discover all agent subdirectories
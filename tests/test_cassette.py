@@ -0,0 +1,64 @@
+import asyncio
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "benchmarks"))
+
+from stub_servers import RedditStub  # noqa: E402
+from tools import cassette, disk_cache, reddit_tool  # noqa: E402
+
+
+@pytest.fixture
+def reddit(tmp_path, monkeypatch):
+    """Reddit stub, with a tool cache and cassette in tmp_path."""
+    with RedditStub() as stub:
+        monkeypatch.setattr(reddit_tool, "REDDIT_URL", stub.url)
+        monkeypatch.setattr(disk_cache, "_cache", disk_cache.DiskCache(tmp_path / "tool_cache.db"))
+        monkeypatch.setattr(cassette, "TOOL_IO_LATENCY_SCALE", 0.0)
+        yield stub
+
+
+def _use_cassette(monkeypatch, mode: str, path: Path):
+    monkeypatch.setattr(cassette, "TOOL_IO_MODE", mode)
+    monkeypatch.setattr(cassette, "_cassette", cassette.Cassette(path))
+
+
+def test_record_then_replay_with_warm_cache(reddit, tmp_path, monkeypatch):
+    live = asyncio.run(reddit_tool.scrape_reddit("phone"))
+    assert reddit.requests == 1
+    # The warm cache must not hide the search from the recording
+    _use_cassette(monkeypatch, "record", tmp_path / "tool_io.jsonl.gz")
+    assert asyncio.run(reddit_tool.scrape_reddit("phone")) == live
+    assert reddit.requests == 2
+    cassette.get_cassette().close()
+    assert cassette.get_cassette().stats['recorded'] == 1
+
+    reddit.stop()
+    _use_cassette(monkeypatch, "replay", tmp_path / "tool_io.jsonl.gz")
+    assert asyncio.run(reddit_tool.scrape_reddit("phone")) == live
+    assert cassette.get_cassette().stats == {'recorded': 0, 'replayed': 1, 'misses': 0}
+
+
+def test_search_cache_is_bypassed_while_recording(reddit, tmp_path, monkeypatch):
+    from google.adk.models import LlmRequest, LlmResponse
+    from google.genai import types
+
+    from tools import search_cache
+
+    question = types.Content(role="user", parts=[types.Part(text="best phone under 500 in India")])
+    request = LlmRequest(model="gemini-2.5-flash", contents=[question])
+    answer = LlmResponse(content=types.Content(role="model", parts=[types.Part(text="Phone X")]))
+    key = disk_cache.make_key(search_cache.TOOL, request.model,
+                              search_cache.normalize_question("best phone under 500 in India"))
+    disk_cache.get_disk_cache().set(key, search_cache.TOOL, answer.model_dump(mode="json", exclude_none=True))
+
+    def before_model():
+        return asyncio.run(search_cache.search_cache_before_model(SimpleNamespace(state={}), request))
+
+    assert before_model().content.parts[0].text == "Phone X"
+    for mode in ("record", "replay"):
+        _use_cassette(monkeypatch, mode, tmp_path / "tool_io.jsonl.gz")
+        assert before_model() is None
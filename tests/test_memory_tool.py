@@ -0,0 +1,47 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from tools import memory_tool
+
+
+@pytest.fixture
+def registry(tmp_path, monkeypatch):
+    """A fresh registry over data/memory in an empty working directory."""
+    monkeypatch.chdir(tmp_path)
+    registry = memory_tool.MemoryRegistry(backend=memory_tool.JsonFileBackend(), write_behind=False)
+    monkeypatch.setattr(memory_tool, "_registry", registry)
+    return registry
+
+
+def _write_legacy_session(session_id: str, data: dict):
+    memory_tool.MEMORY_DIR.mkdir(parents=True, exist_ok=True)
+    (memory_tool.MEMORY_DIR / f"session_{session_id}.json").write_text(json.dumps(data))
+
+
+def test_agent_user_reads_legacy_default_shard(registry):
+    # Stored before sharding: session_<ts>.json belongs to DEFAULT_USER
+    _write_legacy_session("1700000000", {"user_email": "b@x.com", "budget": "500"})
+    tool_context = SimpleNamespace(user_id="user")
+
+    assert memory_tool.get_from_previous_sessions("user_email", tool_context) == "b@x.com"
+    assert memory_tool.get_many_from_previous_sessions(("user_email", "budget"), "user") == {
+        "user_email": "b@x.com", "budget": "500",
+    }
+
+
+def test_user_shard_wins_over_default_shard(registry):
+    _write_legacy_session("1700000000", {"user_email": "old@x.com"})
+    tool_context = SimpleNamespace(user_id="user")
+
+    memory_tool.store_preference("user_email", "new@x.com", tool_context)
+
+    assert memory_tool.get_from_previous_sessions("user_email", tool_context) == "new@x.com"
+    assert memory_tool.get_from_previous_sessions("user_email") == "old@x.com"
+
+
+def test_default_shard_does_not_read_user_shards(registry):
+    memory_tool.store_preference("budget", "900", SimpleNamespace(user_id="user"))
+
+    assert memory_tool.get_from_previous_sessions("budget") is None
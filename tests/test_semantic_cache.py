@@ -0,0 +1,47 @@
+import pytest
+
+from tools.semantic_cache import SemanticIndex, analyze, similarity
+
+# Same question asked for different countries, in free text as the
+# orchestrator sends it (no "(User location: ...)" suffix)
+COUNTRY_PAIRS = [
+    ("Sony WH-1000XM5 headphones price in India", "Sony WH-1000XM5 headphones price in Japan"),
+    ("MacBook Pro 14 M4 price in Australia", "MacBook Pro 14 M4 price in Austria"),
+    ("Galaxy S24 price in the US", "Galaxy S24 price in Canada"),
+    ("Pixel 10 price in the UK", "Pixel 10 price in Germany"),
+    ("iPhone 16 price in rupees", "iPhone 16 price in yen"),
+    ("Pixel 10 price (User location: India, INR)", "Pixel 10 price in Japan"),
+]
+
+PARAPHRASE_PAIRS = [
+    ("Pixel 10 price (User location: India, INR)",
+     "Price of the google pixel 10 (User location: India, INR)"),
+    ("Samsung Galaxy S24 price in USA", "Samsung Galaxy S24 price in the US"),
+    ("Pixel 10 price in rupees", "Pixel 10 price in INR"),
+]
+
+
+def _matches(a: str, b: str, threshold: float = 0.7) -> bool:
+    (fa, ta), (fb, tb) = analyze(a), analyze(b)
+    return fa == fb and similarity(ta, tb) >= threshold
+
+
+@pytest.mark.parametrize("a,b", COUNTRY_PAIRS)
+def test_different_countries_never_match(a, b):
+    assert not _matches(a, b)
+
+
+@pytest.mark.parametrize("a,b", PARAPHRASE_PAIRS)
+def test_paraphrases_in_the_same_country_match(a, b):
+    assert _matches(a, b)
+
+
+def test_intent_is_a_hard_mismatch():
+    assert not _matches("Samsung Galaxy S24 price in USA", "Samsung Galaxy S24 review in USA")
+
+
+def test_index_lookup_keeps_countries_apart(tmp_path):
+    index = SemanticIndex(path=tmp_path / "index.db")
+    index.add("search_agent", "india", "Sony WH-1000XM5 headphones price in India")
+    assert index.lookup("search_agent", "Sony WH-1000XM5 headphones price in Japan") == []
+    assert [key for key, _ in index.lookup("search_agent", "sony wh-1000xm5 headphone prices in india")] == ["india"]
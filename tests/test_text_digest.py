@@ -0,0 +1,32 @@
+from tools.text_digest import digest, estimate_tokens, truncate
+
+LONG = " ".join(f"Sentence number {n} talks about battery life and the camera." for n in range(40))
+
+
+def _items(count=5, comments=3):
+    return [
+        {'header': f"Title: post {i}\nLink: https://example.com/{i}",
+         'fields': [("Summary: ", f"Post {i}. " + LONG)]
+                   + [(f"Comment [{c}]: ", f"Comment {c} on post {i}. " + LONG) for c in range(comments)]}
+        for i in range(count)
+    ]
+
+
+def test_truncate_cuts_on_word_boundary():
+    assert truncate("short text", 200) == "short text"
+    cut = truncate(LONG, 200)
+    assert len(cut) <= 203 and cut.endswith("...")
+    assert LONG.startswith(cut[:-3])
+
+
+def test_field_cap_bounds_input_and_output():
+    text, stats = digest(_items(), token_budget=10_000, field_chars=200)
+    # Savings are measured against the capped payload, not the raw text
+    assert stats['tokens_in'] < estimate_tokens(LONG) * 5
+    assert stats['tokens_out'] <= stats['tokens_in']
+
+
+def test_output_stays_within_budget():
+    for budget in (100, 250, 400):
+        text, stats = digest(_items(), token_budget=budget, field_chars=200)
+        assert estimate_tokens(text) <= budget + len(_items())
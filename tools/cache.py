@@ -0,0 +1,99 @@
+import re
+import threading
+import time
+from collections import OrderedDict
+
+# Words that do not change what a product query is about
+STOP_WORDS = frozenset({
+    "a", "an", "the", "and", "or", "of", "for", "to", "in", "on", "with", "about",
+    "is", "are", "it", "its", "vs", "versus", "what", "how", "which", "should", "i",
+    "me", "my", "any", "best", "good", "worth", "buy", "buying",
+    "review", "reviews", "opinion", "opinions", "thoughts", "experience", "experiences",
+    "reddit",
+})
+
+
+def normalize_query(query: str) -> str:
+    """
+    Normalizes a search query into a cache key.
+    Lowercases, drops punctuation and stop-words, and sorts the remaining
+    words, so "Pixel 10 review" and "pixel 10" share one key.
+    Falls back to the lowercased words if everything was a stop-word.
+    """
+    words = re.findall(r"[a-z0-9]+", query.lower())
+    kept = sorted(set(w for w in words if w not in STOP_WORDS))
+    return " ".join(kept or words)
+
+
+# Function words only: a question's answer changes with "price", "worth",
+# "vs", "best", "how" and the like, so those are not dropped here
+QUESTION_STOP_WORDS = frozenset({
+    "a", "an", "the", "and", "of", "to", "in", "on", "with", "about",
+    "is", "are", "it", "its", "i", "me", "my", "please",
+})
+
+
+def normalize_question(question: str) -> str:
+    """
+    Normalizes a free-form question (e.g. a search_agent request) into a
+    cache key. Unlike normalize_query it keeps intent words, so
+    "Is Pixel 10 worth buying" and "Pixel 10 specs" get different keys;
+    only case, punctuation, function words and word order are ignored.
+    """
+    words = re.findall(r"[a-z0-9]+", question.lower())
+    kept = sorted(set(w for w in words if w not in QUESTION_STOP_WORDS))
+    return " ".join(kept or words)
+
+
+class TTLCache:
+    """
+    Thread-safe, bounded in-process cache with per-entry TTL and LRU eviction.
+    Keeps hit/miss/eviction counters for get_stats().
+    """
+    def __init__(self, maxsize: int = 256, ttl: float = 900.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'expirations': 0}
+
+    def get(self, key, default=None):
+        """Returns the cached value and marks it recently used, or default."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                self._stats['misses'] += 1
+                return default
+            value, expires_at = item
+            if expires_at <= time.monotonic():
+                del self._data[key]
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return default
+            self._data.move_to_end(key)
+            self._stats['hits'] += 1
+            return value
+
+    def set(self, key, value, ttl: float = None):
+        """Stores a value, evicting the least recently used entries beyond maxsize."""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return dict(
+                self._stats,
+                size=len(self._data),
+                maxsize=self.maxsize,
+                hit_rate=round(self._stats['hits'] / lookups, 3) if lookups else 0.0,
+            )
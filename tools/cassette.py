@@ -0,0 +1,247 @@
+import asyncio
+import atexit
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+# Configuration
+# off: live I/O. record: live I/O, every response appended to the cassette.
+# replay: responses served from the cassette; nothing leaves the machine.
+TOOL_IO_MODE = os.getenv("TOOL_IO_MODE", "off").lower()
+# Gzipped JSON lines; recording appends, so delete the file to start over
+TOOL_IO_CASSETTE = Path(os.getenv("TOOL_IO_CASSETTE", "data/cassettes/tool_io.jsonl.gz"))
+# Replay delay per response: "recorded" (as measured while recording) or fixed seconds,
+# multiplied by TOOL_IO_LATENCY_SCALE (0 replays as fast as possible)
+TOOL_IO_LATENCY = os.getenv("TOOL_IO_LATENCY", "recorded")
+TOOL_IO_LATENCY_SCALE = float(os.getenv("TOOL_IO_LATENCY_SCALE", "1.0"))
+
+MODES = ("off", "record", "replay")
+if TOOL_IO_MODE not in MODES:
+    print(f"Warning: unknown TOOL_IO_MODE '{TOOL_IO_MODE}', using 'off'")
+    TOOL_IO_MODE = "off"
+
+# Query parameters never written to a cassette (YouTube sends its API key as ?key=)
+SECRET_PARAMS = frozenset({"key", "api_key", "apikey", "token", "access_token", "password"})
+
+# Session state key (temp: is never persisted) carrying a model request from
+# before_model to after_model while recording
+STATE_KEY = "temp:cassette_llm"
+
+
+class CassetteMiss(Exception):
+    """Replay found no recording for a request."""
+
+
+def active() -> bool:
+    return TOOL_IO_MODE != "off"
+
+
+def redact_url(url: str, params: dict = None) -> str:
+    """URL with params merged into a sorted query string and secrets removed."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    if params:
+        query += [(k, str(v)) for k, v in params.items()]
+    query = sorted((k, "REDACTED" if k.lower() in SECRET_PARAMS else v) for k, v in query)
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+
+def request_id(kind: str, request: dict) -> str:
+    payload = json.dumps([kind, request], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+
+class Cassette:
+    """
+    Recorded external I/O: one gzipped JSON line per response,
+        {"k": kind, "s": scope, "id": request id, "req": request,
+         "res": response, "t": seconds, "at": timestamp}
+    Replay matches a request by id, in recorded order when the same request
+    was made more than once. Scopes marked sequential (model calls, agent
+    delegation) fall back to the next unused recording of the scope, so a
+    conversation whose prompts contain volatile values (ids, timestamps)
+    still replays turn by turn.
+
+    Recording appends from one process; run one worker while recording.
+    """
+    def __init__(self, path: Path = TOOL_IO_CASSETTE):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._file = None
+        self._scopes = None
+        self.stats = {'recorded': 0, 'replayed': 0, 'misses': 0}
+
+    def _load(self) -> dict:
+        if self._scopes is None:
+            self._scopes = {}
+            try:
+                with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                    for line in f:
+                        entry = json.loads(line)
+                        entry["used"] = False
+                        self._scopes.setdefault(entry["s"], []).append(entry)
+            except FileNotFoundError:
+                print(f"Warning: no cassette at {self.path}; every replayed request will miss")
+            except (EOFError, OSError, ValueError) as e:
+                # A recording cut short keeps the lines that were complete
+                print(f"Warning: cassette {self.path} is truncated: {e}")
+        return self._scopes
+
+    def lookup(self, kind: str, request: dict, scope: str = None, sequential: bool = False):
+        """Returns the recorded entry for request (marking it used), or None."""
+        key = request_id(kind, request)
+        with self._lock:
+            entries = self._load().get(scope or kind, [])
+            matches = [e for e in entries if e["id"] == key]
+            entry = next((e for e in matches if not e["used"]), matches[-1] if matches else None)
+            if entry is None and sequential:
+                entry = next((e for e in entries if not e["used"]), None)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            entry["used"] = True
+            self.stats['replayed'] += 1
+            return entry
+
+    def record(self, kind: str, request: dict, response, seconds: float, scope: str = None):
+        line = json.dumps({
+            "k": kind, "s": scope or kind, "id": request_id(kind, request), "req": request,
+            "res": response, "t": round(seconds, 4), "at": round(time.time(), 3),
+        }, ensure_ascii=False, separators=(",", ":"), default=str)
+        with self._lock:
+            if self._file is None:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+                self._file = gzip.open(self.path, "at", encoding="utf-8")
+            self._file.write(line + "\n")
+            self._file.flush()
+            self.stats['recorded'] += 1
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+
+def replay_delay(entry: dict) -> float:
+    base = entry["t"] if TOOL_IO_LATENCY == "recorded" else float(TOOL_IO_LATENCY)
+    return max(base * TOOL_IO_LATENCY_SCALE, 0.0)
+
+
+def play(kind: str, request: dict, live, scope: str = None, sequential: bool = False):
+    """
+    Runs live() and returns its (JSON-serializable) response, recording it
+    in record mode; in replay mode returns the recording after the
+    simulated latency instead. request identifies the call and must not
+    contain secrets. Raises CassetteMiss if replay has no recording.
+    """
+    if TOOL_IO_MODE == "replay":
+        entry = get_cassette().lookup(kind, request, scope, sequential)
+        if entry is None:
+            raise CassetteMiss(f"no recorded {kind} response for {json.dumps(request, default=str)[:200]}")
+        time.sleep(replay_delay(entry))
+        return entry["res"]
+    if TOOL_IO_MODE == "record":
+        started = time.perf_counter()
+        response = live()
+        get_cassette().record(kind, request, response, time.perf_counter() - started, scope)
+        return response
+    return live()
+
+
+async def play_async(kind: str, request: dict, live, scope: str = None, sequential: bool = False):
+    """play() for coroutine functions: live() returns an awaitable."""
+    if TOOL_IO_MODE == "replay":
+        entry = get_cassette().lookup(kind, request, scope, sequential)
+        if entry is None:
+            raise CassetteMiss(f"no recorded {kind} response for {json.dumps(request, default=str)[:200]}")
+        await asyncio.sleep(replay_delay(entry))
+        return entry["res"]
+    if TOOL_IO_MODE == "record":
+        started = time.perf_counter()
+        response = await live()
+        get_cassette().record(kind, request, response, time.perf_counter() - started, scope)
+        return response
+    return await live()
+
+
+def _llm_request(callback_context, llm_request) -> dict:
+    """
+    Identity of a model call: agent, model and the conversation's text and
+    tool calls. Tool results are named but not included, since they carry
+    run-specific values (delivery ids, timestamps).
+    """
+    contents = []
+    for content in llm_request.contents or []:
+        for part in content.parts or []:
+            if part.text:
+                contents.append([content.role, "text", part.text])
+            elif part.function_call:
+                contents.append([content.role, "call", part.function_call.name, part.function_call.args])
+            elif part.function_response:
+                contents.append([content.role, "result", part.function_response.name])
+    return {"agent": callback_context.agent_name, "model": llm_request.model, "contents": contents}
+
+
+async def cassette_before_model(callback_context, llm_request):
+    """
+    before_model_callback (first in the list): replays the agent's model
+    call - Google Search grounding included - or marks it for recording.
+    A replay miss falls through to the remaining callbacks and the model.
+    """
+    if TOOL_IO_MODE == "off":
+        return None
+    request = _llm_request(callback_context, llm_request)
+    if TOOL_IO_MODE == "record":
+        callback_context.state[STATE_KEY] = {"request": request, "started": time.perf_counter()}
+        return None
+
+    entry = get_cassette().lookup("llm", request, f"llm:{request['agent']}", sequential=True)
+    if entry is None:
+        print(f"Warning: no recorded model response for {request['agent']}, calling the model")
+        return None
+    await asyncio.sleep(replay_delay(entry))
+    from google.adk.models import LlmResponse
+    return LlmResponse.model_validate(entry["res"])
+
+
+async def cassette_after_model(callback_context, llm_response):
+    """after_model_callback (first in the list): records the model's response."""
+    pending = callback_context.state.get(STATE_KEY) if TOOL_IO_MODE == "record" else None
+    if not pending or llm_response.partial:
+        return None
+    callback_context.state[STATE_KEY] = None
+    request = pending["request"]
+    get_cassette().record(
+        "llm", request, llm_response.model_dump(mode="json", exclude_none=True),
+        time.perf_counter() - pending["started"], f"llm:{request['agent']}",
+    )
+    return None
+
+
+_cassette = None
+_cassette_lock = threading.Lock()
+
+
+def get_cassette() -> Cassette:
+    """Returns the process-wide cassette (opened on first use)."""
+    global _cassette
+    if _cassette is None:
+        with _cassette_lock:
+            if _cassette is None:
+                _cassette = Cassette()
+                atexit.register(_cassette.close)
+    return _cassette
+
+
+def get_cassette_stats() -> dict:
+    """
+    Returns the I/O mode, cassette path and recorded/replayed/missed counts.
+    """
+    stats = dict(get_cassette().stats) if _cassette is not None else {'recorded': 0, 'replayed': 0, 'misses': 0}
+    return {'mode': TOOL_IO_MODE, 'cassette': str(TOOL_IO_CASSETTE), **stats}
@@ -1,59 +1,358 @@
-import requests
-import json
+import asyncio
+import atexit
+import os
+import random
+import threading
+import time
+from typing import TYPE_CHECKING
 
-def call_search_agent(query: str):
+from tools import cassette
+from tools.singleflight import single_flight
+from tools.telemetry import traced
+
+if TYPE_CHECKING:
+    import httpx
+
+# Configuration
+# Endpoint of each agent: DELEGATION_URL_<AGENT_NAME> overrides the template,
+# e.g. DELEGATION_URL_SEARCH_AGENT=http://search-host:8000/chat
+DELEGATION_BASE_URL = os.getenv("DELEGATION_BASE_URL", "http://127.0.0.1:8000")
+DELEGATION_URL_TEMPLATE = os.getenv("DELEGATION_URL_TEMPLATE", "{base}/agents/{agent}/chat")
+DELEGATION_TIMEOUT = float(os.getenv("DELEGATION_TIMEOUT", "30"))
+DELEGATION_CONNECT_TIMEOUT = float(os.getenv("DELEGATION_CONNECT_TIMEOUT", "3.05"))
+DELEGATION_MAX_CONNECTIONS = int(os.getenv("DELEGATION_MAX_CONNECTIONS", "20"))
+# Retries after the first attempt, with full-jitter exponential backoff (seconds)
+DELEGATION_RETRIES = int(os.getenv("DELEGATION_RETRIES", "2"))
+DELEGATION_BACKOFF = float(os.getenv("DELEGATION_BACKOFF", "0.5"))
+DELEGATION_BACKOFF_MAX = float(os.getenv("DELEGATION_BACKOFF_MAX", "8"))
+# Consecutive failures that open an agent's circuit, and seconds before a trial call
+DELEGATION_BREAKER_THRESHOLD = int(os.getenv("DELEGATION_BREAKER_THRESHOLD", "5"))
+DELEGATION_BREAKER_COOLDOWN = float(os.getenv("DELEGATION_BREAKER_COOLDOWN", "30"))
+# Send a backup request if the first has not answered after this many seconds (0 = off)
+DELEGATION_HEDGE_AFTER = float(os.getenv("DELEGATION_HEDGE_AFTER", "0"))
+
+# Read-only agents may be retried after a timeout and hedged; the others
+# (sending email, storing preferences) are only retried if the request
+# never reached them
+IDEMPOTENT_AGENTS = ("search_agent", "reddit_agent", "youtube_agent")
+RETRYABLE_STATUS = (429, 502, 503, 504)
+
+AGENTS = ("search_agent", "reddit_agent", "youtube_agent", "email_agent", "memory_agent")
+
+
+class _RetryableStatus(Exception):
+    def __init__(self, response: "httpx.Response"):
+        super().__init__(f"{response.status_code} - {response.text[:200]}")
+        self.response = response
+
+
+class CircuitBreaker:
+    """
+    Per-agent circuit breaker.
+    closed: calls pass. open: calls fail fast for the cooldown.
+    half-open: one trial call decides whether to close or reopen.
+    """
+    def __init__(self, threshold: int = None, cooldown: float = None):
+        self.threshold = DELEGATION_BREAKER_THRESHOLD if threshold is None else threshold
+        self.cooldown = DELEGATION_BREAKER_COOLDOWN if cooldown is None else cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return 'closed'
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return 'half-open'
+        return 'open'
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == 'closed':
+                return True
+            if state == 'half-open' and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_in_flight or self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+            self.trial_in_flight = False
+
+
+class DelegationTransport:
+    """
+    Async agent-to-agent HTTP transport.
+    One pooled httpx.AsyncClient runs on a dedicated event-loop thread, so
+    calls from ADK's loop, other loops or plain threads all share the same
+    keep-alive connections.
+    """
+    def __init__(self):
+        self._loop = None
+        self._client = None
+        self._lock = threading.Lock()
+        self.breakers = {}
+        self.stats = {}
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    import httpx  # Loaded with the first delegation, not at agent startup
+
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="delegation-loop", daemon=True).start()
+                    self._client = httpx.AsyncClient(
+                        timeout=httpx.Timeout(DELEGATION_TIMEOUT, connect=DELEGATION_CONNECT_TIMEOUT),
+                        limits=httpx.Limits(
+                            max_connections=DELEGATION_MAX_CONNECTIONS,
+                            max_keepalive_connections=DELEGATION_MAX_CONNECTIONS,
+                        ),
+                    )
+                    self._loop = loop
+        return self._loop
+
+    def _agent_stats(self, agent_name: str) -> dict:
+        with self._lock:
+            if agent_name not in self.breakers:
+                self.breakers[agent_name] = CircuitBreaker()
+                self.stats[agent_name] = {'calls': 0, 'attempts': 0, 'retries': 0, 'hedges': 0,
+                                          'failures': 0, 'rejected': 0}
+            return self.stats[agent_name]
+
+    def submit(self, agent_name: str, query: str):
+        """Schedules a call on the transport loop; returns a concurrent.futures.Future."""
+        loop = self._ensure_loop()
+        return asyncio.run_coroutine_threadsafe(self._call(agent_name, query), loop)
+
+    async def call(self, agent_name: str, query: str) -> str:
+        """Awaitable from any event loop."""
+        return await asyncio.wrap_future(self.submit(agent_name, query))
+
+    async def _post(self, agent_name: str, url: str, query: str) -> "httpx.Response":
+        self.stats[agent_name]['attempts'] += 1
+        response = await self._transmit(agent_name, url, query)
+        if response.status_code in RETRYABLE_STATUS or response.status_code >= 500:
+            raise _RetryableStatus(response)
+        return response
+
+    async def _transmit(self, agent_name: str, url: str, query: str) -> "httpx.Response":
+        """The POST itself, or its recording when TOOL_IO_MODE is set."""
+        if not cassette.active():
+            return await self._client.post(url, json={"prompt": query})
+
+        import httpx
+
+        async def live() -> dict:
+            response = await self._client.post(url, json={"prompt": query})
+            retry_after = response.headers.get("Retry-After")
+            return {"status": response.status_code, "body": response.text,
+                    "headers": {"Retry-After": retry_after} if retry_after else {}}
+
+        try:
+            recorded = await cassette.play_async(
+                "delegation", {"agent": agent_name, "prompt": query}, live,
+                scope=f"delegation:{agent_name}", sequential=True,
+            )
+        except cassette.CassetteMiss as e:
+            raise httpx.ConnectError(str(e)) from e
+        return httpx.Response(recorded["status"], headers=recorded["headers"], text=recorded["body"],
+                              request=httpx.Request("POST", url))
+
+    async def _hedged_post(self, agent_name: str, url: str, query: str) -> "httpx.Response":
+        """Races a backup request against a slow first one; first success wins."""
+        first = asyncio.ensure_future(self._post(agent_name, url, query))
+        if DELEGATION_HEDGE_AFTER <= 0 or agent_name not in IDEMPOTENT_AGENTS:
+            return await first
+
+        done, _ = await asyncio.wait({first}, timeout=DELEGATION_HEDGE_AFTER)
+        if done:
+            return first.result()
+
+        self.stats[agent_name]['hedges'] += 1
+        pending = {first, asyncio.ensure_future(self._post(agent_name, url, query))}
+        error = None
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    for other in pending:
+                        other.cancel()
+                    return task.result()
+                error = task.exception()
+        raise error
+
+    def _retryable(self, agent_name: str, error: Exception) -> bool:
+        import httpx
+
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+            return True  # The request never reached the agent
+        if isinstance(error, _RetryableStatus) and error.response.status_code == 429:
+            return True  # Rejected before processing
+        if agent_name not in IDEMPOTENT_AGENTS:
+            return False
+        return isinstance(error, (_RetryableStatus, httpx.TimeoutException, httpx.TransportError))
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        if isinstance(error, _RetryableStatus):
+            retry_after = error.response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                return min(float(retry_after), DELEGATION_BACKOFF_MAX)
+        return random.uniform(0, min(DELEGATION_BACKOFF_MAX, DELEGATION_BACKOFF * (2 ** attempt)))
+
+    async def _call(self, agent_name: str, query: str) -> str:
+        stats = self._agent_stats(agent_name)
+        breaker = self.breakers[agent_name]
+        stats['calls'] += 1
+        url = get_agent_url(agent_name)
+
+        error = None
+        for attempt in range(DELEGATION_RETRIES + 1):
+            if not breaker.allow():
+                if error is not None:
+                    break  # Opened while retrying: report the underlying error
+                stats['rejected'] += 1
+                return (f"Error calling {agent_name}: circuit open after repeated failures, "
+                        f"retrying in up to {breaker.cooldown:.0f}s")
+            try:
+                response = await self._hedged_post(agent_name, url, query)
+            except Exception as e:
+                breaker.record_failure()
+                error = e
+                if attempt < DELEGATION_RETRIES and self._retryable(agent_name, e):
+                    stats['retries'] += 1
+                    await asyncio.sleep(self._backoff(attempt, e))
+                    continue
+                break
+
+            breaker.record_success()
+            if response.status_code == 200:
+                try:
+                    return response.json().get("response", response.text)
+                except ValueError:
+                    return response.text
+            return f"Error calling {agent_name}: {response.status_code} - {response.text}"
+
+        stats['failures'] += 1
+        if isinstance(error, _RetryableStatus):
+            return f"Error calling {agent_name}: {error}"
+        return f"Failed to communicate with {agent_name}: {type(error).__name__}: {error}"
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return {
+                name: dict(self.stats[name], circuit=self.breakers[name].state)
+                for name in self.stats
+            }
+
+    def close(self):
+        if self._loop is None:
+            return
+        try:
+            asyncio.run_coroutine_threadsafe(self._client.aclose(), self._loop).result(timeout=5)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+
+
+# Global instance
+_transport = DelegationTransport()
+atexit.register(_transport.close)
+
+
+def get_agent_url(agent_name: str) -> str:
+    override = os.getenv(f"DELEGATION_URL_{agent_name.upper()}")
+    if override:
+        return override
+    return DELEGATION_URL_TEMPLATE.format(base=DELEGATION_BASE_URL.rstrip("/"), agent=agent_name)
+
+
+def get_delegation_stats() -> dict:
+    """
+    Returns per-agent call, retry, hedge and failure counts with circuit state.
+    """
+    return _transport.get_stats()
+
+
+# Read-only delegations: identical concurrent requests share one call
+@traced()
+@single_flight(name="call_search_agent")
+async def call_search_agent(query: str):
     """
     Delegates a search task to the Search Agent.
     Use this to find product information, prices, and specs.
     """
-    return _call_agent("search_agent", query)
+    return await _call_agent("search_agent", query)
 
-def call_reddit_agent(query: str):
+@traced()
+@single_flight(name="call_reddit_agent")
+async def call_reddit_agent(query: str):
     """
     Delegates a task to the Reddit Agent.
     Use this to find user reviews, discussions, and sentiment.
     """
-    return _call_agent("reddit_agent", query)
+    return await _call_agent("reddit_agent", query)
 
-def call_youtube_agent(query: str):
+@traced()
+@single_flight(name="call_youtube_agent")
+async def call_youtube_agent(query: str):
     """
     Delegates a task to the YouTube Agent.
     Use this to find video reviews and summaries.
     """
-    return _call_agent("youtube_agent", query)
+    return await _call_agent("youtube_agent", query)
 
-def call_email_agent(query: str):
+@traced()
+async def call_email_agent(query: str):
     """
     Delegates a task to the Email Agent.
     Use this to send emails with summaries or lists.
     """
-    return _call_agent("email_agent", query)
+    return await _call_agent("email_agent", query)
 
-def call_memory_agent(query: str):
+@traced()
+async def call_memory_agent(query: str):
     """
     Delegates a task to the Memory Agent.
     Use this to store or retrieve user preferences.
     """
-    return _call_agent("memory_agent", query)
-
-def _call_agent(agent_name: str, query: str):
-    """Helper to call an agent via HTTP."""
-    url = f"http://127.0.0.1:8000/agents/{agent_name}/chat" # Assumed endpoint
-    # Note: The actual endpoint might vary. 
-    # If ADK doesn't expose easy endpoints, we might need a different approach.
-    # But let's try this standard pattern.
-    
-    # Alternative: If ADK exposes a single /chat endpoint with agent selection?
-    # Or maybe we just use the 'query' endpoint?
-    
-    # Let's assume a simple POST structure.
+    return await _call_agent("memory_agent", query)
+
+@traced()
+async def call_agents_batch(query: str, agents: str = "search,reddit,youtube"):
+    """
+    Delegates the same task to several agents CONCURRENTLY.
+    agents: comma-separated names, e.g. "search,reddit,youtube".
+    Returns each agent's answer tagged with its name.
+    """
+    names = []
+    for name in agents.split(","):
+        name = name.strip().lower()
+        if name and not name.endswith("_agent"):
+            name += "_agent"
+        if name in AGENTS and name not in names:
+            names.append(name)
+    if not names:
+        return f"Error: no valid agents in '{agents}'. Use any of: {', '.join(AGENTS)}."
+
+    results = await asyncio.gather(*(_call_agent(name, query) for name in names))
+    return "\n\n".join(f"[FROM {name.upper()}]:\n{result}" for name, result in zip(names, results))
+
+async def _call_agent(agent_name: str, query: str):
+    """Helper to call an agent via HTTP; never raises."""
     try:
-        # Trying to guess the ADK API structure.
-        # Usually: POST /agent/{name}/chat with json={"prompt": query}
-        response = requests.post(url, json={"prompt": query}, timeout=30)
-        if response.status_code == 200:
-            return response.json().get("response", response.text)
-        else:
-            return f"Error calling {agent_name}: {response.status_code} - {response.text}"
+        return await _transport.call(agent_name, query)
     except Exception as e:
         return f"Failed to communicate with {agent_name}: {e}"
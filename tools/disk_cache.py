@@ -0,0 +1,269 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from tools import cassette
+from tools.telemetry import annotate
+
+# Configuration
+CACHE_DIR = Path(os.getenv("TOOL_CACHE_DIR", "data/cache"))
+CACHE_DB = CACHE_DIR / "tool_cache.db"
+# Total size of cached values before least-recently-used entries are evicted
+CACHE_MAX_BYTES = int(os.getenv("TOOL_CACHE_MAX_BYTES", str(50 * 1024 * 1024)))
+# Seconds an entry is fresh, per tool (override with TOOL_CACHE_TTL_<TOOL>)
+DEFAULT_TTLS = {
+    'scrape_reddit': 900,
+    'search_youtube': 3600,
+    'search_agent': 1800,
+}
+# Seconds past freshness an entry may still be served while it is refreshed
+CACHE_STALE_TTL = float(os.getenv("TOOL_CACHE_STALE_TTL", str(24 * 3600)))
+# How long a process may hold the refresh claim on a stale entry
+CACHE_REFRESH_CLAIM = float(os.getenv("TOOL_CACHE_REFRESH_CLAIM", "60"))
+CACHE_REFRESH_WORKERS = int(os.getenv("TOOL_CACHE_REFRESH_WORKERS", "2"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cache (
+    key          TEXT PRIMARY KEY,
+    tool         TEXT NOT NULL,
+    value        TEXT NOT NULL,
+    size         INTEGER NOT NULL,
+    created_at   REAL NOT NULL,
+    fresh_until  REAL NOT NULL,
+    stale_until  REAL NOT NULL,
+    accessed_at  REAL NOT NULL,
+    refreshing_until REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS cache_lru ON cache (accessed_at);
+"""
+
+UPSERT = """
+INSERT INTO cache (key, tool, value, size, created_at, fresh_until, stale_until, accessed_at, refreshing_until)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, 0)
+ON CONFLICT (key) DO UPDATE SET
+    value = excluded.value, size = excluded.size, created_at = excluded.created_at,
+    fresh_until = excluded.fresh_until, stale_until = excluded.stale_until,
+    accessed_at = excluded.accessed_at, refreshing_until = 0
+"""
+
+# Reads only bump accessed_at (a write) when it is older than this
+ACCESS_RESOLUTION = 60
+
+
+def get_ttl(tool: str) -> float:
+    return float(os.getenv(f"TOOL_CACHE_TTL_{tool.upper()}", DEFAULT_TTLS.get(tool, 900)))
+
+
+def make_key(tool: str, *parts) -> str:
+    """Content-addressed key: SHA-256 of the tool name and its (normalized) inputs."""
+    payload = json.dumps([tool, *parts], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class DiskCache:
+    """
+    Persistent tool-result cache on one SQLite database in WAL mode.
+
+    Survives restarts of adk web and is shared by every worker process:
+    each thread has its own connection, writes run in IMMEDIATE
+    transactions and a busy timeout serializes concurrent writers.
+    Entries are fresh for the tool's TTL, then stale (still served while
+    one process refreshes them in the background) until CACHE_STALE_TTL
+    runs out. Least-recently-used entries are evicted past CACHE_MAX_BYTES.
+    """
+    def __init__(self, path: Path = CACHE_DB, max_bytes: int = CACHE_MAX_BYTES,
+                 timeout: float = 30.0):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+        self._executor = None
+        self._stats_lock = threading.Lock()
+        self.stats = {'fresh_hits': 0, 'stale_hits': 0, 'misses': 0, 'writes': 0,
+                      'refreshes': 0, 'refresh_errors': 0, 'evictions': 0}
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def _count(self, stat: str, n: int = 1):
+        with self._stats_lock:
+            self.stats[stat] += n
+
+    def record_refresh(self, ok: bool):
+        self._count('refreshes' if ok else 'refresh_errors')
+
+    def get(self, key: str) -> tuple:
+        """Returns (value, state) with state 'fresh' or 'stale', or (None, None)."""
+        now = time.time()
+        conn = self._connect()
+        row = conn.execute(
+            "SELECT value, fresh_until, stale_until, accessed_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or row[2] <= now:
+            self._count('misses')
+            return None, None
+        value, fresh_until, _, accessed_at = row
+        if now - accessed_at > ACCESS_RESOLUTION:
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        state = 'fresh' if fresh_until > now else 'stale'
+        self._count(f'{state}_hits')
+        return json.loads(value), state
+
+    def set(self, key: str, tool: str, value, ttl: float = None):
+        ttl = get_ttl(tool) if ttl is None else ttl
+        now = time.time()
+        data = json.dumps(value, ensure_ascii=False)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute(UPSERT, (key, tool, data, len(data.encode()), now,
+                                  now + ttl, now + ttl + CACHE_STALE_TTL, now))
+            evicted = self._evict(conn)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        self._count('writes')
+        if evicted:
+            self._count('evictions', evicted)
+
+    def _evict(self, conn: sqlite3.Connection) -> int:
+        """Drops expired entries, then LRU entries until under 90% of max_bytes."""
+        evicted = conn.execute("DELETE FROM cache WHERE stale_until <= ?", (time.time(),)).rowcount
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return evicted
+        target = total - int(self.max_bytes * 0.9)
+        rows = conn.execute("SELECT key, size FROM cache ORDER BY accessed_at").fetchall()
+        doomed = []
+        for key, size in rows:
+            if target <= 0:
+                break
+            doomed.append((key,))
+            target -= size
+        conn.executemany("DELETE FROM cache WHERE key = ?", doomed)
+        return evicted + len(doomed)
+
+    def claim_refresh(self, key: str) -> bool:
+        """
+        Atomically claims the background refresh of a stale entry, so only
+        one thread in one process revalidates it at a time.
+        """
+        now = time.time()
+        cursor = self._connect().execute(
+            "UPDATE cache SET refreshing_until = ? WHERE key = ? AND refreshing_until < ?",
+            (now + CACHE_REFRESH_CLAIM, key, now),
+        )
+        return cursor.rowcount == 1
+
+    def release_refresh(self, key: str):
+        self._connect().execute("UPDATE cache SET refreshing_until = 0 WHERE key = ?", (key,))
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._schema_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=CACHE_REFRESH_WORKERS, thread_name_prefix="cache-refresh"
+                    )
+        return self._executor
+
+    def _refresh(self, tool: str, key: str, loader, ttl: float):
+        try:
+            value, cacheable = loader()
+            if cacheable:
+                self.set(key, tool, value, ttl)
+                self.record_refresh(True)
+                return
+        except Exception as e:
+            print(f"Warning: background refresh of {tool} failed: {e}")
+        self.record_refresh(False)
+        self.release_refresh(key)
+
+    def fetch(self, tool: str, key: str, loader, ttl: float = None):
+        """
+        Returns the cached value for key, or loader()'s.
+        loader() -> (value, cacheable). A fresh hit returns at once; a stale
+        hit also returns at once and refreshes the entry in the background;
+        a miss calls loader() inline and stores the value if cacheable.
+        Cache errors never fail the call - the loader is used instead.
+        While TOOL_IO_MODE records or replays, the cache is bypassed so
+        every call goes through the cassette.
+        """
+        if cassette.active():
+            return loader()[0]
+        try:
+            value, state = self.get(key)
+        except sqlite3.Error as e:
+            print(f"Warning: tool cache unavailable: {e}")
+            return loader()[0]
+
+        if state is not None:
+            annotate(cache_hit=True, cache_state=state)
+        if state == 'fresh':
+            return value
+        if state == 'stale':
+            try:
+                if self.claim_refresh(key):
+                    self._get_executor().submit(self._refresh, tool, key, loader, ttl)
+            except sqlite3.Error as e:
+                print(f"Warning: tool cache refresh skipped: {e}")
+            return value
+
+        value, cacheable = loader()
+        if cacheable:
+            try:
+                self.set(key, tool, value, ttl)
+            except sqlite3.Error as e:
+                print(f"Warning: tool cache write failed: {e}")
+        return value
+
+    def get_stats(self) -> dict:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        try:
+            row = self._connect().execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache").fetchone()
+            stats.update(entries=row[0], bytes=row[1], max_bytes=self.max_bytes)
+        except sqlite3.Error:
+            pass
+        return stats
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_disk_cache() -> DiskCache:
+    """Returns the process-wide tool cache (opened on first use)."""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = DiskCache()
+    return _cache
+
+
+def get_disk_cache_stats() -> dict:
+    """
+    Returns fresh/stale hit, miss, refresh and eviction counters plus the
+    entry count and size of the on-disk tool cache.
+    """
+    return get_disk_cache().get_stats()
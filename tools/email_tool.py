@@ -1,33 +1,275 @@
-import smtplib
+import atexit
 import os
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+
+from tools import cassette
+from tools.telemetry import record
+
+if TYPE_CHECKING:
+    import smtplib
+
+# Configuration
+# Set SMTP_STARTTLS=false for plain local/stub servers
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "true").lower() in ("1", "true", "yes")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+# Delivery attempts per message, with exponential backoff between them (seconds)
+SMTP_MAX_ATTEMPTS = int(os.getenv("SMTP_MAX_ATTEMPTS", "4"))
+SMTP_RETRY_BACKOFF = float(os.getenv("SMTP_RETRY_BACKOFF", "2"))
+# An idle connection is checked with NOOP before reuse, and closed once
+# the outbox has been empty this long
+SMTP_KEEPALIVE = float(os.getenv("SMTP_KEEPALIVE", "30"))
+SMTP_IDLE_CLOSE = float(os.getenv("SMTP_IDLE_CLOSE", "120"))
+# Seconds to keep delivering queued mail at interpreter exit
+SMTP_DRAIN_TIMEOUT = float(os.getenv("SMTP_DRAIN_TIMEOUT", "10"))
+
+MAX_TRACKED_DELIVERIES = 1000
+
+
+def _permanent_errors() -> tuple:
+    """Server replies that will not succeed on retry."""
+    import smtplib
+    return (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+            smtplib.SMTPAuthenticationError, cassette.CassetteMiss)
+
+
+def _smtp_settings() -> dict:
+    return {
+        'server': os.getenv("SMTP_SERVER", "smtp.gmail.com"),
+        'port': int(os.getenv("SMTP_PORT", "587")),
+        'username': os.getenv("SMTP_USERNAME"),
+        'password': os.getenv("SMTP_PASSWORD"),
+    }
+
+
+class SmtpOutbox:
+    """
+    Background email delivery over one persistent, authenticated SMTP connection.
+    Messages are queued and sent by a single worker thread, which reuses the
+    connection across messages (NOOP keep-alive check when it has been idle),
+    reconnects when the server drops it and retries failures with backoff.
+    """
+
+    def __init__(self, max_attempts: int = None, backoff: float = None):
+        self.max_attempts = SMTP_MAX_ATTEMPTS if max_attempts is None else max_attempts
+        self.backoff = SMTP_RETRY_BACKOFF if backoff is None else backoff
+        self._queue = queue.Queue()
+        self._deliveries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._idle = threading.Condition(self._lock)
+        self._worker = None
+        self._conn = None
+        self._settings = None
+        self._last_used = 0.0
+        self.stats = {'queued': 0, 'sent': 0, 'failed': 0, 'retries': 0,
+                      'connections': 0, 'reused': 0}
+
+    # --- Public API -------------------------------------------------------
+
+    def submit(self, to_email: str, subject: str, body: str, settings: dict) -> str:
+        delivery_id = uuid.uuid4().hex[:12]
+        with self._lock:
+            self._deliveries[delivery_id] = {
+                'id': delivery_id,
+                'to': to_email,
+                'subject': subject,
+                'status': 'queued',
+                'attempts': 0,
+                'error': None,
+                'queued_at': time.time(),
+                'sent_at': None,
+            }
+            while len(self._deliveries) > MAX_TRACKED_DELIVERIES:
+                self._deliveries.popitem(last=False)
+            self._pending += 1
+            self.stats['queued'] += 1
+            self._ensure_worker()
+        self._queue.put((delivery_id, to_email, subject, body, settings))
+        return delivery_id
+
+    def status(self, delivery_id: str):
+        with self._lock:
+            entry = self._deliveries.get(delivery_id)
+            return dict(entry) if entry else None
+
+    def drain(self, timeout: float = None) -> bool:
+        """Waits until every queued message is sent or has failed."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout=timeout)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, pending=self._pending)
+
+    # --- Worker -----------------------------------------------------------
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._run, name="smtp-outbox", daemon=True)
+            self._worker.start()
+
+    def _run(self):
+        while True:
+            try:
+                job = self._queue.get(timeout=SMTP_IDLE_CLOSE)
+            except queue.Empty:
+                self._close()
+                continue
+            self._deliver(*job)
+
+    def _deliver(self, delivery_id, to_email, subject, body, settings):
+        self._update(delivery_id, status='sending')
+        started = time.perf_counter()
+        try:
+            from email.mime.multipart import MIMEMultipart
+            from email.mime.text import MIMEText
+
+            msg = MIMEMultipart()
+            msg['From'] = settings['username']
+            msg['To'] = to_email
+            msg['Subject'] = subject
+            msg.attach(MIMEText(body, 'plain')) # Or 'html' if we want fancy formatting
+
+            # Replayed runs (TOOL_IO_MODE=replay) never reach the server
+            cassette.play("smtp", {'to': to_email, 'subject': subject},
+                          lambda: self._sendmail(settings, to_email, msg))
+        except Exception as e:
+            record("smtp.deliver", time.perf_counter() - started, error=True)
+            self._close()
+            self._retry_or_fail(delivery_id, to_email, subject, body, settings, e)
+            return
+
+        record("smtp.deliver", time.perf_counter() - started, bytes_in=len(body))
+        self._update(delivery_id, status='sent', sent_at=time.time(), error=None, done=True)
+        with self._lock:
+            self.stats['sent'] += 1
+
+    def _sendmail(self, settings: dict, to_email: str, msg) -> dict:
+        conn = self._connection(settings)
+        refused = conn.sendmail(settings['username'], to_email, msg.as_string())
+        self._last_used = time.monotonic()
+        return {'refused': list(refused)}
+
+    def _retry_or_fail(self, delivery_id, to_email, subject, body, settings, error):
+        with self._lock:
+            entry = self._deliveries.get(delivery_id)
+            attempts = entry['attempts'] if entry else self.max_attempts
+        if isinstance(error, _permanent_errors()) or attempts >= self.max_attempts:
+            self._update(delivery_id, status='failed', error=str(error), done=True)
+            with self._lock:
+                self.stats['failed'] += 1
+            print(f"Warning: email {delivery_id} to {to_email} failed: {error}")
+            return
+
+        delay = self.backoff * (2 ** (attempts - 1))
+        self._update(delivery_id, status='retrying', error=str(error))
+        with self._lock:
+            self.stats['retries'] += 1
+        # Requeue after the backoff without holding up the rest of the outbox
+        timer = threading.Timer(
+            delay, self._queue.put, args=((delivery_id, to_email, subject, body, settings),)
+        )
+        timer.daemon = True
+        timer.start()
+
+    def _update(self, delivery_id, done=False, **fields):
+        with self._lock:
+            entry = self._deliveries.get(delivery_id)
+            if entry is not None:
+                if fields.get('status') == 'sending':
+                    entry['attempts'] += 1
+                entry.update(fields)
+            if done:
+                self._pending -= 1
+                self._idle.notify_all()
+
+    # --- Connection -------------------------------------------------------
+
+    def _connection(self, settings: dict) -> "smtplib.SMTP":
+        """Returns the live connection, reconnecting if it is stale or settings changed."""
+        import smtplib
+        if self._conn is not None and self._settings == settings:
+            if time.monotonic() - self._last_used < SMTP_KEEPALIVE:
+                self.stats['reused'] += 1
+                return self._conn
+            try:
+                if self._conn.noop()[0] == 250:
+                    self.stats['reused'] += 1
+                    return self._conn
+            except (smtplib.SMTPException, OSError):
+                pass
+        self._close()
+
+        conn = smtplib.SMTP(settings['server'], settings['port'], timeout=SMTP_TIMEOUT)
+        try:
+            conn.ehlo()
+            if SMTP_STARTTLS:
+                conn.starttls()
+                conn.ehlo()
+            if settings['password'] and conn.has_extn('auth'):
+                conn.login(settings['username'], settings['password'])
+        except Exception:
+            conn.close()
+            raise
+        self._conn = conn
+        self._settings = settings
+        self.stats['connections'] += 1
+        return conn
+
+    def _close(self):
+        if self._conn is None:
+            return
+        try:
+            self._conn.quit()
+        except Exception:
+            self._conn.close()
+        self._conn = None
+
+
+# Global instance
+_outbox = SmtpOutbox()
+atexit.register(_outbox.drain, SMTP_DRAIN_TIMEOUT)
+
 
 def send_email(to_email: str, subject: str, body: str):
     """
     Sends an email using SMTP credentials from environment variables.
+    The message is queued and delivered in the background; returns
+    immediately with a delivery id that get_email_status can look up.
     """
-    smtp_server = os.getenv("SMTP_SERVER", "smtp.gmail.com")
-    smtp_port = int(os.getenv("SMTP_PORT", "587"))
-    smtp_username = os.getenv("SMTP_USERNAME")
-    smtp_password = os.getenv("SMTP_PASSWORD")
-    
-    if not smtp_username or not smtp_password:
+    settings = _smtp_settings()
+    if not settings['username'] or not settings['password']:
         return "Error: SMTP credentials not found."
-        
+
     try:
-        msg = MIMEMultipart()
-        msg['From'] = smtp_username
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'plain')) # Or 'html' if we want fancy formatting
-        
-        server = smtplib.SMTP(smtp_server, smtp_port)
-        server.starttls()
-        server.login(smtp_username, smtp_password)
-        text = msg.as_string()
-        server.sendmail(smtp_username, to_email, text)
-        server.quit()
-        return f"Email sent successfully to {to_email}"
+        delivery_id = _outbox.submit(to_email, subject, body, settings)
+        return f"Email to {to_email} queued for delivery (delivery id: {delivery_id})"
     except Exception as e:
         return f"Error sending email: {str(e)}"
+
+
+def get_email_status(delivery_id: str):
+    """
+    Returns the delivery status of an email queued by send_email:
+    queued, sending, retrying, sent or failed (with the last error).
+    """
+    entry = _outbox.status(delivery_id)
+    if entry is None:
+        return f"No email found with delivery id {delivery_id}."
+    status = f"Email {delivery_id} to {entry['to']}: {entry['status']} (attempts: {entry['attempts']})"
+    if entry['error']:
+        status += f" - last error: {entry['error']}"
+    return status
+
+
+def get_outbox_stats() -> dict:
+    """
+    Returns outbox counters: queued/sent/failed/retries, pending messages,
+    and SMTP connections opened vs reused.
+    """
+    return _outbox.get_stats()
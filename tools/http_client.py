@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+from typing import TYPE_CHECKING
+
+from tools import cassette, rate_limit
+from tools.telemetry import record
+
+if TYPE_CHECKING:
+    import requests
+
+# Configuration
+# Number of per-host connection pools kept alive, and connections per host
+HTTP_POOL_CONNECTIONS = int(os.getenv("HTTP_POOL_CONNECTIONS", "10"))
+HTTP_POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+# Default (connect, read) timeouts in seconds for every outbound call
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "3.05"))
+HTTP_READ_TIMEOUT = float(os.getenv("HTTP_READ_TIMEOUT", "15"))
+# Re-sends after a 429 for rate-limited upstreams (each waits out Retry-After
+# within the rate limiter's deadline)
+HTTP_THROTTLE_RETRIES = int(os.getenv("HTTP_THROTTLE_RETRIES", "2"))
+
+# Response headers kept in tool I/O recordings (see tools.cassette)
+RECORDED_HEADERS = ('Content-Type', 'Retry-After', 'X-Ratelimit-Remaining', 'X-Ratelimit-Reset', 'X-Rl', 'X-Ttl')
+
+DEFAULT_HEADERS = {
+    'Accept-Encoding': 'gzip, deflate',
+    'Connection': 'keep-alive',
+}
+
+_session = None
+_adapter = None
+_session_lock = threading.Lock()
+
+
+def get_session() -> "requests.Session":
+    """
+    Returns the process-wide requests.Session.
+    Connections are kept alive in per-host pools, so repeated calls to the
+    same upstream skip the DNS lookup and the TCP/TLS handshakes.
+    """
+    global _session, _adapter
+    if _session is None:
+        with _session_lock:
+            if _session is None:
+                # requests is loaded on the first outbound call, not at agent startup
+                import requests
+                from requests.adapters import HTTPAdapter
+
+                adapter = HTTPAdapter(
+                    pool_connections=HTTP_POOL_CONNECTIONS,
+                    pool_maxsize=HTTP_POOL_MAXSIZE,
+                )
+                session = requests.Session()
+                session.mount("http://", adapter)
+                session.mount("https://", adapter)
+                session.headers.update(DEFAULT_HEADERS)
+                _adapter = adapter
+                _session = session
+    return _session
+
+
+def _quota_reset(response: "requests.Response"):
+    """
+    Seconds until the upstream's quota window resets if this response says
+    it is used up (Reddit: X-Ratelimit-*, ip-api.com: X-Rl/X-Ttl), else None.
+    """
+    headers = response.headers
+    for remaining, reset in (('X-Ratelimit-Remaining', 'X-Ratelimit-Reset'), ('X-Rl', 'X-Ttl')):
+        try:
+            if remaining in headers and float(headers[remaining]) < 1:
+                return rate_limit.parse_retry_after(headers.get(reset))
+        except ValueError:
+            continue
+    return None
+
+
+def _transmit(method: str, url: str, timeout, upstream: str, **kwargs) -> "requests.Response":
+    """The round trip on the shared session, or its recording when TOOL_IO_MODE is set."""
+    if not cassette.active():
+        return get_session().request(method, url, timeout=timeout, **kwargs)
+    import requests
+
+    def live() -> dict:
+        response = get_session().request(method, url, timeout=timeout, **kwargs)
+        headers = {k: response.headers[k] for k in RECORDED_HEADERS if k in response.headers}
+        return {'status': response.status_code, 'headers': headers, 'body': response.text}
+
+    request = {'method': method, 'url': cassette.redact_url(url, kwargs.get('params')),
+               'json': kwargs.get('json'), 'data': kwargs.get('data')}
+    try:
+        recorded = cassette.play("http", request, live, scope=f"http:{upstream or 'other'}")
+    except cassette.CassetteMiss as e:
+        raise requests.exceptions.ConnectionError(str(e)) from e
+    response = requests.Response()
+    response.status_code = recorded['status']
+    response.headers.update(recorded['headers'])
+    response._content = recorded['body'].encode('utf-8')
+    response.encoding = 'utf-8'
+    response.url = url
+    return response
+
+
+def _send(method: str, url: str, timeout, upstream: str, **kwargs) -> "requests.Response":
+    """One round trip, recorded as an http.<upstream> span."""
+    import requests
+    started = time.perf_counter()
+    try:
+        response = _transmit(method, url, timeout, upstream, **kwargs)
+    except requests.RequestException:
+        record(f"http.{upstream or 'other'}", time.perf_counter() - started, error=True)
+        raise
+    record(
+        f"http.{upstream or 'other'}", time.perf_counter() - started,
+        error=response.status_code >= 400, status=response.status_code,
+        bytes_out=int(response.headers.get('Content-Length') or 0),
+    )
+    return response
+
+
+def request(method: str, url: str, timeout=None, upstream: str = None, **kwargs) -> "requests.Response":
+    """
+    Sends a request through the shared session.
+    timeout defaults to (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT).
+
+    upstream names a rate limiter (see tools.rate_limit): the call waits for
+    a token first, 429s pause and slow that upstream and are re-sent within
+    the limiter's deadline. Raises rate_limit.RateLimitExceeded if the
+    deadline passes.
+    """
+    if timeout is None:
+        timeout = (HTTP_CONNECT_TIMEOUT, HTTP_READ_TIMEOUT)
+    if upstream is None:
+        return _send(method, url, timeout, upstream, **kwargs)
+
+    limiter = rate_limit.get_limiter(upstream)
+    deadline = time.monotonic() + rate_limit.RATE_LIMIT_DEADLINE
+    for attempt in range(HTTP_THROTTLE_RETRIES + 1):
+        limiter.acquire(timeout=deadline - time.monotonic())
+        response = _send(method, url, timeout, upstream, **kwargs)
+        if response.status_code != 429:
+            reset = _quota_reset(response)
+            if reset is not None:
+                limiter.pause(reset)  # Last request of the window: wait for the reset
+            limiter.succeeded()
+            return response
+        limiter.throttled(rate_limit.parse_retry_after(response.headers.get('Retry-After')))
+    return response
+
+
+def get(url: str, **kwargs) -> "requests.Response":
+    return request("GET", url, **kwargs)
+
+
+def post(url: str, **kwargs) -> "requests.Response":
+    return request("POST", url, **kwargs)
+
+
+def get_pool_stats() -> dict:
+    """
+    Returns per-host connection pool counters.
+    'connections' counts new connections (i.e. handshakes) and 'requests'
+    counts requests sent; the difference is the handshakes saved by reuse.
+    """
+    stats = {'hosts': {}, 'requests': 0, 'connections': 0, 'reused': 0}
+    if _adapter is None:
+        return stats
+    pools = _adapter.poolmanager.pools
+    for key in list(pools.keys()):
+        pool = pools.get(key)
+        if pool is None:
+            continue
+        host = f"{key.key_scheme}://{key.key_host}:{key.key_port}"
+        stats['hosts'][host] = {
+            'requests': pool.num_requests,
+            'connections': pool.num_connections,
+        }
+        stats['requests'] += pool.num_requests
+        stats['connections'] += pool.num_connections
+    stats['reused'] = stats['requests'] - stats['connections']
+    return stats
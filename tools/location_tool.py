@@ -1,45 +1,125 @@
-import requests
+import os
+import time
 
-def get_user_location():
-    """
-    Gets the user's approximate location using IP geolocation.
-    Uses ip-api.com (free, open-source, no API key required).
-    Returns country, city, timezone, and currency information.
-    """
+from tools import http_client
+from tools.cache import TTLCache
+from tools.rate_limit import RateLimitExceeded
+from tools.singleflight import SingleFlight
+from tools.telemetry import traced
+
+# Configuration
+# Location data is kept in process memory only, never persisted to disk
+LOCATION_CACHE_TTL = float(os.getenv("LOCATION_CACHE_TTL", str(24 * 3600)))
+LOCATION_CACHE_SIZE = int(os.getenv("LOCATION_CACHE_SIZE", "1024"))
+# Failed lookups are remembered briefly so an outage is not hammered
+LOCATION_FAILURE_TTL = float(os.getenv("LOCATION_FAILURE_TTL", "60"))
+
+# Overridable to point the tool at a stand-in server (see benchmarks/)
+IP_API_URL = os.getenv("IP_API_URL", "http://ip-api.com/json/")
+
+# Cache key for lookups of the server's own address (no client IP known)
+SELF_IP = "self"
+
+# Process-wide: shared by every session and SessionManager. ADK does not
+# expose the end user's address to tools, so the agents always look up
+# SELF_IP; other keys only appear when a caller passes client_ip itself
+_cache = TTLCache(maxsize=LOCATION_CACHE_SIZE, ttl=LOCATION_CACHE_TTL)
+_flight = SingleFlight("get_user_location_data")
+
+
+def _fallback(error: str) -> dict:
+    return {
+        'country': 'Unknown',
+        'city': 'Unknown',
+        'timezone': 'Unknown',
+        'currency': 'USD',
+        'error': error,
+    }
+
+
+def _fetch_location(client_ip: str = None) -> dict:
+    """One ip-api.com lookup; never raises."""
+    import requests
     try:
         # Use ip-api.com - free and open source
-        response = requests.get('http://ip-api.com/json/', timeout=5)
-        
+        response = http_client.get(IP_API_URL + (client_ip or ""), timeout=5, upstream="ip-api")
+
         if response.status_code != 200:
-            return """Location detection failed.
-- Country: Unknown
-- Currency: USD (fallback)"""
-        
+            return _fallback("Location detection failed.")
+
         data = response.json()
-        
+
         if data.get('status') == 'fail':
-            return f"""Location detection failed: {data.get('message', 'Unknown error')}
-- Currency: USD (fallback)"""
-        
-        # Extract location info
-        country = data.get('country', 'Unknown')
-        city = data.get('city', 'Unknown')
-        timezone_name = data.get('timezone', 'Unknown')
-        currency = data.get('currency', 'USD')  # USD fallback
-        
-        return f"""Location detected (via IP geolocation):
-- Country: {country}
-- City: {city}
-- Timezone: {timezone_name}
-- Currency: {currency}"""
-        
+            return _fallback(f"Location detection failed: {data.get('message', 'Unknown error')}")
+
+        return {
+            'country': data.get('country', 'Unknown'),
+            'city': data.get('city', 'Unknown'),
+            'timezone': data.get('timezone', 'Unknown'),
+            'currency': data.get('currency', 'USD'),  # USD fallback
+            'error': None,
+        }
+
+    except RateLimitExceeded:
+        return _fallback("Location detection skipped (rate limited).")
     except requests.exceptions.Timeout:
-        return """Location detection timed out.
-- Currency: USD (fallback)"""
+        return _fallback("Location detection timed out.")
     except requests.exceptions.RequestException as e:
-        return f"""Error detecting location: {str(e)}
-- Currency: USD (fallback)"""
+        return _fallback(f"Error detecting location: {str(e)}")
     except Exception as e:
-        return f"""Unexpected error: {str(e)}
+        return _fallback(f"Unexpected error: {str(e)}")
+
+
+def _load_location(key: str, client_ip: str) -> dict:
+    location = _fetch_location(client_ip)
+    location['timestamp'] = time.time()
+    _cache.set(key, location, ttl=LOCATION_FAILURE_TTL if location['error'] else None)
+    return location
+
+
+@traced()
+def get_user_location_data(client_ip: str = None, use_cache: bool = True) -> dict:
+    """
+    Structured location lookup: country, city, timezone, currency, error
+    (None on success), timestamp and cached.
+    Without client_ip this geolocates the server's own address, which is
+    what every agent tool does, so sessions share one process-wide entry.
+    Callers that know the end user's address (e.g. a custom web front end)
+    can pass client_ip to get a separate entry per IP. Concurrent cold
+    lookups for the same key share a single ip-api.com request.
+    """
+    key = client_ip or SELF_IP
+    if use_cache:
+        cached = _cache.get(key)
+        if cached is not None:
+            return dict(cached, cached=True)
+
+    location, shared = _flight.do(key, _load_location, key, client_ip)
+    return dict(location, cached=shared)
+
+
+def get_location_cache_stats() -> dict:
+    """
+    Returns location cache counters and how many lookups were collapsed
+    into an in-flight request.
+    """
+    return dict(_cache.get_stats(), single_flight=_flight.get_stats())
+
+
+@traced()
+def get_user_location():
+    """
+    Gets the user's approximate location using IP geolocation.
+    Uses ip-api.com (free, open-source, no API key required).
+    Returns country, city, timezone, and currency information.
+    """
+    location = get_user_location_data()
+    if location['error']:
+        return f"""{location['error']}
 - Currency: USD (fallback)"""
 
+    return f"""Location detected (via IP geolocation):
+- Country: {location['country']}
+- City: {location['city']}
+- Timezone: {location['timezone']}
+- Currency: {location['currency']}"""
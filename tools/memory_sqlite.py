@@ -0,0 +1,202 @@
+import json
+import sqlite3
+import sys
+import threading
+import time
+from pathlib import Path
+
+from tools.memory_tool import (
+    MEMORY_DIR,
+    SESSION_ID,
+    SNAPSHOT_FILE,
+    _load_snapshot,
+    _parse_session_file,
+    _session_name,
+)
+
+# Configuration
+MEMORY_DB = MEMORY_DIR / "memory.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS memory (
+    user_id    TEXT NOT NULL,
+    session    TEXT NOT NULL,
+    key        TEXT NOT NULL,
+    value      TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (user_id, session, key)
+);
+CREATE INDEX IF NOT EXISTS memory_latest ON memory (user_id, key, updated_at DESC);
+"""
+
+UPSERT = """
+INSERT INTO memory (user_id, session, key, value, updated_at) VALUES (?, ?, ?, ?, ?)
+ON CONFLICT (user_id, session, key) DO UPDATE
+SET value = excluded.value, updated_at = excluded.updated_at
+"""
+
+
+class SQLiteBackend:
+    """
+    Memory storage backend on a single SQLite database in WAL mode.
+
+    Rows are (user_id, session, key) -> JSON value, with an index on
+    (user_id, key, updated_at) so previous-session lookups are one indexed
+    query. Each thread gets its own connection; WAL plus a busy timeout
+    lets several processes (e.g. adk web workers) share the file safely.
+    """
+    name = "sqlite"
+
+    def __init__(self, path: Path = MEMORY_DB, timeout: float = 30.0):
+        self.path = Path(path)
+        self.timeout = timeout
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def _write(self, sql: str, rows: list):
+        """Runs a batched write in one IMMEDIATE transaction."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.executemany(sql, rows)
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def load(self, user_id: str) -> dict:
+        """Returns the current session's data for a user shard."""
+        rows = self._connect().execute(
+            "SELECT key, value FROM memory WHERE user_id = ? AND session = ?",
+            (user_id, _session_name(user_id)),
+        )
+        return {key: json.loads(value) for key, value in rows}
+
+    def save(self, user_id: str, data: dict, changed: dict):
+        """
+        Upserts the changed keys in a single transaction.
+        Returns an error string on failure, otherwise None.
+        """
+        now = time.time()
+        session = _session_name(user_id)
+        rows = [(user_id, session, key, json.dumps(value), now) for key, value in changed.items()]
+        try:
+            self._write(UPSERT, rows)
+        except Exception as e:
+            return f"Error saving memory: {str(e)}"
+
+    def lookup_many(self, user_id: str, keys) -> dict:
+        """Returns {key: newest value} across all sessions with one indexed query."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        placeholders = ",".join("?" * len(keys))
+        rows = self._connect().execute(
+            f"""
+            SELECT key, value FROM (
+                SELECT key, value,
+                       ROW_NUMBER() OVER (PARTITION BY key ORDER BY updated_at DESC) AS rn
+                FROM memory
+                WHERE user_id = ? AND key IN ({placeholders})
+            ) WHERE rn = 1
+            """,
+            (user_id, *keys),
+        )
+        return {key: json.loads(value) for key, value in rows}
+
+    def compact(self, max_age_days: float, max_files: int) -> dict:
+        """
+        Deletes rows of old sessions that are superseded by a newer value.
+        The newest max_files sessions younger than max_age_days, and this
+        process's sessions, are kept whole; the latest row per user and key
+        is always kept, so lookups are unchanged.
+        """
+        conn = self._connect()
+        cutoff = time.time() - max_age_days * 86400
+        sessions = conn.execute(
+            "SELECT session, MAX(updated_at) AS last FROM memory GROUP BY session ORDER BY last DESC"
+        ).fetchall()
+        keep = {
+            session for session, last in sessions[:max_files] if last >= cutoff
+        } | {session for session, _ in sessions if session.split("__")[0] == SESSION_ID}
+        old = [(session,) for session, _ in sessions if session not in keep]
+
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS old_sessions (session TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM old_sessions")
+            conn.executemany("INSERT INTO old_sessions VALUES (?)", old)
+            deleted = conn.execute(
+                """
+                DELETE FROM memory
+                WHERE session IN (SELECT session FROM old_sessions)
+                  AND rowid NOT IN (
+                      SELECT rowid FROM (
+                          SELECT rowid, ROW_NUMBER() OVER (
+                              PARTITION BY user_id, key ORDER BY updated_at DESC
+                          ) AS rn
+                          FROM memory
+                      ) WHERE rn = 1
+                  )
+                """
+            ).rowcount
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        rows = conn.execute("SELECT COUNT(*) FROM memory").fetchone()[0]
+        return {'old_sessions': len(old), 'kept_sessions': len(keep),
+                'deleted_rows': deleted, 'rows': rows}
+
+
+def migrate_json_to_sqlite(backend: SQLiteBackend = None) -> dict:
+    """
+    One-shot migration of data/memory/snapshot.json and session_*.json files
+    into the SQLite backend. Each file becomes one session, timestamped with
+    the file's mtime, so previous-session lookups resolve exactly as they did
+    on the JSON backend. Re-running is safe (rows are upserted).
+    """
+    backend = backend or SQLiteBackend()
+    rows = []
+    for user_id, entries in _load_snapshot().items():
+        for key, entry in entries.items():
+            rows.append((user_id, entry["s"], key, json.dumps(entry["v"]), entry["t"]))
+
+    files = 0
+    for session_file in sorted(MEMORY_DIR.glob("session_*.json")):
+        try:
+            with open(session_file, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            print(f"Warning: Skipping unreadable session file {session_file.name}: {e}")
+            continue
+        session, user_id = _parse_session_file(session_file)
+        mtime = session_file.stat().st_mtime
+        rows.extend((user_id, session, key, json.dumps(value), mtime) for key, value in data.items())
+        files += 1
+
+    backend._write(UPSERT, rows)
+    return {'session_files': files, 'snapshot': SNAPSHOT_FILE.exists(), 'rows': len(rows)}
+
+
+if __name__ == "__main__":
+    # python -m tools.memory_sqlite migrate
+    if sys.argv[1:] == ["migrate"]:
+        print(migrate_json_to_sqlite())
+    else:
+        print("Usage: python -m tools.memory_sqlite migrate")
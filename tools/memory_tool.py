@@ -1,13 +1,96 @@
+import atexit
 import json
 import os
+import re
+import tempfile
+from contextlib import contextmanager
 from pathlib import Path
 
+import threading
 import time
 
+from tools.telemetry import traced
+
+try:
+    import fcntl
+except ImportError:  # Windows: compaction is only serialized within one process
+    fcntl = None
+
 # Configuration
+# Storage backend: "json" (session_*.json files) or "sqlite" (data/memory/memory.db)
+MEMORY_BACKEND = os.getenv("MEMORY_BACKEND", "json").lower()
 MEMORY_DIR = Path("data/memory")
 SESSION_ID = str(int(time.time()))
 MEMORY_FILE = MEMORY_DIR / f"session_{SESSION_ID}.json"
+# Shard used when a tool is called without an ADK ToolContext (scripts, tests)
+DEFAULT_USER = "default"
+# Keys surfaced from previous sessions at initialization
+PREVIOUS_SESSION_KEYS = ('user_email', 'user_preferences', 'favorite_categories', 'budget')
+# Append-only log of every stored value, replayed into the preference index
+INDEX_FILE = MEMORY_DIR / "index.jsonl"
+# Appends hold it shared, compaction exclusively, so no append lands in a replaced log
+INDEX_LOCK_FILE = MEMORY_DIR / "index.lock"
+# Write-behind: coalesce stores made within MEMORY_FLUSH_DELAY seconds into one flush
+MEMORY_WRITE_BEHIND = os.getenv("MEMORY_WRITE_BEHIND", "true").lower() == "true"
+MEMORY_FLUSH_DELAY = float(os.getenv("MEMORY_FLUSH_DELAY", "0.5"))
+# A failed flush keeps its writes and retries, backing off up to this many seconds
+MEMORY_FLUSH_MAX_DELAY = float(os.getenv("MEMORY_FLUSH_MAX_DELAY", "30"))
+# Compaction: session files older than MEMORY_RETENTION_DAYS, or beyond the newest
+# MEMORY_RETENTION_FILES, are folded into SNAPSHOT_FILE and deleted
+SNAPSHOT_FILE = MEMORY_DIR / "snapshot.json"
+MEMORY_RETENTION_DAYS = float(os.getenv("MEMORY_RETENTION_DAYS", "30"))
+MEMORY_RETENTION_FILES = int(os.getenv("MEMORY_RETENTION_FILES", "100"))
+
+
+def _safe_id(value: str) -> str:
+    """Normalizes a user id so it can be embedded in a file name."""
+    return re.sub(r'[^A-Za-z0-9.-]+', '-', str(value)).strip('-')[:64] or DEFAULT_USER
+
+
+def _session_name(user_id: str) -> str:
+    """Session name for one user shard of this process."""
+    if user_id == DEFAULT_USER:
+        return SESSION_ID
+    return f"{SESSION_ID}__{user_id}"
+
+
+def _session_file(user_id: str) -> Path:
+    """Session file for one user shard of this process."""
+    return MEMORY_DIR / f"session_{_session_name(user_id)}.json"
+
+
+def _parse_session_file(path: Path):
+    """Returns (session, user_id) encoded in a session file name."""
+    session = path.stem[len("session_"):]
+    parts = session.split("__", 1)
+    return session, parts[1] if len(parts) == 2 else DEFAULT_USER
+
+
+def _atomic_write(path: Path, text: str):
+    """Writes text to a temp file next to path, fsyncs it and renames it into place."""
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.stem}_", suffix=".tmp")
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def _load_snapshot() -> dict:
+    """Returns the compacted {user_id: {key: {"v", "s", "t"}}} snapshot, or {} if none."""
+    if not SNAPSHOT_FILE.exists():
+        return {}
+    try:
+        with open(SNAPSHOT_FILE, 'r') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"Warning: Failed to load memory snapshot: {e}")
+        return {}
 
 class InMemoryMemoryService:
     """
@@ -28,38 +111,367 @@ class InMemoryMemoryService:
     def to_dict(self) -> dict:
         return self._store.copy()
 
-class HybridMemoryManager:
+class PreferenceIndex:
     """
-    Manages memory using both InMemoryMemoryService and a JSON file for persistence.
+    Persistent key index over all sessions, backed by an append-only log.
+
+    Each line of INDEX_FILE is one stored value:
+        {"k": key, "v": value, "s": session_id, "t": timestamp, "u": user_id}
+    ("u" is omitted for DEFAULT_USER). The log is replayed once into a
+    user -> key -> latest entry dict, so lookups are O(1) instead of a scan
+    over every session file. Lines appended later by other processes are
+    picked up incrementally from the last read offset.
+
+    Appends from any thread or process share a file lock that compact()
+    takes exclusively, so a line is never appended to a log that is about
+    to be replaced.
     """
-    def __init__(self):
-        self.memory_service = InMemoryMemoryService()
-        self._load_from_disk()
+    def __init__(self, path: Path = INDEX_FILE, lock_path: Path = INDEX_LOCK_FILE):
+        self.path = path
+        self.lock_path = lock_path
+        self._entries = {}
+        self._offset = 0
+        self._inode = None
+        self._loaded = False
+        self._lock = threading.Lock()
+        self._log_lock = threading.RLock()
 
-    def _load_from_disk(self):
-        """Loads data from the JSON file into the in-memory service."""
-        if MEMORY_FILE.exists():
+    @contextmanager
+    def _locked_log(self, exclusive: bool = False):
+        """Holds the log lock: shared for appends, exclusive for rewrites."""
+        if fcntl is None:
+            with self._log_lock:
+                yield
+            return
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        # Each open() is its own lock holder, so threads exclude each other too
+        with open(self.lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            yield
+
+    def _apply(self, entry: dict):
+        entries = self._entries.setdefault(entry.get("u", DEFAULT_USER), {})
+        current = entries.get(entry["k"])
+        if current is None or entry.get("t", 0) >= current.get("t", 0):
+            entries[entry["k"]] = entry
+
+    @staticmethod
+    def _entry(user_id: str, key: str, value, session: str, timestamp: float) -> dict:
+        entry = {"k": key, "v": value, "s": session, "t": timestamp}
+        if user_id != DEFAULT_USER:
+            entry["u"] = user_id
+        return entry
+
+    def _bootstrap(self):
+        """Builds the log from the snapshot and existing session files (oldest first)."""
+        entries = [
+            self._entry(user_id, key, entry["v"], entry["s"], entry["t"])
+            for user_id, user_entries in _load_snapshot().items()
+            for key, entry in user_entries.items()
+        ]
+        session_files = sorted(
+            MEMORY_DIR.glob("session_*.json"),
+            key=lambda p: p.stat().st_mtime
+        )
+        for session_file in session_files:
             try:
-                with open(MEMORY_FILE, 'r') as f:
+                with open(session_file, 'r') as f:
                     data = json.load(f)
-                    self.memory_service.load_from_dict(data)
-            except Exception as e:
-                print(f"Warning: Failed to load memory file: {e}")
+            except Exception:
+                continue
+            session, user_id = _parse_session_file(session_file)
+            mtime = session_file.stat().st_mtime
+            for key, value in data.items():
+                entries.append(self._entry(user_id, key, value, session, mtime))
+        self._append(entries)
 
-    def _save_to_disk(self):
-        """Saves the current in-memory state to the JSON file."""
-        # Ensure directory exists
+    def _append(self, entries: list):
+        if not entries:
+            return
         MEMORY_DIR.mkdir(parents=True, exist_ok=True)
-        
+        lines = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries)
+        with open(self.path, 'a') as f:
+            f.write(lines)
+
+    def _refresh(self):
+        """Replays log lines written since the last read."""
+        if not self._loaded:
+            self._loaded = True
+            if MEMORY_DIR.exists() and not self.path.exists():
+                self._bootstrap()
         try:
-            with open(MEMORY_FILE, 'w') as f:
-                json.dump(self.memory_service.to_dict(), f, indent=4)
+            stat = self.path.stat()
+        except FileNotFoundError:
+            return
+        size = stat.st_size
+        if stat.st_ino != self._inode or size < self._offset:
+            # Log was rewritten (e.g. compacted), start over
+            self._entries = {}
+            self._offset = 0
+            self._inode = stat.st_ino
+        if size == self._offset:
+            return
+        with open(self.path, 'rb') as f:
+            f.seek(self._offset)
+            chunk = f.read(size - self._offset)
+        # Only consume complete lines; a concurrent writer may be mid-line
+        end = chunk.rfind(b"\n") + 1
+        for line in chunk[:end].splitlines():
+            try:
+                self._apply(json.loads(line))
+            except (ValueError, KeyError):
+                continue
+        self._offset += end
+
+    def record(self, key: str, value, session: str = SESSION_ID, user_id: str = DEFAULT_USER):
+        """Appends a stored value to the log and updates the index."""
+        self.record_many({key: value}, session, user_id)
+
+    def record_many(self, items: dict, session: str = SESSION_ID, user_id: str = DEFAULT_USER):
+        """Appends several stored values to the log in a single write."""
+        now = time.time()
+        entries = [self._entry(user_id, k, v, session, now) for k, v in items.items()]
+        # Appends are single O_APPEND writes, so they only share the lock among
+        # themselves; replaying our own lines later is harmless because _apply
+        # is idempotent
+        with self._locked_log():
+            if not self._loaded:
+                # Bootstrap from session files before the log comes into existence
+                with self._lock:
+                    self._refresh()
+            self._append(entries)
+        with self._lock:
+            for entry in entries:
+                self._apply(entry)
+
+    def lookup(self, key: str, user_id: str = DEFAULT_USER):
+        """Returns the latest entry for key, or None."""
+        with self._lock:
+            self._refresh()
+            return self._entries.get(user_id, {}).get(key)
+
+    def lookup_many(self, keys, user_id: str = DEFAULT_USER) -> dict:
+        """Returns the latest entry for each known key after a single refresh."""
+        with self._lock:
+            self._refresh()
+            entries = self._entries.get(user_id, {})
+            return {k: entries[k] for k in keys if k in entries}
+
+    def compact(self) -> int:
+        """
+        Rewrites the log with only the latest entry per user and key.
+        Returns the number of entries kept.
+        """
+        with self._locked_log(exclusive=True), self._lock:
+            self._refresh()
+            if not self.path.exists():
+                return 0
+            entries = [e for user_entries in self._entries.values() for e in user_entries.values()]
+            lines = "".join(json.dumps(e, separators=(",", ":")) + "\n" for e in entries)
+            _atomic_write(self.path, lines)
+            stat = self.path.stat()
+            self._inode = stat.st_ino
+            self._offset = stat.st_size
+            return len(entries)
+
+
+class JsonFileBackend:
+    """
+    Default storage backend: one session_*.json file per user shard and
+    process, plus a PreferenceIndex for previous-session lookups.
+    """
+    name = "json"
+
+    def __init__(self, index: PreferenceIndex = None):
+        self.index = index or PreferenceIndex()
+
+    def load(self, user_id: str) -> dict:
+        """Returns the current session's data for a user shard."""
+        path = _session_file(user_id)
+        if not path.exists():
+            return {}
+        with open(path, 'r') as f:
+            return json.load(f)
+
+    def save(self, user_id: str, data: dict, changed: dict):
+        """
+        Atomically rewrites the session file, then records changed keys in the index.
+        Writes to a temp file in the same directory, fsyncs it and renames
+        it over the session file, so a crash never leaves a half-written session;
+        the index only learns of values once they are on disk.
+        Returns an error string on failure, otherwise None.
+        """
+        try:
+            # Ensure directory exists
+            MEMORY_DIR.mkdir(parents=True, exist_ok=True)
+            _atomic_write(_session_file(user_id), json.dumps(data, separators=(",", ":")))
+            self.index.record_many(changed, _session_name(user_id), user_id)
         except Exception as e:
             return f"Error saving memory: {str(e)}"
 
+    def lookup_many(self, user_id: str, keys) -> dict:
+        """Returns {key: newest value} across all sessions for the known keys."""
+        return {key: entry["v"] for key, entry in self.index.lookup_many(keys, user_id).items()}
+
+    def compact(self, max_age_days: float, max_files: int) -> dict:
+        """Folds old session files into SNAPSHOT_FILE; see compact_sessions()."""
+        report = {'folded_files': 0, 'kept_files': 0, 'snapshot_keys': 0, 'index_keys': 0}
+        if not MEMORY_DIR.exists():
+            return report
+
+        # Make sure the index has seen every file before any of them disappear
+        self.index.lookup_many(())
+
+        session_files = sorted(
+            (p for p in MEMORY_DIR.glob("session_*.json")
+             if _parse_session_file(p)[0].split("__")[0] != SESSION_ID),
+            key=lambda p: p.stat().st_mtime,
+            reverse=True
+        )
+        cutoff = time.time() - max_age_days * 86400
+        keep = [p for p in session_files[:max_files] if p.stat().st_mtime >= cutoff]
+        old = [p for p in session_files if p not in keep]
+
+        snapshot = _load_snapshot()
+        folded = []
+        for session_file in reversed(old):
+            try:
+                with open(session_file, 'r') as f:
+                    data = json.load(f)
+            except Exception as e:
+                print(f"Warning: Skipping unreadable session file {session_file.name}: {e}")
+                continue
+            session, user_id = _parse_session_file(session_file)
+            user_snapshot = snapshot.setdefault(user_id, {})
+            mtime = session_file.stat().st_mtime
+            for key, value in data.items():
+                if key not in user_snapshot or mtime >= user_snapshot[key].get("t", 0):
+                    user_snapshot[key] = {"v": value, "s": session, "t": mtime}
+            folded.append(session_file)
+
+        if folded:
+            _atomic_write(SNAPSHOT_FILE, json.dumps(snapshot, separators=(",", ":")))
+            for session_file in folded:
+                session_file.unlink(missing_ok=True)
+
+        report['folded_files'] = len(folded)
+        report['kept_files'] = len(keep)
+        report['snapshot_keys'] = sum(len(entries) for entries in snapshot.values())
+        report['index_keys'] = self.index.compact()
+        return report
+
+
+def create_backend(name: str = None):
+    """
+    Returns a storage backend by name ("json" or "sqlite"), defaulting to MEMORY_BACKEND.
+    """
+    name = (name or MEMORY_BACKEND).lower()
+    if name == "json":
+        return JsonFileBackend()
+    if name == "sqlite":
+        from tools.memory_sqlite import SQLiteBackend
+        return SQLiteBackend()
+    raise ValueError(f"Unknown memory backend: {name}")
+
+
+class HybridMemoryManager:
+    """
+    Manages memory using both InMemoryMemoryService and a storage backend
+    (JSON files by default) for persistence.
+
+    Each manager owns one user shard, guarded by its own lock, so
+    concurrent users never contend on the same file.
+
+    In write-behind mode, stores only update memory and schedule a flush
+    flush_delay seconds later, so a burst of writes costs one backend save.
+    Call flush() to persist pending writes immediately (e.g. on shutdown).
+    Unflushed writes stay visible through pending(), and a failed save
+    keeps them queued and retries with backoff.
+    """
+    def __init__(self, backend=None,
+                 write_behind: bool = MEMORY_WRITE_BEHIND,
+                 flush_delay: float = MEMORY_FLUSH_DELAY,
+                 user_id: str = DEFAULT_USER):
+        self.memory_service = InMemoryMemoryService()
+        self.backend = backend or create_backend()
+        self.user_id = user_id
+        self.write_behind = write_behind
+        self.flush_delay = flush_delay
+        self._lock = threading.RLock()
+        self._dirty = {}
+        self._timer = None
+        self._retry_delay = flush_delay
+        self._stats = {'writes': 0, 'flushes': 0, 'coalesced_writes': 0, 'failed_flushes': 0}
+        self._pending_writes = 0
+        self._load_from_disk()
+
+    def _load_from_disk(self):
+        """Loads the current session's data from the backend into the in-memory service."""
+        try:
+            self.memory_service.load_from_dict(self.backend.load(self.user_id))
+        except Exception as e:
+            print(f"Warning: Failed to load memory file: {e}")
+
+    def _schedule_flush(self, delay: float = None):
+        if self._timer is None:
+            self._timer = threading.Timer(self.flush_delay if delay is None else delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    @traced("memory.flush")
+    def flush(self):
+        """
+        Persists all pending writes with a single backend save.
+        Returns an error string if the save failed, otherwise None.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._dirty:
+                return None
+            try:
+                error = self.backend.save(self.user_id, self.memory_service.to_dict(), dict(self._dirty))
+            except Exception as e:
+                error = f"Error saving memory: {str(e)}"
+            if error:
+                # Keep the writes queued and retry; the timer thread has no caller to report to
+                self._stats['failed_flushes'] += 1
+                print(f"Warning: memory flush failed, retrying in {self._retry_delay:.1f}s: {error}")
+                self._schedule_flush(self._retry_delay)
+                self._retry_delay = min(self._retry_delay * 2 or 1.0, MEMORY_FLUSH_MAX_DELAY)
+                return error
+            self._dirty = {}
+            self._retry_delay = self.flush_delay
+            self._stats['flushes'] += 1
+            self._stats['coalesced_writes'] += self._pending_writes - 1
+            self._pending_writes = 0
+            return None
+
+    def pending(self, keys=None) -> dict:
+        """Returns stored values not yet persisted (only the given keys, if any)."""
+        with self._lock:
+            if keys is None:
+                return dict(self._dirty)
+            return {k: self._dirty[k] for k in keys if k in self._dirty}
+
+    def get_write_stats(self) -> dict:
+        """Returns write/flush counters, including how many writes were coalesced."""
+        with self._lock:
+            return dict(self._stats, pending=len(self._dirty))
+
     def store(self, key: str, value: str):
-        self.memory_service.set(key, value)
-        self._save_to_disk()
+        with self._lock:
+            self.memory_service.set(key, value)
+            self._dirty[key] = value
+            self._stats['writes'] += 1
+            self._pending_writes += 1
+            if self.write_behind:
+                self._schedule_flush()
+            else:
+                error = self.flush()
+                if error:
+                    return error
         return f"Stored {key}: {value}"
 
     def retrieve(self, key: str):
@@ -68,70 +480,183 @@ class HybridMemoryManager:
             return "Key not found."
         return val
 
-# Global instance
-_memory_manager = HybridMemoryManager()
 
-def store_preference(key: str, value: str):
+class MemoryRegistry:
+    """
+    Lazily creates one HybridMemoryManager per user shard.
+    All shards share one storage backend for previous-session lookups.
+    """
+    def __init__(self, backend=None, **manager_kwargs):
+        self.backend = backend or create_backend()
+        self._manager_kwargs = manager_kwargs
+        self._managers = {}
+        self._lock = threading.Lock()
+
+    def get(self, user_id: str = DEFAULT_USER) -> HybridMemoryManager:
+        manager = self._managers.get(user_id)
+        if manager is None:
+            with self._lock:
+                manager = self._managers.get(user_id)
+                if manager is None:
+                    manager = HybridMemoryManager(
+                        backend=self.backend, user_id=user_id, **self._manager_kwargs
+                    )
+                    self._managers[user_id] = manager
+        return manager
+
+    def managers(self) -> list:
+        with self._lock:
+            return list(self._managers.values())
+
+    def _lookup_shard(self, user_id: str, keys: tuple) -> dict:
+        """Backend lookup overlaid with the shard's unflushed writes, which are newer."""
+        found = self.backend.lookup_many(user_id, keys)
+        manager = self._managers.get(user_id)
+        if manager is not None:
+            found.update(manager.pending(keys))
+        return found
+
+    def lookup_many(self, user_id: str, keys) -> dict:
+        """
+        Newest value per key in the user's shard. Keys the shard has never
+        stored fall back to the DEFAULT_USER shard, which holds everything
+        saved before per-user shards existed and by scripts without a
+        ToolContext.
+        """
+        keys = tuple(keys)
+        found = self._lookup_shard(user_id, keys)
+        missing = tuple(k for k in keys if k not in found)
+        if missing and user_id != DEFAULT_USER:
+            found.update(self._lookup_shard(DEFAULT_USER, missing))
+        return found
+
+    def flush_all(self):
+        """Flushes every shard; returns the first error string, if any."""
+        errors = [m.flush() for m in self.managers()]
+        return next((e for e in errors if e), None)
+
+
+# Global registry
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def _get_registry() -> MemoryRegistry:
+    """Returns the process-wide registry (created on first use)."""
+    global _registry
+    if _registry is None:
+        with _registry_lock:
+            if _registry is None:
+                registry = MemoryRegistry()
+                atexit.register(registry.flush_all)
+                _registry = registry
+    return _registry
+
+
+def resolve_user_id(tool_context=None) -> str:
+    """Resolves the memory shard for an ADK ToolContext (DEFAULT_USER without one)."""
+    user_id = getattr(tool_context, 'user_id', None) if tool_context is not None else None
+    return _safe_id(user_id) if user_id else DEFAULT_USER
+
+
+def get_memory_manager(user_id: str = DEFAULT_USER) -> HybridMemoryManager:
+    """
+    Returns the memory manager for a user shard.
+    """
+    return _get_registry().get(_safe_id(user_id))
+
+@traced()
+def store_preference(key: str, value: str, tool_context=None):
     """
     Stores a user preference or data.
     """
-    return _memory_manager.store(key, value)
+    return _get_registry().get(resolve_user_id(tool_context)).store(key, value)
 
-def retrieve_preference(key: str):
+@traced()
+def retrieve_preference(key: str, tool_context=None):
     """
     Retrieves a user preference or data.
     """
-    return _memory_manager.retrieve(key)
+    return _get_registry().get(resolve_user_id(tool_context)).retrieve(key)
 
-def get_from_previous_sessions(key: str):
+def flush_memory():
     """
-    Searches all previous session files for a specific key.
+    Persists any pending write-behind stores immediately.
+    """
+    return _get_registry().flush_all()
+
+def get_memory_write_stats() -> dict:
+    """
+    Returns persistence counters summed over all user shards.
+    """
+    totals = {'writes': 0, 'flushes': 0, 'coalesced_writes': 0, 'failed_flushes': 0, 'pending': 0}
+    managers = _get_registry().managers()
+    for manager in managers:
+        for name, count in manager.get_write_stats().items():
+            totals[name] += count
+    totals['shards'] = len(managers)
+    return totals
+
+def get_from_previous_sessions(key: str, tool_context=None):
+    """
+    Looks up a key across all sessions via the storage backend's index.
     Returns the most recently stored value, or None if not found.
     """
-    if not MEMORY_DIR.exists():
-        return None
-    
-    # Get all session files, sorted by modification time (newest first)
-    session_files = sorted(
-        MEMORY_DIR.glob("session_*.json"),
-        key=lambda p: p.stat().st_mtime,
-        reverse=True
-    )
-    
-    for session_file in session_files:
-        try:
-            with open(session_file, 'r') as f:
-                data = json.load(f)
-                if key in data:
-                    return data[key]
-        except Exception:
-            continue
-    
-    return None
+    return _get_registry().lookup_many(resolve_user_id(tool_context), (key,)).get(key)
+
+def get_many_from_previous_sessions(keys, user_id: str = DEFAULT_USER) -> dict:
+    """
+    Batched version of get_from_previous_sessions.
+    Resolves the newest value for every key in one pass over the index
+    (one indexed query with the SQLite backend). Keys that were never
+    stored are omitted.
+    """
+    return _get_registry().lookup_many(_safe_id(user_id), keys)
+
+def compact_sessions(max_age_days: float = None, max_files: int = None) -> dict:
+    """
+    Folds old session data into a compact form and enforces retention.
 
-def get_all_preferences() -> dict:
+    A session is old if it is older than max_age_days or is not among the
+    newest max_files (defaults: MEMORY_RETENTION_DAYS / MEMORY_RETENTION_FILES).
+    With the JSON backend, old session files are folded into SNAPSHOT_FILE
+    (latest value per user and key) and the index log is rewritten to one
+    line per user and key; with SQLite, superseded rows of old sessions are
+    deleted. Either way lookups return the same results before and after
+    compaction, and data of the current process is never touched.
+    Safe to run at startup or on demand: the index rewrite holds a file lock
+    that excludes concurrent appends from other threads and processes
+    (POSIX; on Windows only from other threads).
+    """
+    if max_age_days is None:
+        max_age_days = MEMORY_RETENTION_DAYS
+    if max_files is None:
+        max_files = MEMORY_RETENTION_FILES
+    return _get_registry().backend.compact(max_age_days, max_files)
+
+def get_all_preferences(tool_context=None) -> dict:
     """
     Returns all stored preferences in one call.
     Used for batching operations (Option 1).
     """
-    return _memory_manager.memory_service.to_dict()
+    return _get_registry().get(resolve_user_id(tool_context)).memory_service.to_dict()
 
-def get_session_summary() -> dict:
+def get_session_summary(tool_context=None) -> dict:
     """
     Returns summary of current + previous session data.
     Useful for initialization (Option 3).
     """
-    current = _memory_manager.memory_service.to_dict()
-    
+    user_id = resolve_user_id(tool_context)
+    current = _get_registry().get(user_id).memory_service.to_dict()
+
     # Get commonly used keys from previous sessions
-    previous = {}
-    for key in ['user_email', 'user_preferences', 'favorite_categories', 'budget']:
-        value = get_from_previous_sessions(key)
-        if value:
-            previous[key] = value
-    
+    previous = {
+        key: value
+        for key, value in get_many_from_previous_sessions(PREVIOUS_SESSION_KEYS, user_id).items()
+        if value
+    }
+
     return {
         'current_session': current,
         'previous_sessions': previous
     }
-
@@ -0,0 +1,269 @@
+import asyncio
+import os
+import threading
+import time
+from email.utils import parsedate_to_datetime
+
+# Configuration
+# Per-upstream limits as "<requests>/<seconds>", overridable with RATE_LIMIT_<NAME>
+# (e.g. RATE_LIMIT_IP_API=45/60). The bucket holds at most one period's worth.
+DEFAULT_LIMITS = {
+    'reddit': "30/60",
+    'ip-api': "45/60",      # ip-api.com free tier: 45 requests per minute
+    'youtube': "5/1",       # Data API per-second burst limit; daily quota is separate
+    'gemini': "60/60",
+}
+# Longest a call may queue for a token before it is rejected (seconds)
+RATE_LIMIT_DEADLINE = float(os.getenv("RATE_LIMIT_DEADLINE", "10"))
+# After a throttle the rate is halved, down to this fraction of the configured
+# rate, and recovers additively by this fraction per successful call
+RATE_LIMIT_MIN_FRACTION = float(os.getenv("RATE_LIMIT_MIN_FRACTION", "0.1"))
+RATE_LIMIT_RECOVERY = float(os.getenv("RATE_LIMIT_RECOVERY", "0.05"))
+# Pause after a throttle that carries no Retry-After (seconds)
+RATE_LIMIT_DEFAULT_PAUSE = float(os.getenv("RATE_LIMIT_DEFAULT_PAUSE", "5"))
+
+
+class RateLimitExceeded(Exception):
+    """Raised when no token frees up before the caller's deadline."""
+    def __init__(self, name: str, retry_after: float):
+        super().__init__(f"{name} is rate limited; try again in {retry_after:.0f}s")
+        self.name = name
+        self.retry_after = retry_after
+
+
+def parse_retry_after(value) -> float:
+    """Retry-After in seconds from either delta-seconds or an HTTP date; None if absent."""
+    if value is None or value == "":
+        return None
+    try:
+        return max(float(value), 0.0)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """
+    Token bucket for one upstream with AIMD adaptive rate.
+    Callers queue (FIFO by arrival, up to a deadline) for a token; a throttle
+    signal from the upstream pauses the bucket for Retry-After and halves the
+    refill rate, which then recovers gradually on success.
+    """
+    def __init__(self, name: str, requests: float, period: float):
+        self.name = name
+        self.base_rate = requests / period
+        self.rate = self.base_rate
+        self.capacity = max(requests, 1.0)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self._next_ticket = 0
+        self._serving = 0
+        self._abandoned = set()
+        self._lock = threading.Lock()
+        self.stats = {'acquired': 0, 'waited': 0, 'wait_seconds': 0.0, 'rejected': 0,
+                      'throttled': 0, 'max_queue_depth': 0}
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def _wait_time(self, now: float, ahead: int) -> float:
+        """Seconds until a token is available for a caller with `ahead` callers before it."""
+        self._refill(now)
+        wait = max(self.paused_until - now, 0.0)
+        needed = ahead + 1.0
+        if self.tokens < needed:
+            wait = max(wait, (needed - self.tokens) / self.rate)
+        return wait
+
+    def _advance(self):
+        self._serving += 1
+        while self._serving in self._abandoned:
+            self._abandoned.discard(self._serving)
+            self._serving += 1
+
+    def _abandon(self, ticket: int):
+        if ticket == self._serving:
+            self._advance()
+        else:
+            self._abandoned.add(ticket)
+
+    def _try_take(self, ticket: int, deadline: float):
+        """
+        Returns (taken, wait) for the caller holding ticket. Callers are served
+        in arrival order; one that cannot be served before its deadline leaves
+        the queue at once with RateLimitExceeded rather than waiting it out.
+        """
+        now = time.monotonic()
+        with self._lock:
+            wait = self._wait_time(now, ticket - self._serving)
+            if ticket == self._serving and wait <= 0:
+                self.tokens -= 1.0
+                self._advance()
+                return True, 0.0
+            if now + wait > deadline:
+                self._abandon(ticket)
+                raise RateLimitExceeded(self.name, wait)
+            return False, max(wait, 0.005)
+
+    def _enter(self) -> int:
+        with self._lock:
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            depth = self._queue_depth()
+            self.stats['max_queue_depth'] = max(self.stats['max_queue_depth'], depth)
+            return ticket
+
+    def _queue_depth(self) -> int:
+        return self._next_ticket - self._serving - len(self._abandoned)
+
+    def _leave(self, start: float, error: bool):
+        with self._lock:
+            if error:
+                self.stats['rejected'] += 1
+                return
+            self.stats['acquired'] += 1
+            waited = time.monotonic() - start
+            if waited > 0.001:
+                self.stats['waited'] += 1
+                self.stats['wait_seconds'] += waited
+
+    def acquire(self, timeout: float = None):
+        """Blocks until a token is available; raises RateLimitExceeded past the deadline."""
+        start = time.monotonic()
+        deadline = start + (RATE_LIMIT_DEADLINE if timeout is None else timeout)
+        ticket = self._enter()
+        try:
+            while True:
+                taken, wait = self._try_take(ticket, deadline)
+                if taken:
+                    break
+                time.sleep(min(wait, 0.25))
+        except RateLimitExceeded:
+            self._leave(start, error=True)
+            raise
+        self._leave(start, error=False)
+
+    async def acquire_async(self, timeout: float = None):
+        """Like acquire(), but waits without blocking the event loop."""
+        start = time.monotonic()
+        deadline = start + (RATE_LIMIT_DEADLINE if timeout is None else timeout)
+        ticket = self._enter()
+        try:
+            while True:
+                taken, wait = self._try_take(ticket, deadline)
+                if taken:
+                    break
+                await asyncio.sleep(min(wait, 0.25))
+        except RateLimitExceeded:
+            self._leave(start, error=True)
+            raise
+        except asyncio.CancelledError:
+            with self._lock:
+                self._abandon(ticket)
+            self._leave(start, error=True)
+            raise
+        self._leave(start, error=False)
+
+    def throttled(self, retry_after: float = None):
+        """Upstream said slow down: pause for Retry-After and halve the rate."""
+        pause = RATE_LIMIT_DEFAULT_PAUSE if retry_after is None else retry_after
+        now = time.monotonic()
+        with self._lock:
+            self._refill(now)
+            self.paused_until = max(self.paused_until, now + pause)
+            self.rate = max(self.rate / 2, self.base_rate * RATE_LIMIT_MIN_FRACTION)
+            self.tokens = min(self.tokens, 0.0)
+            self.stats['throttled'] += 1
+        print(f"Warning: {self.name} throttled us; pausing {pause:.1f}s, "
+              f"rate now {self.rate * 60:.1f}/min")
+
+    def pause(self, seconds: float):
+        """Upstream quota window is used up: hold all calls until it resets."""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def succeeded(self):
+        with self._lock:
+            if self.rate < self.base_rate:
+                self._refill(time.monotonic())
+                self.rate = min(self.base_rate, self.rate + self.base_rate * RATE_LIMIT_RECOVERY)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(
+                self.stats,
+                queue_depth=self._queue_depth(),
+                wait_seconds=round(self.stats['wait_seconds'], 3),
+                rate_per_min=round(self.rate * 60, 2),
+                base_rate_per_min=round(self.base_rate * 60, 2),
+                tokens=round(min(self.capacity, self.tokens), 2),
+                paused_for=round(max(self.paused_until - time.monotonic(), 0.0), 2),
+            )
+
+
+def _parse_limit(spec: str) -> tuple:
+    requests, _, period = spec.partition("/")
+    return float(requests), float(period or 1)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(name: str) -> TokenBucket:
+    """Returns the process-wide bucket for an upstream (created on first use)."""
+    limiter = _limiters.get(name)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(name)
+            if limiter is None:
+                env_name = "RATE_LIMIT_" + name.upper().replace("-", "_")
+                spec = os.getenv(env_name, DEFAULT_LIMITS.get(name, "60/60"))
+                limiter = _limiters[name] = TokenBucket(name, *_parse_limit(spec))
+    return limiter
+
+
+def get_rate_limit_stats() -> dict:
+    """
+    Returns per-upstream queue depth, waits, rejections and throttle counts.
+    """
+    with _limiters_lock:
+        limiters = list(_limiters.values())
+    return {limiter.name: limiter.get_stats() for limiter in limiters}
+
+
+def _is_quota_error(error: Exception) -> bool:
+    text = str(error)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text
+
+
+async def gemini_before_model(callback_context, llm_request):
+    """
+    before_model_callback: waits for a Gemini token. If none frees up before
+    the deadline, answers with a short notice instead of calling the model.
+    """
+    try:
+        await get_limiter('gemini').acquire_async()
+    except RateLimitExceeded as e:
+        from google.adk.models import LlmResponse
+        from google.genai import types
+
+        return LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(
+                text=f"The assistant is handling too many requests right now; please try again in {e.retry_after:.0f} seconds."
+            )]),
+            error_code="RATE_LIMITED",
+        )
+    return None
+
+
+async def gemini_on_model_error(callback_context, llm_request, error):
+    """on_model_error_callback: feeds Gemini 429s back into the bucket."""
+    if _is_quota_error(error):
+        get_limiter('gemini').throttled()
+    return None
@@ -1,31 +1,168 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
 
-def scrape_reddit(query: str):
+from tools import http_client
+from tools.cache import normalize_query
+from tools.disk_cache import get_disk_cache, get_disk_cache_stats, make_key
+from tools.rate_limit import RateLimitExceeded
+from tools.singleflight import single_flight
+from tools.telemetry import annotate, traced
+from tools.text_digest import digest
+
+# Configuration
+# Comment harvesting: top comments per post, fetched by a bounded worker pool
+# and abandoned once the per-call deadline (seconds) passes
+REDDIT_TOP_COMMENTS = int(os.getenv("REDDIT_TOP_COMMENTS", "3"))
+REDDIT_COMMENT_WORKERS = int(os.getenv("REDDIT_COMMENT_WORKERS", "5"))
+REDDIT_COMMENT_DEADLINE = float(os.getenv("REDDIT_COMMENT_DEADLINE", "8"))
+# Post and comment text is capped per field (as the tool always did) and the
+# condensed payload handed to the LLM is further held to the token budget
+REDDIT_FIELD_CHARS = int(os.getenv("REDDIT_FIELD_CHARS", "200"))
+REDDIT_TOKEN_BUDGET = int(os.getenv("REDDIT_TOKEN_BUDGET", "400"))
+
+# Overridable to point the tool at a stand-in server (see benchmarks/)
+REDDIT_URL = os.getenv("REDDIT_BASE_URL", "https://www.reddit.com").rstrip("/")
+HEADERS = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Shared pool, so concurrent conversations together stay within REDDIT_COMMENT_WORKERS."""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=REDDIT_COMMENT_WORKERS, thread_name_prefix="reddit-comments"
+                )
+    return _executor
+
+def _fetch_top_comments(permalink: str, timeout: float) -> list:
+    """Returns [(score, body)] for the top-level top comments of one post."""
+    response = http_client.get(
+        f"{REDDIT_URL}{permalink.rstrip('/')}.json",
+        params={'sort': 'top', 'limit': REDDIT_TOP_COMMENTS, 'depth': 1},
+        headers=HEADERS,
+        timeout=(http_client.HTTP_CONNECT_TIMEOUT, timeout),
+        upstream="reddit",
+    )
+    response.raise_for_status()
+    listing = response.json()
+    comments = []
+    for child in listing[1]['data']['children']:
+        comment = child.get('data', {})
+        if child.get('kind') != 't1' or comment.get('stickied') or comment.get('author') == 'AutoModerator':
+            continue
+        comments.append((comment.get('score', 0), comment.get('body', '')))
+    comments.sort(key=lambda c: c[0], reverse=True)
+    return comments[:REDDIT_TOP_COMMENTS]
+
+def _harvest_comments(posts: list) -> tuple:
+    """
+    Fetches top comments for all posts in parallel within REDDIT_COMMENT_DEADLINE.
+    Returns (harvested, complete): one entry per post, either a list of
+    comments or an error/timeout string, and whether every fetch succeeded.
+    """
+    executor = _get_executor()
+    futures = [
+        executor.submit(_fetch_top_comments, post['permalink'], REDDIT_COMMENT_DEADLINE)
+        if post.get('permalink') else None
+        for post in posts
+    ]
+    wait([f for f in futures if f], timeout=REDDIT_COMMENT_DEADLINE)
+
+    harvested = []
+    complete = True
+    for future in futures:
+        if future is None:
+            harvested.append("(no comments link)")
+        elif not future.done():
+            future.cancel()
+            harvested.append("(comments timed out)")
+            complete = False
+        elif future.exception():
+            harvested.append(f"(comments unavailable: {future.exception()})")
+            complete = False
+        else:
+            harvested.append(future.result())
+    return harvested, complete
+
+def _request_key(query: str, include_comments: bool = False) -> str:
+    return normalize_query(query) + ("|comments" if include_comments else "")
+
+# Concurrent identical searches (e.g. on a product launch) share one upstream request
+@traced()
+@single_flight(key=_request_key, name="scrape_reddit")
+async def scrape_reddit(query: str, include_comments: bool = False):
     """
     Searches Reddit for the query and returns post titles and content using JSON API.
+    Set include_comments=True to also get the top comments of each post
+    (fetched in parallel) for a full sentiment pass in a single call.
     """
+    # Results are cached on disk per normalized query to spare Reddit's
+    # latency and rate limit; stale ones are served and refreshed in the background.
+    # HTTP and rate-limit waits block, so they run off the event loop and
+    # concurrent agents (e.g. research_product branches) overlap
+    return await asyncio.to_thread(
+        get_disk_cache().fetch,
+        "scrape_reddit",
+        make_key("scrape_reddit", _request_key(query, include_comments)),
+        lambda: _search_reddit(query, include_comments),
+    )
+
+def _search_reddit(query: str, include_comments: bool) -> tuple:
+    """Runs the search; returns (result, cacheable)."""
     # Search URL for reddit
-    search_url = f"https://www.reddit.com/search.json?q={query}&sort=relevance&t=all"
-    headers = {'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'}
-    
+    search_url = f"{REDDIT_URL}/search.json"
+    params = {'q': query, 'sort': 'relevance', 't': 'all'}
+
     try:
-        response = requests.get(search_url, headers=headers)
+        response = http_client.get(search_url, params=params, headers=HEADERS, upstream="reddit")
         if response.status_code != 200:
-            return f"Error scraping Reddit: Status {response.status_code}"
-            
+            return f"Error scraping Reddit: Status {response.status_code}", False
+
         data = response.json()
-        posts = []
-        
+
         # Navigate the JSON structure
-        if 'data' in data and 'children' in data['data']:
-            for child in data['data']['children'][:5]: # Top 5 posts
-                post = child['data']
-                title = post.get('title', 'No Title')
-                selftext = post.get('selftext', '')[:200] + "..." if post.get('selftext') else ""
-                url = post.get('url', '')
-                posts.append(f"Title: {title}\nSummary: {selftext}\nLink: {url}\n")
-                
-        return "\n".join(posts) if posts else "No posts found."
+        children = data.get('data', {}).get('children', [])
+        posts = [child['data'] for child in children[:5]] # Top 5 posts
+        if not posts:
+            return "No posts found.", True
+
+        comments, complete = [None] * len(posts), True
+        if include_comments:
+            comments, complete = _harvest_comments(posts)
+
+        # Post and comment text is capped per field, then condensed locally
+        # (dedupe + key sentences under a token budget) before it reaches the LLM
+        items = []
+        for post, post_comments in zip(posts, comments):
+            title = post.get('title', 'No Title')
+            url = post.get('url', '')
+            header = f"Title: {title}\nLink: {url}"
+            fields = [("Summary: ", post.get('selftext', ''))]
+            if isinstance(post_comments, str):
+                header += f"\nTop comments: {post_comments}"
+            elif post_comments is not None:
+                fields += [(f"Comment [{score}]: ", body) for score, body in post_comments]
+            items.append({'header': header, 'fields': fields})
+
+        result, stats = digest(items, REDDIT_TOKEN_BUDGET, field_chars=REDDIT_FIELD_CHARS)
+        # Totals are in get_digest_stats(); the span carries this call's savings
+        annotate(digest_tokens_in=stats['tokens_in'], digest_tokens_out=stats['tokens_out'])
+        # Only complete, successful responses are cached; errors are retried next time
+        return result, complete
+    except RateLimitExceeded as e:
+        return f"Reddit is busy (rate limited); try again in {e.retry_after:.0f}s instead of retrying now.", False
     except Exception as e:
-        return f"Error scraping Reddit: {str(e)}"
+        return f"Error scraping Reddit: {str(e)}", False
+
+def get_reddit_cache_stats() -> dict:
+    """
+    Returns hit/miss/eviction counters for the tool result cache that
+    scrape_reddit shares with the other tools.
+    """
+    return get_disk_cache_stats()
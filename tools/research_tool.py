@@ -0,0 +1,92 @@
+import asyncio
+import os
+import time
+
+# Configuration
+# Seconds each research branch may take before it is abandoned
+RESEARCH_BRANCH_TIMEOUT = float(os.getenv("RESEARCH_BRANCH_TIMEOUT", "60"))
+
+# Source name -> (section label, request template)
+SOURCES = {
+    'search': ("Google Search", "{query}"),
+    'reddit': ("Reddit", "Find user reviews, discussions and overall sentiment on Reddit for: {query}"),
+    'youtube': ("YouTube", "Find the most useful video reviews on YouTube for: {query}"),
+}
+
+_branches = None
+
+
+def _get_branches() -> dict:
+    """Lazily wraps the search, Reddit and YouTube agents as AgentTools."""
+    global _branches
+    if _branches is None:
+        from google.adk.tools import AgentTool
+        from agents.search import agent as search_module
+        from agents.reddit import agent as reddit_module
+        from agents.youtube import agent as youtube_module
+
+        _branches = {
+            'search': AgentTool(agent=search_module.root_agent),
+            'reddit': AgentTool(agent=reddit_module.root_agent),
+            'youtube': AgentTool(agent=youtube_module.root_agent),
+        }
+    return _branches
+
+
+async def _run_branch(source: str, request: str, tool_context, timeout: float) -> dict:
+    """Runs one sub-agent with a deadline; never raises."""
+    start = time.perf_counter()
+    try:
+        content = await asyncio.wait_for(
+            _get_branches()[source].run_async(args={'request': request}, tool_context=tool_context),
+            timeout=timeout,
+        )
+        status = 'ok'
+    except asyncio.TimeoutError:
+        content, status = f"Timed out after {timeout:.0f}s.", 'timeout'
+    except Exception as e:
+        content, status = f"Error: {str(e)}", 'error'
+    return {'status': status, 'content': content, 'seconds': round(time.perf_counter() - start, 2)}
+
+
+async def research_product(query: str, location_context: str = "",
+                           sources: str = "search,reddit,youtube", tool_context=None) -> str:
+    """
+    Researches a product on Google Search, Reddit and YouTube CONCURRENTLY.
+    Use this instead of calling search_agent, reddit_agent and youtube_agent
+    one after another; the turn then costs roughly the slowest source.
+
+    Args:
+        query: The product to research, e.g. "Google Pixel 10".
+        location_context: Optional country/currency, e.g. "India, INR".
+        sources: Comma-separated subset of "search,reddit,youtube".
+
+    Returns the findings of every source, each tagged with its source name.
+    """
+    if tool_context is None:
+        return "Error: research_product must be called by an agent."
+
+    selected = [s.strip().lower() for s in sources.split(",") if s.strip().lower() in SOURCES]
+    if not selected:
+        return f"Error: no valid sources in '{sources}'. Use any of: {', '.join(SOURCES)}."
+
+    branch_requests = {}
+    for source in selected:
+        request = SOURCES[source][1].format(query=query)
+        if location_context and source == 'search':
+            request += f" (User location: {location_context})"
+        branch_requests[source] = request
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        _run_branch(source, request, tool_context, RESEARCH_BRANCH_TIMEOUT)
+        for source, request in branch_requests.items()
+    ))
+    elapsed = time.perf_counter() - start
+
+    output = [f"=== Research: {query} ({elapsed:.1f}s, sources ran in parallel) ===\n"]
+    for source, result in zip(branch_requests, results):
+        label = SOURCES[source][0]
+        output.append(f"[FROM {label.upper()}] ({result['status']}, {result['seconds']}s):")
+        output.append(f"{result['content']}\n")
+    return '\n'.join(output)
@@ -0,0 +1,164 @@
+import asyncio
+import time
+
+from tools import cassette, rate_limit
+from tools.cache import normalize_question
+from tools.disk_cache import get_disk_cache, make_key
+from tools.semantic_cache import SEARCH_CACHE_FUZZY, get_semantic_index
+from tools.telemetry import record
+
+# Session state key (temp: is never persisted) carrying the cache key of the
+# current search_agent request from before_model to after_model
+STATE_KEY = "temp:search_cache_key"
+STATE_TEXT = "temp:search_cache_text"
+STATE_MODEL = "temp:search_cache_model"
+
+TOOL = "search_agent"
+
+_refresh_tasks = set()
+_stats = {'exact_hits': 0, 'fuzzy_hits': 0, 'misses': 0}
+
+
+def _request_text(llm_request):
+    """
+    The delegated question if the request is a single user turn of plain
+    text (a fresh AgentTool call), else None - multi-turn requests are
+    never cached.
+    """
+    contents = llm_request.contents or []
+    if len(contents) != 1 or contents[0].role != 'user':
+        return None
+    parts = contents[0].parts or []
+    if not parts or any(part.text is None for part in parts):
+        return None
+    return " ".join(part.text for part in parts).strip() or None
+
+
+def _cacheable(llm_response) -> bool:
+    return bool(
+        llm_response.content
+        and llm_response.content.parts
+        and not llm_response.partial
+        and not llm_response.error_code
+        and any(part.text for part in llm_response.content.parts)
+    )
+
+
+async def _revalidate(key: str, llm_request):
+    """Re-runs a stale search against the model and stores the new answer."""
+    from google.adk.models.registry import LLMRegistry
+
+    cache = get_disk_cache()
+    try:
+        await rate_limit.get_limiter('gemini').acquire_async()
+        llm = LLMRegistry.new_llm(llm_request.model)
+        final = None
+        async for response in llm.generate_content_async(llm_request, stream=False):
+            final = response
+        if final is not None and _cacheable(final):
+            await asyncio.to_thread(
+                cache.set, key, TOOL, final.model_dump(mode='json', exclude_none=True)
+            )
+            cache.record_refresh(True)
+            return
+    except Exception as e:
+        print(f"Warning: background refresh of {TOOL} failed: {e}")
+    cache.record_refresh(False)
+    await asyncio.to_thread(cache.release_refresh, key)
+
+
+async def search_cache_before_model(callback_context, llm_request):
+    """
+    before_model_callback for search_agent: answers repeat questions from
+    the persistent tool cache without calling Gemini + Google Search. A
+    stale answer is returned at once and revalidated in the background.
+    Off while TOOL_IO_MODE records or replays: every search (and no
+    background revalidation) goes through the cassette.
+    """
+    if cassette.active():
+        return None
+    text = _request_text(llm_request)
+    if text is None:
+        return None
+    started = time.perf_counter()
+    key = make_key(TOOL, llm_request.model, normalize_question(text))
+    cache = get_disk_cache()
+    try:
+        value, state = await asyncio.to_thread(cache.get, key)
+        if state is None and SEARCH_CACHE_FUZZY:
+            value, state = await asyncio.to_thread(_fuzzy_lookup, llm_request.model, text)
+    except Exception as e:
+        print(f"Warning: search cache unavailable: {e}")
+        return None
+
+    if state is None:
+        _stats['misses'] += 1
+        callback_context.state[STATE_KEY] = key
+        callback_context.state[STATE_TEXT] = text
+        callback_context.state[STATE_MODEL] = llm_request.model
+        return None
+    record(f"{TOOL}.cache", time.perf_counter() - started, cache_hit=True, cache_state=state)
+    if state == 'fuzzy':
+        _stats['fuzzy_hits'] += 1
+        from google.adk.models import LlmResponse
+        return LlmResponse.model_validate(value)
+
+    _stats['exact_hits'] += 1
+
+    if state == 'stale' and await asyncio.to_thread(cache.claim_refresh, key):
+        task = asyncio.create_task(_revalidate(key, llm_request.model_copy()))
+        _refresh_tasks.add(task)
+        task.add_done_callback(_refresh_tasks.discard)
+
+    from google.adk.models import LlmResponse
+    return LlmResponse.model_validate(value)
+
+
+async def search_cache_after_model(callback_context, llm_response):
+    """after_model_callback for search_agent: stores fresh grounded answers."""
+    key = callback_context.state.get(STATE_KEY)
+    if not key or not _cacheable(llm_response):
+        return None
+    text = callback_context.state.get(STATE_TEXT)
+    model = callback_context.state.get(STATE_MODEL)
+    callback_context.state[STATE_KEY] = None
+    try:
+        await asyncio.to_thread(_store, key, model, text, llm_response.model_dump(mode='json', exclude_none=True))
+    except Exception as e:
+        print(f"Warning: search cache write failed: {e}")
+    return None
+
+
+def _index_tool(model: str) -> str:
+    return f"{TOOL}:{model}"
+
+
+def _fuzzy_lookup(model: str, text: str) -> tuple:
+    """
+    Finds a paraphrase of text answered recently: the most similar indexed
+    query whose cached answer is still fresh. Returns (value, 'fuzzy') or
+    (None, None). Stale answers are left to the exact-match path.
+    """
+    cache = get_disk_cache()
+    index = get_semantic_index()
+    for match_key, _ in index.lookup(_index_tool(model), text):
+        value, state = cache.get(match_key)
+        if state == 'fresh':
+            return value, 'fuzzy'
+        if state is None:
+            index.remove(match_key)  # Evicted or expired from the cache
+    return None, None
+
+
+def _store(key: str, model: str, text: str, value: dict):
+    get_disk_cache().set(key, TOOL, value)
+    if text and SEARCH_CACHE_FUZZY:
+        # The model is part of the exact key; paraphrases only match per model too
+        get_semantic_index().add(_index_tool(model), key, text)
+
+
+def get_search_cache_stats() -> dict:
+    """
+    Returns exact and fuzzy (paraphrase) hits and misses of the search_agent cache.
+    """
+    return dict(_stats)
@@ -0,0 +1,309 @@
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from tools.cache import normalize_query, normalize_question
+from tools.disk_cache import CACHE_DIR
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Configuration
+SEMANTIC_INDEX_DB = CACHE_DIR / "semantic_index.db"
+# Minimum character-trigram Jaccard similarity for two queries to share an answer
+SEARCH_CACHE_SIMILARITY = float(os.getenv("SEARCH_CACHE_SIMILARITY", "0.7"))
+SEARCH_CACHE_FUZZY = os.getenv("SEARCH_CACHE_FUZZY", "true").lower() in ("1", "true", "yes")
+
+# MinHash signature of NUM_BANDS x ROWS_PER_BAND values; queries sharing any
+# band are candidates (~99% recall at similarity 0.7, verified exactly)
+NUM_BANDS = 16
+ROWS_PER_BAND = 4
+NUM_PERMUTATIONS = NUM_BANDS * ROWS_PER_BAND
+_permutations = None
+
+# Words that name a different product variant; they must match exactly,
+# as must anything containing a digit (model numbers, budgets)
+VARIANT_WORDS = frozenset({
+    "pro", "max", "plus", "ultra", "mini", "lite", "se", "xl", "fe", "air", "fold", "flip",
+    "refurbished", "used", "new",
+})
+CURRENCY_CODES = frozenset({
+    "usd", "eur", "gbp", "inr", "jpy", "cny", "aud", "cad", "chf", "sgd", "aed", "brl",
+    "mxn", "krw", "zar", "sek", "nok", "dkk", "pln", "try", "idr", "thb", "myr", "php",
+})
+# What the question asks for; a price answer never serves a review question.
+# Each group present is part of the fingerprint, so intents must match exactly
+INTENT_TERMS = {
+    'price': frozenset({"price", "prices", "pricing", "cost", "costs", "cheap", "cheapest",
+                        "deal", "deals", "discount", "expensive", "affordable", "msrp"}),
+    'review': frozenset({"review", "reviews", "opinion", "opinions", "thoughts", "experience",
+                         "experiences", "worth", "good", "pros", "cons", "reliable", "problems", "issues"}),
+    'specs': frozenset({"spec", "specs", "specification", "specifications", "feature", "features",
+                        "dimensions", "size", "weight"}),
+    'compare': frozenset({"vs", "versus", "compare", "compared", "comparison", "difference",
+                          "better", "alternative", "alternatives"}),
+    'recommend': frozenset({"best", "top", "recommend", "recommended", "recommendation", "recommendations"}),
+    'buy': frozenset({"buy", "buying", "purchase", "where", "stock", "available", "availability"}),
+}
+_INTENT_WORDS = frozenset().union(*INTENT_TERMS.values())
+# Brand names are often left out ("Pixel 10" vs "Google Pixel 10"), so a
+# missing brand does not lower similarity; two different brands never match
+BRAND_WORDS = frozenset({
+    "google", "samsung", "apple", "oneplus", "xiaomi", "redmi", "poco", "sony", "motorola",
+    "huawei", "honor", "oppo", "vivo", "realme", "nokia", "asus", "lenovo", "dell", "hp",
+    "lg", "microsoft", "amazon", "bose", "jbl", "sennheiser", "garmin", "fitbit", "nothing",
+})
+# Countries, their common aliases and currency names. Wherever they appear
+# (the "(User location: ...)" suffix or free text such as "price in Japan")
+# they join the fingerprint, so an answer for one country never serves another
+COUNTRIES = frozenset({
+    "afghanistan", "albania", "algeria", "argentina", "armenia", "australia", "austria",
+    "azerbaijan", "bahrain", "bangladesh", "belarus", "belgium", "bolivia", "bosnia", "brazil",
+    "bulgaria", "cambodia", "cameroon", "canada", "chile", "china", "colombia", "costa rica",
+    "croatia", "cuba", "cyprus", "czech republic", "czechia", "denmark", "dominican republic",
+    "ecuador", "egypt", "estonia", "ethiopia", "finland", "france", "germany", "ghana", "greece",
+    "guatemala", "honduras", "hong kong", "hungary", "iceland", "india", "indonesia", "iran",
+    "iraq", "ireland", "israel", "italy", "jamaica", "japan", "kazakhstan", "kenya", "kuwait",
+    "latvia", "lebanon", "lithuania", "luxembourg", "macau", "malaysia", "maldives", "malta",
+    "mexico", "moldova", "mongolia", "morocco", "myanmar", "nepal", "netherlands", "new zealand",
+    "nigeria", "north macedonia", "norway", "oman", "pakistan", "panama", "paraguay", "peru",
+    "philippines", "poland", "portugal", "qatar", "romania", "russia", "rwanda", "saudi arabia",
+    "serbia", "singapore", "slovakia", "slovenia", "south africa", "south korea", "spain",
+    "sri lanka", "sweden", "switzerland", "taiwan", "tanzania", "thailand", "tunisia", "turkey",
+    "uganda", "ukraine", "united arab emirates", "united kingdom", "united states", "uruguay",
+    "uzbekistan", "venezuela", "vietnam", "zambia", "zimbabwe",
+})
+PLACE_ALIASES = {
+    "usa": "united states", "america": "united states", "united states of america": "united states",
+    "uk": "united kingdom", "britain": "united kingdom", "great britain": "united kingdom",
+    "england": "united kingdom", "uae": "united arab emirates", "korea": "south korea",
+    "holland": "netherlands", "the netherlands": "netherlands", "czech": "czech republic",
+    "rupee": "inr", "rupees": "inr", "yen": "jpy", "euro": "eur", "euros": "eur",
+    "pound": "gbp", "pounds": "gbp", "sterling": "gbp", "yuan": "cny", "rmb": "cny",
+    "ringgit": "myr", "baht": "thb", "dirham": "aed", "dirhams": "aed", "franc": "chf",
+    "francs": "chf", "rand": "zar", "zloty": "pln", "lira": "try", "rupiah": "idr",
+    "dollar": "dollar", "dollars": "dollar", "peso": "peso", "pesos": "peso",
+}
+# Longest names first, so "united states of america" wins over "america"
+_PLACE_NAMES = sorted(
+    {**{c: c for c in COUNTRIES}, **{c: c for c in CURRENCY_CODES}, **PLACE_ALIASES}.items(),
+    key=lambda item: -len(item[0].split()),
+)
+# "US"/"U.S." only when written in capitals; lowercase "us" is a pronoun
+_US = re.compile(r"(?<![A-Za-z])U\.?S\.?(?![A-Za-z.])")
+_LOCATION = re.compile(r"\(?\s*user location:\s*([^)]*)\)?", re.IGNORECASE)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS queries (
+    key         TEXT PRIMARY KEY,
+    tool        TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    terms       TEXT NOT NULL,
+    created_at  REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS bands (
+    tool        TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    band        INTEGER NOT NULL,
+    hash        INTEGER NOT NULL,
+    key         TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS bands_lookup ON bands (tool, fingerprint, band, hash);
+CREATE INDEX IF NOT EXISTS bands_key ON bands (key);
+"""
+
+
+def _stem(word: str) -> str:
+    return word[:-1] if len(word) > 3 and word.endswith("s") and not word.endswith("ss") else word
+
+
+def _places(text: str) -> tuple:
+    """
+    Returns (places, rest): the canonical countries and currencies named in
+    text, and text with those names removed.
+    """
+    places = {"united states"} if _US.search(text) else set()
+    rest = " " + " ".join(re.findall(r"[a-z0-9]+", _US.sub(" ", text).lower())) + " "
+    for name, canonical in _PLACE_NAMES:
+        if f" {name} " in rest:
+            places.add(canonical)
+            rest = rest.replace(f" {name} ", " ")
+    return places, rest.strip()
+
+
+def analyze(text: str) -> tuple:
+    """
+    Splits a query into (fingerprint, terms).
+    fingerprint holds what must match exactly - location context (every
+    country and currency named anywhere, plus the rest of the location
+    suffix, e.g. a city), intent (price, review, ...), model numbers and
+    variant words; terms are the remaining words of the question that are
+    compared fuzzily.
+    """
+    location = _LOCATION.search(text)
+    places, _ = _places(text)
+    suffix = _places(location.group(1))[1] if location else ""
+    context = " ".join(sorted(places | set(normalize_query(suffix).split() if suffix else ())))
+    question = _places(_LOCATION.sub(" ", text))[1]
+    asked = set(normalize_question(question).split())
+    intents = sorted(name for name, words in INTENT_TERMS.items() if asked & words)
+    words = {_stem(w) for w in normalize_query(question).split() if w not in _INTENT_WORDS}
+    exact = sorted(w for w in words
+                   if any(c.isdigit() for c in w) or w in VARIANT_WORDS or w in CURRENCY_CODES)
+    terms = sorted(words - set(exact))
+    return f"{context}|{' '.join(exact)}|{' '.join(intents)}", " ".join(terms)
+
+
+def _shingles(terms: str) -> set:
+    grams = set()
+    for word in terms.split():
+        padded = f" {word} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _split_brands(terms: str) -> tuple:
+    words = terms.split()
+    return {w for w in words if w in BRAND_WORDS}, " ".join(w for w in words if w not in BRAND_WORDS)
+
+
+def similarity(a: str, b: str) -> float:
+    """
+    Character-trigram Jaccard similarity of two term strings, ignoring
+    brand names unless both name a brand and the brands differ (0.0).
+    """
+    brands_a, a = _split_brands(a)
+    brands_b, b = _split_brands(b)
+    if brands_a and brands_b and not brands_a & brands_b:
+        return 0.0
+    sa, sb = _shingles(a), _shingles(b)
+    if not sa and not sb:
+        return 1.0
+    return len(sa & sb) / len(sa | sb)
+
+
+def _get_permutations() -> tuple:
+    """(a, b, prime) of the hash family, built with NumPy on first use."""
+    global _permutations
+    if _permutations is None:
+        import numpy as np
+        rng = np.random.default_rng(20250101)  # Fixed seed: signatures are stable across processes
+        _permutations = (
+            rng.integers(1, 2**32, NUM_PERMUTATIONS, dtype=np.uint64),
+            rng.integers(0, 2**32, NUM_PERMUTATIONS, dtype=np.uint64),
+            np.uint64(4294967311),  # > 2**32, so (a * x + b) stays below 2**64
+        )
+    return _permutations
+
+
+def minhash(terms: str) -> "np.ndarray":
+    """MinHash signature of the term trigrams, brands excluded (NUM_PERMUTATIONS uint64 values)."""
+    import numpy as np
+    a, b, prime = _get_permutations()
+    grams = _shingles(_split_brands(terms)[1]) or {""}
+    hashes = np.fromiter((zlib.crc32(g.encode()) for g in grams), dtype=np.uint64)
+    return ((np.outer(a, hashes) + b[:, None]) % prime).min(axis=1)
+
+
+def _band_hashes(signature: "np.ndarray") -> list:
+    bands = signature.reshape(NUM_BANDS, ROWS_PER_BAND)
+    return [zlib.crc32(band.tobytes()) for band in bands]
+
+
+class SemanticIndex:
+    """
+    Offline near-duplicate query index (MinHash + LSH over character
+    trigrams) kept next to the tool cache, so paraphrased questions can be
+    mapped to the cache key of an earlier answer. Only queries with the
+    same fingerprint (location, intent, currency, model numbers) are compared.
+    """
+    def __init__(self, path: Path = SEMANTIC_INDEX_DB, threshold: float = None,
+                 timeout: float = 30.0):
+        self.path = Path(path)
+        self.threshold = SEARCH_CACHE_SIMILARITY if threshold is None else threshold
+        self.timeout = timeout
+        self._local = threading.local()
+        self._schema_lock = threading.Lock()
+        self._schema_ready = False
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            with self._schema_lock:
+                if not self._schema_ready:
+                    conn.executescript(SCHEMA)
+                    self._schema_ready = True
+            self._local.conn = conn
+        return conn
+
+    def add(self, tool: str, key: str, text: str):
+        fingerprint, terms = analyze(text)
+        bands = _band_hashes(minhash(terms))
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM bands WHERE key = ?", (key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO queries (key, tool, fingerprint, terms, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, tool, fingerprint, terms, time.time()),
+            )
+            conn.executemany(
+                "INSERT INTO bands (tool, fingerprint, band, hash, key) VALUES (?, ?, ?, ?, ?)",
+                [(tool, fingerprint, i, h, key) for i, h in enumerate(bands)],
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def lookup(self, tool: str, text: str) -> list:
+        """
+        Returns [(key, similarity)] of indexed queries at or above the
+        threshold, most similar first.
+        """
+        fingerprint, terms = analyze(text)
+        bands = _band_hashes(minhash(terms))
+        conn = self._connect()
+        where = " OR ".join("(band = ? AND hash = ?)" for _ in bands)
+        params = [tool, fingerprint] + [v for pair in enumerate(bands) for v in pair]
+        rows = conn.execute(
+            f"SELECT DISTINCT q.key, q.terms FROM bands b JOIN queries q ON q.key = b.key "
+            f"WHERE b.tool = ? AND b.fingerprint = ? AND ({where})",
+            params,
+        ).fetchall()
+        matches = [(key, similarity(terms, other)) for key, other in rows]
+        return sorted((m for m in matches if m[1] >= self.threshold), key=lambda m: m[1], reverse=True)
+
+    def remove(self, key: str):
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            conn.execute("DELETE FROM bands WHERE key = ?", (key,))
+            conn.execute("DELETE FROM queries WHERE key = ?", (key,))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_semantic_index() -> SemanticIndex:
+    """Returns the process-wide semantic query index (opened on first use)."""
+    global _index
+    if _index is None:
+        with _index_lock:
+            if _index is None:
+                _index = SemanticIndex()
+    return _index
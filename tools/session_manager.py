@@ -1,15 +1,13 @@
-import json
-import time
-from pathlib import Path
 from typing import Dict, Optional
-from datetime import datetime, timedelta
 
-from tools.memory_tool import _memory_manager, get_from_previous_sessions
-from tools.location_tool import get_user_location as _get_location_raw
-
-# Configuration
-# Location data is kept in memory only, not persisted to disk
-LOCATION_CACHE_HOURS = 24
+from tools.memory_tool import (
+    DEFAULT_USER,
+    PREVIOUS_SESSION_KEYS,
+    resolve_user_id,
+    get_memory_manager,
+    get_many_from_previous_sessions,
+)
+from tools.location_tool import get_user_location_data
 
 
 class SessionManager:
@@ -21,83 +19,17 @@ class SessionManager:
     and is NOT persisted to disk for privacy reasons.
     """
     
-    def __init__(self):
-        # In-memory cache only - location data not persisted
-        self.cache = {
-            'location': None  # Will be populated during session
-        }
-    
-    def get_cached_location(self) -> Optional[Dict]:
+    def get_location(self, use_cache: bool = True, client_ip: Optional[str] = None) -> Dict:
         """
-        Returns cached location if exists in current session and < 24 hours old.
-        Location is kept in memory only, not persisted to disk.
+        Get user location as a structured dict.
+        Served from the process-wide location cache (shared by all sessions,
+        in memory only); concurrent cold lookups share one upstream request.
+        Without client_ip (as in the initialize_session tool) this is the
+        server's own IP location.
         """
-        if 'location' not in self.cache or self.cache['location'] is None:
-            return None
-        
-        location_data = self.cache['location']
-        cached_time = location_data.get('timestamp', 0)
-        
-        # Check if cache is still valid (< 24 hours)
-        if time.time() - cached_time < LOCATION_CACHE_HOURS * 3600:
-            return location_data
-        
-        return None
+        return get_user_location_data(client_ip, use_cache=use_cache)
     
-    def update_location_cache(self, location_data: Dict):
-        """
-        Update location cache with timestamp.
-        Location is stored in memory only for the current session.
-        """
-        location_data['timestamp'] = time.time()
-        location_data['cached'] = True
-        self.cache['location'] = location_data
-        # Note: Location data is NOT saved to disk for privacy
-    
-    def get_location(self, use_cache: bool = True) -> Dict:
-        """
-        Get user location with caching support.
-        Returns structured dict instead of formatted string.
-        """
-        # Try cache first
-        if use_cache:
-            cached = self.get_cached_location()
-            if cached:
-                return cached
-        
-        # Fetch fresh location
-        location_str = _get_location_raw()
-        
-        # Parse the string response into structured data
-        location_data = self._parse_location_string(location_str)
-        location_data['cached'] = False
-        
-        # Cache it
-        self.update_location_cache(location_data)
-        
-        return location_data
-    
-    def _parse_location_string(self, location_str: str) -> Dict:
-        """Parse location string into structured dict."""
-        lines = location_str.strip().split('\n')
-        data = {
-            'country': 'Unknown',
-            'city': 'Unknown',
-            'timezone': 'Unknown',
-            'currency': 'USD'
-        }
-        
-        for line in lines:
-            if ':' in line:
-                key, value = line.split(':', 1)
-                key = key.strip().replace('- ', '').lower()
-                value = value.strip()
-                if key in data:
-                    data[key] = value
-        
-        return data
-    
-    def initialize_session(self) -> Dict:
+    def initialize_session(self, user_id: str = DEFAULT_USER, client_ip: Optional[str] = None) -> Dict:
         """
         OPTION 1: Combine Memory + Location Check
         
@@ -119,44 +51,44 @@ class SessionManager:
         }
         
         # Get all current session preferences
-        result['preferences'] = _memory_manager.memory_service.to_dict()
+        result['preferences'] = get_memory_manager(user_id).memory_service.to_dict()
         
         # Get location (with caching)
-        result['location'] = self.get_location(use_cache=True)
+        result['location'] = self.get_location(use_cache=True, client_ip=client_ip)
+        
+        # Resolve email and other useful data from previous sessions in one pass
+        previous = get_many_from_previous_sessions(PREVIOUS_SESSION_KEYS, user_id)
         
-        # Check for email in previous sessions
-        email = get_from_previous_sessions('user_email')
+        email = previous.pop('user_email', None)
         if email:
             result['email'] = email
         
-        # Get other useful data from previous sessions
-        for key in ['user_preferences', 'favorite_categories', 'budget']:
-            value = get_from_previous_sessions(key)
+        for key, value in previous.items():
             if value:
                 result['previous_session_data'][key] = value
         
         return result
     
-    def prefetch_session_data(self) -> Dict:
+    def prefetch_session_data(self, user_id: str = DEFAULT_USER) -> Dict:
         """
         OPTION 3: Pre-fetch Common Data
         
         Called on startup to load all common data that might be needed.
         This reduces repeated calls throughout the session.
         """
-        return self.initialize_session()
+        return self.initialize_session(user_id)
 
 
 # Global instance
 _session_manager = SessionManager()
 
 
-def initialize_session() -> str:
+def initialize_session(tool_context=None) -> str:
     """
     Initialize session with all common data (Options 1 & 3).
     Returns formatted string for agent consumption.
     """
-    data = _session_manager.initialize_session()
+    data = _session_manager.initialize_session(resolve_user_id(tool_context))
     
     # Format for agent
     output = ["=== Session Initialized ===\n"]
@@ -0,0 +1,153 @@
+import asyncio
+import functools
+import inspect
+import threading
+
+from tools.telemetry import annotate
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key into one execution.
+    The first caller runs the function; callers that arrive while it is in
+    flight wait and share its result (or exception). Nothing is cached
+    once the call completes - pair it with a cache for that.
+
+    Named instances are registered for get_single_flight_stats().
+    """
+    def __init__(self, name: str = None):
+        self.name = name
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+        self.stats = {'calls': 0, 'executions': 0, 'shared': 0}
+        if name:
+            with _registry_lock:
+                _registry[name] = self
+
+    def do(self, key, fn, *args, **kwargs) -> tuple:
+        """
+        Runs fn(*args, **kwargs) once per key at a time.
+        Returns (result, shared) where shared is True for callers that
+        received another caller's result.
+        """
+        with self._lock:
+            self.stats['calls'] += 1
+            call = self._calls.get(key)
+            if call is not None:
+                call.waiters += 1
+                self.stats['shared'] += 1
+                leader = False
+            else:
+                call = self._calls[key] = _Call()
+                self.stats['executions'] += 1
+                leader = True
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn(*args, **kwargs)
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result, False
+
+    async def do_async(self, key, fn, *args, **kwargs) -> tuple:
+        """
+        Async variant of do() for coroutine functions. The call runs as its
+        own task, so a cancelled caller does not cancel it for the others.
+        """
+        loop = asyncio.get_running_loop()
+        task_key = (id(loop), key)
+        with self._lock:
+            self.stats['calls'] += 1
+            task = self._tasks.get(task_key)
+            shared = task is not None
+            if shared:
+                self.stats['shared'] += 1
+            else:
+                task = self._tasks[task_key] = loop.create_task(fn(*args, **kwargs))
+                self.stats['executions'] += 1
+                task.add_done_callback(lambda _: self._forget(task_key))
+        return await asyncio.shield(task), shared
+
+    def _forget(self, task_key):
+        with self._lock:
+            self._tasks.pop(task_key, None)
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            return dict(self.stats, in_flight=len(self._calls) + len(self._tasks))
+
+
+_registry = {}
+_registry_lock = threading.Lock()
+
+
+def _default_key(args: tuple, kwargs: dict):
+    return repr(args) + repr(sorted(kwargs.items()))
+
+
+def single_flight(key=None, name: str = None):
+    """
+    Decorator: concurrent calls with the same key share one execution.
+    Works on plain functions (thread-pool callers) and coroutine functions
+    (asyncio callers). key(*args, **kwargs) builds the coalescing key and
+    defaults to the call's arguments. The wrapped function keeps its
+    signature and docstring, so it can still be used as an agent tool.
+    """
+    def decorator(fn):
+        flight = SingleFlight(name or fn.__qualname__)
+        make_key = key or (lambda *args, **kwargs: _default_key(args, kwargs))
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                result, shared = await flight.do_async(make_key(*args, **kwargs), fn, *args, **kwargs)
+                if shared:
+                    annotate(coalesced=True)
+                return result
+            async_wrapper.single_flight = flight
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            result, shared = flight.do(make_key(*args, **kwargs), fn, *args, **kwargs)
+            if shared:
+                annotate(coalesced=True)
+            return result
+        wrapper.single_flight = flight
+        return wrapper
+
+    return decorator
+
+
+def get_single_flight_stats() -> dict:
+    """
+    Returns per-function call/execution counts; 'shared' is the number of
+    calls served by another caller's in-flight request.
+    """
+    with _registry_lock:
+        flights = dict(_registry)
+    stats = {name: flight.get_stats() for name, flight in flights.items()}
+    calls = sum(s['calls'] for s in stats.values())
+    shared = sum(s['shared'] for s in stats.values())
+    stats['total'] = {'calls': calls, 'shared': shared,
+                      'coalesced_rate': round(shared / calls, 3) if calls else 0.0}
+    return stats
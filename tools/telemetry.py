@@ -0,0 +1,400 @@
+import atexit
+import contextvars
+import functools
+import inspect
+import json
+import os
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+# Configuration
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() in ("1", "true", "yes")
+# Prometheus text endpoint on 127.0.0.1:<port>/metrics (0 = off)
+TELEMETRY_PORT = int(os.getenv("TELEMETRY_PORT", "0"))
+# Periodic JSON dump to TELEMETRY_DIR/telemetry.json, overwritten in place
+# (seconds between dumps; 0 = off). Give worker processes separate directories
+TELEMETRY_DIR = Path(os.getenv("TELEMETRY_DIR", "data/metrics"))
+TELEMETRY_DUMP_INTERVAL = float(os.getenv("TELEMETRY_DUMP_INTERVAL", "0"))
+# Samples per span name kept for the rolling percentiles, and recent spans kept for the dump
+TELEMETRY_WINDOW = int(os.getenv("TELEMETRY_WINDOW", "1024"))
+TELEMETRY_RECENT = int(os.getenv("TELEMETRY_RECENT", "200"))
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+# The span currently running in this thread / task, so code deep inside a
+# tool (caches, single-flight) can flag it without passing it around
+_current = contextvars.ContextVar("telemetry_span", default=None)
+
+
+class Histogram:
+    """
+    Rolling latency window for one span name (last TELEMETRY_WINDOW samples)
+    plus lifetime totals. Percentiles are computed on read, so recording is
+    an append under a lock.
+    """
+    def __init__(self, window: int = TELEMETRY_WINDOW):
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.total = 0.0
+        self.errors = 0
+        self.cache_hits = 0
+        self.coalesced = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+
+    def snapshot(self) -> dict:
+        ordered = sorted(self.samples)
+        result = {
+            'count': self.count,
+            'sum_seconds': round(self.total, 6),
+            'errors': self.errors,
+            'cache_hits': self.cache_hits,
+            'coalesced': self.coalesced,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+        }
+        for q in QUANTILES:
+            value = ordered[min(int(q * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+            result[f'p{int(q * 100)}'] = round(value, 6)
+        return result
+
+
+_histograms = {}
+_recent = deque(maxlen=TELEMETRY_RECENT)
+_lock = threading.Lock()
+_started = False
+
+
+def _payload_size(value) -> int:
+    """Cheap size estimate: only strings and bytes are measured."""
+    if isinstance(value, (str, bytes)):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_payload_size(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_payload_size(v) for v in value)
+    return 0
+
+
+def _is_error_result(result) -> bool:
+    """Tools in this repo report failures as strings starting with Error/Failed."""
+    return isinstance(result, str) and result.startswith(("Error", "Failed"))
+
+
+def record(name: str, seconds: float, error: bool = False, cache_hit: bool = False,
+           coalesced: bool = False, bytes_in: int = 0, bytes_out: int = 0, **attributes):
+    """Records one finished span."""
+    if not TELEMETRY_ENABLED:
+        return
+    _ensure_exporters()
+    with _lock:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.samples.append(seconds)
+        histogram.count += 1
+        histogram.total += seconds
+        histogram.errors += bool(error)
+        histogram.cache_hits += bool(cache_hit)
+        histogram.coalesced += bool(coalesced)
+        histogram.bytes_in += bytes_in
+        histogram.bytes_out += bytes_out
+        _recent.append(dict(
+            attributes, name=name, seconds=round(seconds, 6), error=bool(error),
+            cache_hit=bool(cache_hit), coalesced=bool(coalesced),
+            bytes_in=bytes_in, bytes_out=bytes_out, ended_at=round(time.time(), 3),
+        ))
+
+
+def annotate(**attributes):
+    """Sets attributes (e.g. cache_hit=True) on the span running in this context."""
+    span = _current.get()
+    if span is not None:
+        span.update(attributes)
+
+
+def traced(name: str = None):
+    """
+    Decorator: records a span for every call with its duration, string
+    payload sizes in and out, error flag (exception or an "Error..."
+    result) and any cache_hit/coalesced flags set via annotate().
+    Works on plain and coroutine functions and keeps their signature, so
+    decorated tools look the same to the agents.
+    """
+    def decorator(fn):
+        span_name = name or fn.__name__
+
+        def start(args, kwargs):
+            span = {}
+            token = _current.set(span)
+            return span, token, _payload_size(args) + _payload_size(kwargs), time.perf_counter()
+
+        def finish(span, token, bytes_in, started, result=None, error=False):
+            _current.reset(token)
+            record(
+                span_name, time.perf_counter() - started,
+                error=error or _is_error_result(result),
+                bytes_in=bytes_in, bytes_out=_payload_size(result), **span,
+            )
+
+        if inspect.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                if not TELEMETRY_ENABLED:
+                    return await fn(*args, **kwargs)
+                span, token, bytes_in, started = start(args, kwargs)
+                try:
+                    result = await fn(*args, **kwargs)
+                except BaseException:
+                    finish(span, token, bytes_in, started, error=True)
+                    raise
+                finish(span, token, bytes_in, started, result)
+                return result
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not TELEMETRY_ENABLED:
+                return fn(*args, **kwargs)
+            span, token, bytes_in, started = start(args, kwargs)
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException:
+                finish(span, token, bytes_in, started, error=True)
+                raise
+            finish(span, token, bytes_in, started, result)
+            return result
+        return wrapper
+
+    return decorator
+
+
+def get_counters() -> dict:
+    """
+    Returns the counters the other tool modules keep: rate limiters, the
+    on-disk tool cache, single-flight coalescing and the HTTP connection
+    pools. The disk cache is only reported once something has opened it.
+    """
+    from tools import disk_cache, http_client, rate_limit, singleflight
+
+    sources = {
+        'rate_limit': rate_limit.get_rate_limit_stats,
+        'disk_cache': disk_cache.get_disk_cache_stats if disk_cache._cache is not None else dict,
+        'single_flight': singleflight.get_single_flight_stats,
+        'http_pool': http_client.get_pool_stats,
+    }
+    counters = {}
+    for name, stats in sources.items():
+        try:
+            counters[name] = stats()
+        except Exception as e:
+            counters[name] = {'error': str(e)}
+    return counters
+
+
+def get_metrics() -> dict:
+    """
+    Returns per-span count, error/cache-hit/coalesced counts, payload bytes
+    and rolling p50/p95/p99 latency (seconds), the most recent spans and
+    the tool modules' counters (see get_counters()).
+    """
+    with _lock:
+        spans = {name: h.snapshot() for name, h in sorted(_histograms.items())}
+        recent = list(_recent)
+    return {'pid': os.getpid(), 'generated_at': round(time.time(), 3), 'spans': spans,
+            'recent': recent, 'counters': get_counters()}
+
+
+def _numeric(stats: dict) -> list:
+    return [(k, v) for k, v in stats.items() if isinstance(v, (int, float)) and not isinstance(v, bool)]
+
+
+def _render_counters(counters: dict) -> list:
+    """Prometheus lines for get_counters(): one metric per module, one sample per stat."""
+    groups = (
+        ("tool_rate_limit", "upstream", counters.get('rate_limit', {}),
+         "Token-bucket waits, rejections, throttles and current rate per upstream."),
+        ("tool_single_flight", "function", counters.get('single_flight', {}),
+         "Calls, executions and shared results of coalesced functions."),
+        ("tool_http_pool", "host", counters.get('http_pool', {}).get('hosts', {}),
+         "Requests sent and connections opened per pooled host."),
+    )
+    lines = []
+    for metric, label, per_name, help_text in groups:
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} untyped"]
+        for name, stats in sorted(per_name.items()):
+            if isinstance(stats, dict):
+                lines += [f'{metric}{{{label}="{name}",stat="{k}"}} {v}' for k, v in _numeric(stats)]
+    lines += ["# HELP tool_disk_cache On-disk tool cache hits, misses, refreshes, evictions and size.",
+              "# TYPE tool_disk_cache untyped"]
+    lines += [f'tool_disk_cache{{stat="{k}"}} {v}' for k, v in _numeric(counters.get('disk_cache', {}))]
+    return lines
+
+
+def render_prometheus() -> str:
+    """Renders all spans and tool counters in the Prometheus text exposition format."""
+    with _lock:
+        spans = {name: h.snapshot() for name, h in sorted(_histograms.items())}
+    lines = [
+        "# HELP tool_latency_seconds Span latency over the rolling window.",
+        "# TYPE tool_latency_seconds summary",
+    ]
+    for name, s in spans.items():
+        for q in QUANTILES:
+            lines.append(f'tool_latency_seconds{{span="{name}",quantile="{q}"}} {s[f"p{int(q * 100)}"]}')
+        lines.append(f'tool_latency_seconds_sum{{span="{name}"}} {s["sum_seconds"]}')
+        lines.append(f'tool_latency_seconds_count{{span="{name}"}} {s["count"]}')
+    for metric, key, help_text in (
+        ("tool_errors_total", "errors", "Spans that raised or returned an error."),
+        ("tool_cache_hits_total", "cache_hits", "Spans served from a cache."),
+        ("tool_coalesced_total", "coalesced", "Spans that shared another caller's in-flight request."),
+    ):
+        lines += [f"# HELP {metric} {help_text}", f"# TYPE {metric} counter"]
+        lines += [f'{metric}{{span="{name}"}} {s[key]}' for name, s in spans.items()]
+    lines += ["# HELP tool_payload_bytes_total String payload bytes into and out of spans.",
+              "# TYPE tool_payload_bytes_total counter"]
+    for name, s in spans.items():
+        lines.append(f'tool_payload_bytes_total{{span="{name}",direction="in"}} {s["bytes_in"]}')
+        lines.append(f'tool_payload_bytes_total{{span="{name}",direction="out"}} {s["bytes_out"]}')
+    lines += _render_counters(get_counters())
+    return "\n".join(lines) + "\n"
+
+
+def dump_json(path: Path = None) -> Path:
+    """
+    Writes get_metrics() atomically to TELEMETRY_DIR/telemetry.json. The
+    file is replaced on every dump, so restarts never accumulate files.
+    """
+    path = Path(path) if path else TELEMETRY_DIR / "telemetry.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    tmp.write_text(json.dumps(get_metrics(), indent=2), encoding="utf-8")
+    os.replace(tmp, path)
+    return path
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.startswith("/metrics.json"):
+            body, content_type = json.dumps(get_metrics()).encode(), "application/json"
+        elif self.path.startswith("/metrics"):
+            body, content_type = render_prometheus().encode(), "text/plain; version=0.0.4"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def _dump_loop():
+    while True:
+        time.sleep(TELEMETRY_DUMP_INTERVAL)
+        try:
+            dump_json()
+        except OSError as e:
+            print(f"Warning: telemetry dump failed: {e}")
+
+
+def _ensure_exporters():
+    """Starts the metrics endpoint and dump thread on the first span."""
+    global _started
+    if _started:
+        return
+    with _lock:
+        if _started:
+            return
+        _started = True
+    if TELEMETRY_PORT:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", TELEMETRY_PORT), _MetricsHandler)
+            threading.Thread(target=server.serve_forever, name="telemetry-http", daemon=True).start()
+            print(f"Telemetry: metrics at http://127.0.0.1:{TELEMETRY_PORT}/metrics")
+        except OSError as e:
+            # Another worker process already serves the port
+            print(f"Warning: telemetry endpoint not started: {e}")
+    if TELEMETRY_DUMP_INTERVAL > 0:
+        threading.Thread(target=_dump_loop, name="telemetry-dump", daemon=True).start()
+        atexit.register(dump_json)
+
+
+# --- ADK callbacks --------------------------------------------------------
+# Spans for sub-agents called as AgentTools and for every Gemini call. Start
+# times live in temp: session state, so a short-circuited call leaks nothing.
+
+def _state_key(prefix: str, suffix: str) -> str:
+    return f"temp:telemetry_{prefix}_{suffix}"
+
+
+def before_tool_span(tool, args, tool_context):
+    """before_tool_callback: starts a span for the tool call."""
+    if TELEMETRY_ENABLED:
+        tool_context.state[_state_key("tool", tool_context.function_call_id)] = time.perf_counter()
+    return None
+
+
+def _end_tool_span(tool, args, tool_context, result, error):
+    key = _state_key("tool", tool_context.function_call_id)
+    started = tool_context.state.get(key)
+    if started is None:
+        return
+    tool_context.state[key] = None
+    record(
+        f"tool.{tool.name}", time.perf_counter() - started,
+        error=error or _is_error_result(result),
+        bytes_in=_payload_size(args), bytes_out=_payload_size(result),
+    )
+
+
+def after_tool_span(tool, args, tool_context, tool_response):
+    """after_tool_callback: ends the tool call's span."""
+    _end_tool_span(tool, args, tool_context, tool_response, error=False)
+    return None
+
+
+def tool_error_span(tool, args, tool_context, error):
+    """on_tool_error_callback: ends the span as an error and lets the error propagate."""
+    _end_tool_span(tool, args, tool_context, None, error=True)
+    return None
+
+
+def before_model_span(callback_context, llm_request):
+    """before_model_callback: starts a span for the Gemini call (after any cache/rate-limit callbacks)."""
+    if TELEMETRY_ENABLED:
+        callback_context.state[_state_key("llm", callback_context.agent_name)] = time.perf_counter()
+    return None
+
+
+def after_model_span(callback_context, llm_response):
+    """after_model_callback: ends the Gemini span with token counts."""
+    key = _state_key("llm", callback_context.agent_name)
+    started = callback_context.state.get(key)
+    if started is None or llm_response.partial:
+        return None
+    callback_context.state[key] = None
+    usage = llm_response.usage_metadata
+    record(
+        f"llm.{callback_context.agent_name}", time.perf_counter() - started,
+        error=bool(llm_response.error_code),
+        prompt_tokens=getattr(usage, 'prompt_token_count', None),
+        output_tokens=getattr(usage, 'candidates_token_count', None),
+    )
+    return None
+
+
+def model_error_span(callback_context, llm_request, error):
+    """on_model_error_callback: ends the Gemini span as an error."""
+    key = _state_key("llm", callback_context.agent_name)
+    started = callback_context.state.get(key)
+    if started is not None:
+        callback_context.state[key] = None
+        record(f"llm.{callback_context.agent_name}", time.perf_counter() - started, error=True)
+    return None
@@ -0,0 +1,193 @@
+import os
+import re
+import threading
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import numpy as np
+
+# Configuration
+# Approximate token budget for one tool payload sent to the LLM
+DIGEST_TOKEN_BUDGET = int(os.getenv("DIGEST_TOKEN_BUDGET", "900"))
+# Items whose word-bigram Jaccard similarity reaches this are treated as duplicates
+DIGEST_DUPLICATE_THRESHOLD = float(os.getenv("DIGEST_DUPLICATE_THRESHOLD", "0.7"))
+
+# Rough chars-per-token ratio for English text in Gemini's tokenizer
+CHARS_PER_TOKEN = 4
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORD = re.compile(r"[a-z0-9']+")
+
+_stats = {'calls': 0, 'bytes_in': 0, 'bytes_out': 0, 'tokens_in': 0, 'tokens_out': 0,
+          'duplicates_dropped': 0}
+_stats_lock = threading.Lock()
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (no tokenizer dependency)."""
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def _shingles(text: str) -> set:
+    words = _WORD.findall(text.lower())
+    return set(zip(words, words[1:])) or set(words)
+
+
+def dedupe(texts: list, threshold: float = None) -> list:
+    """
+    Returns the indices of texts to keep, dropping near-duplicates of an
+    earlier text (word-bigram Jaccard similarity >= threshold).
+    """
+    if threshold is None:
+        threshold = DIGEST_DUPLICATE_THRESHOLD
+    kept, kept_shingles = [], []
+    for i, text in enumerate(texts):
+        shingles = _shingles(text)
+        if any(shingles and len(shingles & other) / len(shingles | other) >= threshold
+               for other in kept_shingles):
+            continue
+        kept.append(i)
+        kept_shingles.append(shingles)
+    return kept
+
+
+def score_sentences(sentences: list) -> "np.ndarray":
+    """
+    TF-IDF centrality: cosine similarity of each sentence to the centroid
+    of all sentences, computed as dense NumPy matrix operations.
+    """
+    import numpy as np  # Loaded on first use, not at agent startup
+
+    tokenized = [_WORD.findall(s.lower()) for s in sentences]
+    vocab = {w: i for i, w in enumerate(sorted({w for words in tokenized for w in words}))}
+    if not vocab:
+        return np.zeros(len(sentences))
+    tf = np.zeros((len(sentences), len(vocab)), dtype=np.float32)
+    for row, words in enumerate(tokenized):
+        for w in words:
+            tf[row, vocab[w]] += 1.0
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + df)) + 1.0
+    tfidf = tf * idf
+    norms = np.linalg.norm(tfidf, axis=1, keepdims=True)
+    tfidf = np.divide(tfidf, norms, out=np.zeros_like(tfidf), where=norms > 0)
+    centroid = tfidf.mean(axis=0)
+    centroid_norm = np.linalg.norm(centroid)
+    if centroid_norm == 0:
+        return np.zeros(len(sentences))
+    return tfidf @ (centroid / centroid_norm)
+
+
+def truncate(text: str, max_chars: int) -> str:
+    """Cuts text to at most max_chars on a word boundary, marking the cut with '...'."""
+    text = text.strip()
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0] if " " in text[:max_chars] else text[:max_chars]
+    return cut.rstrip() + "..."
+
+
+def digest(items: list, token_budget: int = None, max_items: int = None,
+           field_chars: int = None) -> tuple:
+    """
+    Condenses a tool payload for the LLM.
+
+    items: [{'header': str, 'fields': [(label, text), ...]}], in priority order.
+    Headers (titles, links, metrics) are kept verbatim; field text is first
+    capped at field_chars (if given) and then cut down to its most central
+    sentences, so the result is never larger than the capped payload the
+    savings are measured against. Near-duplicate items are dropped
+    first (and at most max_items kept), then sentences are taken greedily
+    by TF-IDF score until the token budget is spent (each item's best
+    sentence first), and lowest priority items are dropped if even the
+    headers do not fit.
+
+    Returns (text, stats) where stats reports bytes and tokens saved.
+    """
+    if token_budget is None:
+        token_budget = DIGEST_TOKEN_BUDGET
+    if field_chars is not None:
+        items = [dict(item, fields=[(label, truncate(text, field_chars)) for label, text in item['fields']])
+                 for item in items]
+
+    def render(item, selected=None):
+        lines = [item['header']]
+        for f, (label, text) in enumerate(item['fields']):
+            if selected is None:
+                body = text.strip()
+            else:
+                body = " ".join(s for (fi, _, s) in selected if fi == f)
+            if body:
+                lines.append(f"{label}{body}")
+        return "\n".join(lines) + "\n"
+
+    raw = "\n".join(render(item) for item in items)
+
+    keep = dedupe([render(item) for item in items])
+    duplicates = len(items) - len(keep)
+    items = [items[i] for i in keep][:max_items]
+
+    # Drop lowest-priority items until the fixed parts fit
+    while len(items) > 1 and sum(estimate_tokens(i['header']) + 1 for i in items) > token_budget:
+        items.pop()
+    remaining = token_budget - sum(estimate_tokens(i['header']) + 1 for i in items)
+
+    # (item, field, position, sentence) for every sentence of every field
+    sentences = [
+        (i, f, p, s)
+        for i, item in enumerate(items)
+        for f, (_, text) in enumerate(item['fields'])
+        for p, s in enumerate(s.strip() for s in _SENTENCE_SPLIT.split(text) if s.strip())
+    ]
+    selected = [[] for _ in items]
+    if sentences:
+        scores = score_sentences([s for (_, _, _, s) in sentences])
+        # Each item's best sentence first, then everything else by score
+        ranked = (-scores).argsort(kind="stable")
+        best = {}
+        for idx in ranked:
+            best.setdefault(sentences[idx][0], idx)
+        firsts = set(best.values())
+        order = list(best.values()) + [idx for idx in ranked if idx not in firsts]
+        labelled = set()
+        for idx in order:
+            i, f, p, s = sentences[idx]
+            # A field's label is paid for with its first sentence
+            cost = estimate_tokens(s) + 1
+            if (i, f) not in labelled:
+                cost += estimate_tokens(items[i]['fields'][f][0])
+            if cost <= remaining:
+                selected[i].append((f, p, s))
+                labelled.add((i, f))
+                remaining -= cost
+
+    text = "\n".join(
+        render(item, sorted(sel)) for item, sel in zip(items, selected)
+    ) if items else ""
+
+    stats = {
+        'bytes_in': len(raw.encode()),
+        'bytes_out': len(text.encode()),
+        'tokens_in': estimate_tokens(raw),
+        'tokens_out': estimate_tokens(text),
+        'duplicates_dropped': duplicates,
+    }
+    stats['bytes_saved'] = stats['bytes_in'] - stats['bytes_out']
+    stats['tokens_saved'] = stats['tokens_in'] - stats['tokens_out']
+    with _stats_lock:
+        _stats['calls'] += 1
+        for key in ('bytes_in', 'bytes_out', 'tokens_in', 'tokens_out', 'duplicates_dropped'):
+            _stats[key] += stats[key]
+    return text, stats
+
+
+def get_digest_stats() -> dict:
+    """
+    Returns cumulative bytes/tokens in and out of digest() since startup.
+    """
+    with _stats_lock:
+        return dict(
+            _stats,
+            bytes_saved=_stats['bytes_in'] - _stats['bytes_out'],
+            tokens_saved=_stats['tokens_in'] - _stats['tokens_out'],
+        )
@@ -1,37 +1,264 @@
+import asyncio
+import math
 import os
-from googleapiclient.discovery import build
+import re
+import threading
+import time
+from typing import TYPE_CHECKING
 
-def search_youtube(query: str):
+from tools import cassette, rate_limit
+from tools.cache import normalize_query
+from tools.disk_cache import get_disk_cache, make_key
+from tools.singleflight import single_flight
+from tools.telemetry import annotate, record, traced
+from tools.text_digest import digest
+
+if TYPE_CHECKING:
+    import httplib2
+
+# Configuration
+YOUTUBE_HTTP_TIMEOUT = float(os.getenv("YOUTUBE_HTTP_TIMEOUT", "15"))
+# Data API root, overridable to point the tool at a stand-in server (see benchmarks/)
+YOUTUBE_API_ENDPOINT = os.getenv("YOUTUBE_API_ENDPOINT")
+# Candidates fetched by search.list and enriched in one videos.list call (max 50)
+YOUTUBE_CANDIDATES = min(int(os.getenv("YOUTUBE_CANDIDATES", "15")), 50)
+YOUTUBE_RESULTS = 5
+# Token budget for the condensed payload handed to the LLM
+YOUTUBE_TOKEN_BUDGET = int(os.getenv("YOUTUBE_TOKEN_BUDGET", "400"))
+
+# 403 reasons the Data API uses for rate and quota limits
+THROTTLE_REASONS = ("rateLimitExceeded", "userRateLimitExceeded", "quotaExceeded")
+
+# Title words that suggest a substantive review rather than a teaser
+REVIEW_TERMS = ("review", "vs", "comparison", "compared", "long-term", "long term",
+                "months later", "honest", "in-depth", "after", "worth it", "test")
+# Whole words only ("test" must not match "latest"); a plural "s" is allowed
+REVIEW_PATTERN = re.compile(r"\b(?:" + "|".join(re.escape(t) for t in REVIEW_TERMS) + r")s?\b")
+
+_service = None
+_service_key = None
+_service_lock = threading.Lock()
+_local = threading.local()
+
+def _get_service(api_key: str):
+    """
+    Returns the process-wide YouTube service, built once from the discovery
+    document bundled with google-api-python-client (no discovery fetch).
+    The service object only builds requests, so it is safe to share.
+    """
+    global _service, _service_key
+    if _service is None or _service_key != api_key:
+        with _service_lock:
+            if _service is None or _service_key != api_key:
+                from googleapiclient.discovery import build  # Loaded on first search, not at startup
+                _service = build(
+                    "youtube", "v3",
+                    developerKey=api_key,
+                    static_discovery=True,
+                    cache_discovery=False,
+                    http=_get_http(),
+                    client_options={'api_endpoint': YOUTUBE_API_ENDPOINT} if YOUTUBE_API_ENDPOINT else None,
+                )
+                _service_key = api_key
+    return _service
+
+def _get_http() -> "httplib2.Http":
+    """
+    Returns this thread's keep-alive HTTP transport.
+    httplib2.Http is not thread-safe, so each worker thread keeps its own
+    connection pool and reuses it across calls.
+    """
+    http = getattr(_local, "http", None)
+    if http is None:
+        import httplib2
+        http = httplib2.Http(timeout=YOUTUBE_HTTP_TIMEOUT)
+        _local.http = http
+    return http
+
+def _execute(request):
+    """
+    Executes an API request on this thread's transport under the 'youtube'
+    rate limiter; rate-limit and quota errors slow the limiter down.
+    """
+    from googleapiclient.errors import HttpError
+    limiter = rate_limit.get_limiter('youtube')
+    limiter.acquire()
+    started = time.perf_counter()
+    try:
+        response = _transmit(request)
+    except HttpError as e:
+        record("http.youtube", time.perf_counter() - started, error=True, status=e.resp.status)
+        if e.resp.status == 429 or (e.resp.status == 403 and any(r in str(e) for r in THROTTLE_REASONS)):
+            limiter.throttled(rate_limit.parse_retry_after(e.resp.get('retry-after')))
+        raise
+    except Exception:
+        record("http.youtube", time.perf_counter() - started, error=True)
+        raise
+    record("http.youtube", time.perf_counter() - started)
+    limiter.succeeded()
+    return response
+
+def _transmit(request):
+    """Executes request, or replays/records it when TOOL_IO_MODE is set."""
+    if not cassette.active():
+        return request.execute(http=_get_http())
+    import httplib2
+    from googleapiclient.errors import HttpError
+
+    def live() -> dict:
+        try:
+            return {'status': 200, 'body': request.execute(http=_get_http())}
+        except HttpError as e:
+            return {'status': e.resp.status, 'retry_after': e.resp.get('retry-after'),
+                    'error': e.content.decode('utf-8', errors='replace')}
+
+    # The API key travels as ?key=; redact_url drops it from the identity
+    identity = {'method': request.method, 'url': cassette.redact_url(request.uri), 'body': request.body}
+    recorded = cassette.play("youtube", identity, live)
+    if 'error' in recorded:
+        headers = {'status': recorded['status']}
+        if recorded.get('retry_after'):
+            headers['retry-after'] = recorded['retry_after']
+        raise HttpError(httplib2.Response(headers), recorded['error'].encode('utf-8'), uri=identity['url'])
+    return recorded['body']
+
+def _parse_duration(value: str) -> int:
+    """Converts an ISO 8601 duration such as 'PT1H2M3S' to seconds."""
+    match = re.fullmatch(r"P(?:(\d+)D)?T?(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?", value or "")
+    if not match:
+        return 0
+    days, hours, minutes, seconds = (int(g) if g else 0 for g in match.groups())
+    return ((days * 24 + hours) * 60 + minutes) * 60 + seconds
+
+def _format_duration(seconds: int) -> str:
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}" if hours else f"{minutes}:{secs:02d}"
+
+def _score_video(video: dict) -> float:
+    """
+    Local ranking that favors substantive reviews:
+    reach (log views), approval (like ratio), a full-length runtime
+    (4-40 min; Shorts are penalized) and review-style titles.
+    """
+    views = video['views']
+    score = math.log10(views + 1)
+    if views:
+        score += min(video['likes'] / views * 50, 2.0)
+    duration = video['duration']
+    if duration < 60:
+        score -= 3.0
+    elif 240 <= duration <= 2400:
+        score += 1.5
+    elif duration > 3600:
+        score -= 0.5
+    title = video['title'].lower()
+    if REVIEW_PATTERN.search(title):
+        score += 1.0
+    return score
+
+def _enrich_videos(youtube, video_ids: list) -> dict:
+    """
+    Fetches duration, view/like counts and channel for up to 50 videos
+    with a single videos.list call. Returns {video_id: details}.
+    """
+    response = _execute(youtube.videos().list(
+        part="snippet,contentDetails,statistics",
+        id=",".join(video_ids[:50]),
+        maxResults=50
+    ))
+    details = {}
+    for item in response.get("items", []):
+        stats = item.get("statistics", {})
+        details[item["id"]] = {
+            'title': item["snippet"]["title"],
+            'channel': item["snippet"].get("channelTitle", "Unknown"),
+            'duration': _parse_duration(item.get("contentDetails", {}).get("duration")),
+            'views': int(stats.get("viewCount", 0)),
+            'likes': int(stats.get("likeCount", 0)),
+        }
+    return details
+
+# Concurrent identical searches share one pair of API calls (and quota)
+@traced()
+@single_flight(key=normalize_query, name="search_youtube")
+async def search_youtube(query: str):
     """
     Searches YouTube for videos matching the query.
+    Returns the best review videos with channel, duration, views and likes,
+    ranked to favor substantive reviews (two API calls per search).
     """
     api_key = os.getenv("YOUTUBE_API_KEY")
     if not api_key:
         return "Error: YOUTUBE_API_KEY not found."
-        
+
+    # Persistent cache: stale results are served at once and refreshed in the background.
+    # The API calls block, so they run off the event loop
+    return await asyncio.to_thread(
+        get_disk_cache().fetch,
+        "search_youtube",
+        make_key("search_youtube", normalize_query(query)),
+        lambda: _search_youtube(query, api_key),
+    )
+
+def _search_youtube(query: str, api_key: str) -> tuple:
+    """Runs the search; returns (result, cacheable)."""
     try:
-        youtube = build("youtube", "v3", developerKey=api_key)
+        youtube = _get_service(api_key)
         request = youtube.search().list(
             part="snippet",
-            maxResults=5,
+            maxResults=YOUTUBE_CANDIDATES,
             q=query,
             type="video"
         )
-        response = request.execute()
-        
-        results = []
-        for item in response.get("items", []):
-            title = item["snippet"]["title"]
-            video_id = item["id"]["videoId"]
+        response = _execute(request)
+        items = response.get("items", [])
+        if not items:
+            return "No videos found.", True
+
+        video_ids = [item["id"]["videoId"] for item in items]
+        try:
+            details = _enrich_videos(youtube, video_ids)
+        except Exception as e:
+            # Fall back to search order without metrics
+            print(f"Warning: YouTube enrichment failed: {e}")
+            details = {}
+        complete = bool(details)
+
+        if details:
+            ranked = sorted(details.items(), key=lambda kv: _score_video(kv[1]), reverse=True)
+        else:
+            ranked = [(item["id"]["videoId"], {'title': item["snippet"]["title"]}) for item in items]
+
+        # Ranked candidates are deduplicated (re-uploads, mirrored titles) and
+        # capped at the token budget before they reach the LLM
+        items = []
+        for video_id, video in ranked:
             url = f"https://www.youtube.com/watch?v={video_id}"
-            results.append(f"Title: {title}\nLink: {url}\n")
-            
-        return "\n".join(results) if results else "No videos found."
-        return "\n".join(results) if results else "No videos found."
+            if 'views' in video:
+                header = (
+                    f"Title: {video['title']}\n"
+                    f"Channel: {video['channel']}\n"
+                    f"Duration: {_format_duration(video['duration'])} | "
+                    f"Views: {video['views']:,} | Likes: {video['likes']:,}\n"
+                    f"Link: {url}"
+                )
+            else:
+                header = f"Title: {video['title']}\nLink: {url}"
+            items.append({'header': header, 'fields': []})
+
+        result, stats = digest(items, YOUTUBE_TOKEN_BUDGET, max_items=YOUTUBE_RESULTS)
+        # Totals are in get_digest_stats(); the span carries this call's savings
+        annotate(digest_tokens_in=stats['tokens_in'], digest_tokens_out=stats['tokens_out'])
+        # Unranked fallbacks are not cached, so the next call retries enrichment
+        return result, complete
+    except rate_limit.RateLimitExceeded as e:
+        return f"YouTube is busy (rate limited); try again in {e.retry_after:.0f}s instead of retrying now.", False
     except Exception as e:
         print(f"CRITICAL ERROR in search_youtube: {e}") # Print to stdout for terminal visibility
-        return f"Error searching YouTube: {str(e)}"
+        return f"Error searching YouTube: {str(e)}", False
 
+@traced()
 def summarize_video(video_url: str):
     """
     Summarizes a YouTube video using Gemini's multimodal capabilities.